@@ -1,7 +1,8 @@
+import math
 import os
 import time
 import subprocess
-from typing import Any, Dict, Tuple, Optional, List
+from typing import Any, Dict, Tuple, Optional
 
 try:
     import gymnasium as gym
@@ -14,7 +15,7 @@ import numpy as np
 
 from .config import EnvConfig
 from .knobs import BrokerKnobSpace, apply_knobs
-from .utils import MQTTSampler, build_state_vector, read_proc_metrics
+from .utils import MQTTSampler, build_state_vector, create_sampler, make_history_window, read_proc_metrics
 
 """
 一个围绕 Mosquitto Broker 构建的 Gym 环境。
@@ -64,6 +65,7 @@ class MosquittoBrokerEnv(gym.Env):
         )
 
         # 采样器（延迟初始化，在reset时创建，确保Broker重启后重新连接）
+        # 配置了 cfg.mqtt.shared_memory_name 时为读取守护进程共享内存的 SharedMetricsReader
         self._mqtt_sampler: Optional[MQTTSampler] = None
 
         # 工作负载管理器（可选）
@@ -79,9 +81,9 @@ class MosquittoBrokerEnv(gym.Env):
         self._need_workload_restart = False  # 标志：是否需要重启工作负载
 
         # 历史状态跟踪（用于滑动窗口平均）
-        self._throughput_history: List[float] = []  # 最近5步吞吐量
-        self._latency_history: List[float] = []     # 最近5步延迟
         self._history_window = 5  # 滑动窗口大小
+        self._throughput_history = make_history_window(self._history_window)  # 最近5步吞吐量
+        self._latency_history = make_history_window(self._history_window)     # 最近5步延迟
         self._last_probe_debug: Dict[str, Any] = {}
         self._last_latency_p50_ms: float = float(self.cfg.latency_fallback_p50_ms)
         self._last_latency_p95_ms: float = float(self.cfg.latency_fallback_p95_ms)
@@ -108,12 +110,12 @@ class MosquittoBrokerEnv(gym.Env):
         # 如果采样器不存在或连接断开，重新创建
         if self._mqtt_sampler is None:
             try:
-                self._mqtt_sampler = MQTTSampler(self.cfg.mqtt)
+                self._mqtt_sampler = create_sampler(self.cfg.mqtt)
             except Exception as e:
                 print(f"[MosquittoBrokerEnv] 警告: 创建MQTT采样器失败: {e}")
                 print("[MosquittoBrokerEnv] 尝试重新创建...")
                 time.sleep(1)
-                self._mqtt_sampler = MQTTSampler(self.cfg.mqtt)
+                self._mqtt_sampler = create_sampler(self.cfg.mqtt)
         else:
             # 检查连接是否有效
             if not self._mqtt_sampler._connected:
@@ -123,7 +125,7 @@ class MosquittoBrokerEnv(gym.Env):
                 except:
                     pass
                 time.sleep(0.5)
-                self._mqtt_sampler = MQTTSampler(self.cfg.mqtt)
+                self._mqtt_sampler = create_sampler(self.cfg.mqtt)
         
         # 设置随机种子（如果提供）
         if seed is not None:
@@ -135,8 +137,8 @@ class MosquittoBrokerEnv(gym.Env):
         if self.cfg.apply_default_on_reset:
             if self._last_applied_knobs != default_knobs:
                 print("[MosquittoBrokerEnv] 应用默认Broker配置...")
-                apply_knobs(default_knobs)
-                used_restart = True  # 只要knob变化就视为重启
+                # 配置文件内容未变化时 apply_knobs 会跳过重启并返回 False
+                used_restart = bool(apply_knobs(default_knobs))
                 self._last_applied_knobs = default_knobs.copy()
                 if used_restart:
                     print("[MosquittoBrokerEnv] Broker已重启，等待稳定...")
@@ -166,8 +168,8 @@ class MosquittoBrokerEnv(gym.Env):
         
         self._step_count = 0
         self._need_workload_restart = False
-        self._throughput_history = []
-        self._latency_history = []
+        self._throughput_history.clear()
+        self._latency_history.clear()
         self._consecutive_failures = 0
         
         # 在采样初始状态前，确保工作负载正在运行并稳定（仅在第一次reset时）
@@ -204,7 +206,7 @@ class MosquittoBrokerEnv(gym.Env):
             candidate = self._sample_state()
 
             # 验证状态有效性
-            if np.any(np.isnan(candidate)) or np.any(np.isinf(candidate)):
+            if not np.isfinite(candidate).all():
                 print("[MosquittoBrokerEnv] 警告: reset时检测到无效状态值（NaN/Inf），使用零状态")
                 candidate = np.zeros(self.cfg.state_dim, dtype=np.float32)
 
@@ -293,16 +295,17 @@ class MosquittoBrokerEnv(gym.Env):
                 print("[MosquittoBrokerEnv] 配置未变化，跳过应用与重启")
         else:
             try:
-                apply_knobs(knobs)
+                # knobs 不同但生成的配置文件相同时（如均为 0 的可选项），apply_knobs 返回 False
+                used_restart = bool(apply_knobs(knobs))
             except Exception as exc:
                 return self._make_failure_transition(
                     reason="apply_knobs_failed",
                     error=exc,
                     knobs=knobs,
                 )
-            used_restart = True  # 只要knob变化就视为重启
             self._last_applied_knobs = knobs.copy()
-            self._restart_count += 1
+            if used_restart:
+                self._restart_count += 1
         
         # 记录Broker重启信息（用于工作负载健康检查）
         # 注意：Broker重启会导致所有MQTT连接断开，包括工作负载
@@ -437,17 +440,12 @@ class MosquittoBrokerEnv(gym.Env):
         throughput = float(next_state[1])  # msg_rate_norm
         latency = float(next_state[5])    # latency_p50_norm
 
+        # 定长 deque，超出窗口大小时自动淘汰最旧的记录
         self._throughput_history.append(throughput)
         self._latency_history.append(latency)
-
-        # 保持历史记录在窗口大小内
-        if len(self._throughput_history) > self._history_window:
-            self._throughput_history.pop(0)
-        if len(self._latency_history) > self._history_window:
-            self._latency_history.pop(0)
         
         # 验证状态有效性（防止NaN/Inf）
-        if np.any(np.isnan(next_state)) or np.any(np.isinf(next_state)):
+        if not np.isfinite(next_state).all():
             print(f"[MosquittoBrokerEnv] 警告: 检测到无效状态值（NaN/Inf），使用零状态")
             next_state = np.zeros_like(next_state, dtype=np.float32)
         
@@ -473,7 +471,7 @@ class MosquittoBrokerEnv(gym.Env):
             print(f"[MosquittoBrokerEnv] 奖励计算完成: {reward:.6f}")
         
         # 验证奖励有效性
-        if np.isnan(reward) or np.isinf(reward):
+        if not math.isfinite(reward):
             print(f"[MosquittoBrokerEnv] 警告: 检测到无效奖励值（NaN/Inf），使用0.0")
             reward = 0.0
         
@@ -588,7 +586,7 @@ class MosquittoBrokerEnv(gym.Env):
             max_retries = 3
             for retry in range(max_retries):
                 try:
-                    self._mqtt_sampler = MQTTSampler(self.cfg.mqtt)
+                    self._mqtt_sampler = create_sampler(self.cfg.mqtt)
                     # 等待连接建立（最多等待5秒）
                     for _ in range(50):  # 50 * 0.1 = 5秒
                         if self._mqtt_sampler._connected:
@@ -741,11 +739,11 @@ class MosquittoBrokerEnv(gym.Env):
                 self._initial_throughput_logged = True
 
         if self._throughput_history:
-            avg_throughput = float(np.mean(self._throughput_history))
+            avg_throughput = sum(self._throughput_history) / len(self._throughput_history)
         else:
             avg_throughput = current_throughput
         if self._latency_history:
-            avg_latency = float(np.mean(self._latency_history))
+            avg_latency = sum(self._latency_history) / len(self._latency_history)
         else:
             avg_latency = current_latency
 
@@ -812,7 +810,7 @@ class MosquittoBrokerEnv(gym.Env):
         else:
             reward = float(reward_base)
 
-        if np.isnan(reward) or np.isinf(reward):
+        if not math.isfinite(reward):
             reward = 0.0
 
         reward = np.clip(reward, -self.cfg.reward_clip, self.cfg.reward_clip)
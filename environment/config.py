@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 """
 环境与采样配置（MQTT、/proc、状态/动作维度等）
 """
@@ -14,6 +14,8 @@ class MQTTConfig:
     client_id: str = "broker_tuner_monitor"
     # 订阅 broker 运行指标
     topics: List[str] = ("$SYS/#",)
+    # True 时 topics 为精确主题（不含 + / # 通配符），采样器只处理这些主题的消息，其余直接丢弃
+    topics_exact: bool = False
     keepalive: int = 30
     timeout_sec: float = 12.0  # 等待一轮采样的超时时间（默认12秒；若sys_interval更小可调低以加速）
     rate_min_interval_sec: float = 5.0  # 速率估算的最小时间间隔
@@ -28,7 +30,10 @@ class MQTTConfig:
         ]
     )
     sample_wait_for_derived_rate: bool = True
-    sample_poll_interval_sec: float = 0.1
+    sample_poll_interval_sec: float = 0.1  # SharedMetricsReader 的轮询间隔（MQTTSampler 由消息到达直接唤醒）
+    # 若设置，环境不再自行订阅 $SYS，而是读取 sampler 守护进程写入的同名共享内存
+    # （启动方式：python -m environment.shared_sampler --name <name>）
+    shared_memory_name: Optional[str] = None
 
 
 @dataclass
@@ -36,13 +41,20 @@ class ProcConfig:
     """通过 /proc 采样进程 CPU / 内存 / 上下文切换"""
 
     pid: int = 0  # 将在 __post_init__ 中自动检测
-    # CPU 归一化的参考：如逻辑核数*100
-    cpu_norm: float = 400.0
+    # CPU 归一化的参考（百分比）：如逻辑核数*100；<=0 时在 __post_init__ 中按可用核数自动设置
+    cpu_norm: float = 0.0
     mem_norm: float = 1024 * 1024 * 1024  # 1 GiB
     ctxt_norm: float = 1e6
     
     def __post_init__(self):
-        """自动检测 Mosquitto PID（如果未设置）"""
+        """自动检测 CPU 归一化参考与 Mosquitto PID（如果未设置）"""
+        if self.cpu_norm <= 0:
+            try:
+                ncpu = len(os.sched_getaffinity(0))
+            except (AttributeError, OSError):
+                ncpu = os.cpu_count() or 1
+            self.cpu_norm = float(max(ncpu, 1) * 100)
+
         if self.pid == 0:
             # 优先使用环境变量
             env_pid = os.environ.get("MOSQUITTO_PID")
@@ -1,5 +1,7 @@
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Tuple, List
+from typing import Any, Dict, Tuple, List, Optional
+import hashlib
 import os
 import subprocess
 import time
@@ -12,6 +14,44 @@ import numpy as np
 - 将 DDPG 连续动作 a_t ∈ [0,1]^n 映射成 Mosquitto 的具体配置项
 """
 
+# 最近一次成功写入并重启所用配置的摘要（blake2b-128，含配置文件路径）
+# 配置内容未变化时跳过写文件与重启，避免无谓的 Broker 重启
+_LAST_CONFIG_HASH: Optional[bytes] = None
+
+
+def _interp_with_zero(v: float, low: int, high: int, zero_eps: float = 0.01) -> int:
+    """
+    对于 0 表示无限制/关闭的配置：
+    - v < zero_eps/2 时直接返回 0（确保编码时zero_eps/2映射为0）
+    - 否则在线性插值 [low, high]（low 通常也是 0）
+    
+    注意：
+    - 编码时，0值映射为zero_eps/2（0.005）
+    - 解码时，v < zero_eps/2（0.005）→ 0
+    - 解码时，v >= zero_eps/2（0.005）→ 正常插值，使用round避免浮点数精度问题
+    - zero_eps设置为0.01，这样20/2000=0.01不会被误判为0
+    """
+    if v < zero_eps / 2.0:
+        return 0
+    # 使用round避免浮点数精度问题（例如0.01 * 2000 = 19.9999996）
+    return int(round(low + v * (high - low)))
+
+
+def _quantize(value: int, step: int, low: int, high: int, min_nonzero: int = 0) -> int:
+    """量化到 step 的整数倍；非 0 结果至少为 min_nonzero（0 仍表示无限制/关闭）。"""
+    if value == 0:
+        return 0
+    if step <= 1:
+        return int(min(max(value, low, min_nonzero), high))
+    quantized = int(round(value / step) * step)
+    if quantized == 0:
+        quantized = step
+    return int(min(max(quantized, low if low > 0 else step, min_nonzero), high))
+
+
+# BrokerKnobSpace.decode_action 缓存的最大动作数
+_DECODE_CACHE_SIZE = 256
+
 
 @dataclass
 class BrokerKnobSpace:
@@ -77,6 +117,36 @@ class BrokerKnobSpace:
     DEFAULT_MAX_PACKET_SIZE: int = 0
     DEFAULT_MESSAGE_SIZE_LIMIT: int = 0
 
+    def __post_init__(self):
+        # decode_action 复用的 float32 缓冲区，避免每步分配临时数组
+        # 注意：因此同一个 BrokerKnobSpace 实例的 decode_action 不是线程安全的
+        self._action_scratch = np.empty(self.action_dim, dtype=np.float32)
+        # 按动作下标展开的解码参数：
+        # (配置名, 取值范围 或 None 表示布尔项, 量化步长, 非 0 时的最小值)
+        # 构造时固定下来，decode_action 中不再逐项读取 dataclass 字段
+        self._decode_specs: Tuple[Tuple[str, Any, int, int], ...] = (
+            # QoS
+            ("max_inflight_messages", self.max_inflight_messages_range, self.max_inflight_messages_step, 0),
+            ("max_inflight_bytes", self.max_inflight_bytes_range, self.max_inflight_bytes_step, 0),
+            ("max_queued_messages", self.max_queued_messages_range, self.max_queued_messages_step, 0),
+            ("max_queued_bytes", self.max_queued_bytes_range, self.max_queued_bytes_step, 0),
+            ("queue_qos0_messages", None, 0, 0),
+            # 内存 / 持久化
+            ("memory_limit", self.memory_limit_range, self.memory_limit_step, 0),
+            ("persistence", None, 0, 0),
+            ("autosave_interval", self.autosave_interval_range, self.autosave_interval_step, 0),
+            # 网络 / 协议层
+            ("set_tcp_nodelay", None, 0, 0),
+            # max_packet_size: 当不为0时，最小值应为 20
+            ("max_packet_size", self.max_packet_size_range, self.max_packet_size_step, 20),
+            ("message_size_limit", self.message_size_limit_range, self.message_size_limit_step, 0),
+        )
+        assert len(self._decode_specs) == self.action_dim
+        # 以 clip 后动作的原始字节为键缓存解码结果（LRU，最多 _DECODE_CACHE_SIZE 项）：
+        # 动作饱和在边界或重复出现时直接命中。用实例自己的字典而不是包装绑定方法的 lru_cache，
+        # 后者会在实例与缓存之间形成引用环，实例只能等循环 GC 回收
+        self._decode_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
     @property
     def action_dim(self) -> int:
         """
@@ -102,148 +172,49 @@ class BrokerKnobSpace:
         注意：
         - 对于允许 0 表示“无限制/关闭”的项，当动作非常接近 0 时会直接映射为 0
         - 布尔项通过 0.5 阈值进行取整
+        - 内部复用 float32 缓冲区，同一实例不应被多个线程并发调用
+        - 最近 256 个不同动作的解码结果会被缓存（按 clip 后的精确取值，不做额外量化）
         """
-        # 确保动作是numpy数组且形状正确
-        if not isinstance(action, np.ndarray):
-            action = np.array(action, dtype=np.float32)
+        # 确保动作是 float32 数组（已是 float32 ndarray 时不复制）
+        action = np.asarray(action, dtype=np.float32)
         
         # 验证动作维度
-        if action.shape[0] != self.action_dim:
-            raise ValueError(f"动作维度不匹配: 期望 {self.action_dim}, 得到 {action.shape[0]}")
+        if action.size != self.action_dim:
+            raise ValueError(f"动作维度不匹配: 期望 {self.action_dim}, 得到 {action.size}")
         
-        # Clip到有效范围并验证
-        a = np.clip(action, 0.0, 1.0).astype(np.float32)
+        # Clip到有效范围（写入预分配缓冲区）
+        a = np.clip(action.reshape(self.action_dim), 0.0, 1.0, out=self._action_scratch)
         
-        # 检查是否有NaN/Inf
-        if np.any(np.isnan(a)) or np.any(np.isinf(a)):
+        # 检查是否有NaN（Inf 已被 clip 到边界）
+        if np.isnan(a).any():
             print(f"[BrokerKnobSpace] 警告: 检测到无效动作值（NaN/Inf），使用0.5作为默认值")
-            a = np.nan_to_num(a, nan=0.5, posinf=1.0, neginf=0.0)
-
-        def _interp_with_zero(v: float, low: int, high: int, zero_eps: float = 0.01) -> int:
-            """
-            对于 0 表示无限制/关闭的配置：
-            - v < zero_eps/2 时直接返回 0（确保编码时zero_eps/2映射为0）
-            - 否则在线性插值 [low, high]（low 通常也是 0）
-            
-            注意：
-            - 编码时，0值映射为zero_eps/2（0.005）
-            - 解码时，v < zero_eps/2（0.005）→ 0
-            - 解码时，v >= zero_eps/2（0.005）→ 正常插值，使用round避免浮点数精度问题
-            - zero_eps设置为0.01，这样20/2000=0.01不会被误判为0
-            """
-            if v < zero_eps / 2.0:
-                return 0
-            # 使用round避免浮点数精度问题（例如0.01 * 2000 = 19.9999996）
-            return int(round(low + v * (high - low)))
-
-        def _interp(v: float, low: int, high: int) -> int:
-            return int(low + v * (high - low))
-
-        def _quantize(value: int, step: int, low: int, high: int) -> int:
-            if value == 0:
-                return 0
-            if step <= 1:
-                return int(min(max(value, low), high))
-            quantized = int(round(value / step) * step)
-            if quantized == 0:
-                quantized = step
-            return int(min(max(quantized, low if low > 0 else step), high))
-
-        # QoS 相关
-        max_inflight_messages = _interp_with_zero(
-            a[0], *self.max_inflight_messages_range
-        )
-        max_inflight_messages = _quantize(
-            max_inflight_messages,
-            self.max_inflight_messages_step,
-            *self.max_inflight_messages_range
-        )
-        max_inflight_bytes = _interp_with_zero(
-            a[1], *self.max_inflight_bytes_range
-        )
-        max_inflight_bytes = _quantize(
-            max_inflight_bytes,
-            self.max_inflight_bytes_step,
-            *self.max_inflight_bytes_range
-        )
-        max_queued_messages = _interp_with_zero(
-            a[2], *self.max_queued_messages_range
-        )
-        max_queued_messages = _quantize(
-            max_queued_messages,
-            self.max_queued_messages_step,
-            *self.max_queued_messages_range
-        )
-        max_queued_bytes = _interp_with_zero(
-            a[3], *self.max_queued_bytes_range
-        )
-        max_queued_bytes = _quantize(
-            max_queued_bytes,
-            self.max_queued_bytes_step,
-            *self.max_queued_bytes_range
-        )
-        queue_qos0_messages = bool(a[4] >= 0.5)
-
-        # 内存 / 持久化
-        memory_limit = _interp_with_zero(
-            a[5], *self.memory_limit_range
-        )
-        memory_limit = _quantize(
-            memory_limit,
-            self.memory_limit_step,
-            *self.memory_limit_range
-        )
-        persistence = bool(a[6] >= 0.5)
-        autosave_interval = _interp_with_zero(
-            a[7], *self.autosave_interval_range
-        )
-        autosave_interval = _quantize(
-            autosave_interval,
-            self.autosave_interval_step,
-            *self.autosave_interval_range
-        )
-
-        # 网络 / 协议层
-        set_tcp_nodelay = bool(a[8] >= 0.5)
-        # max_packet_size: 当不为0时，最小值应为 20
-        max_packet_size_raw = _interp_with_zero(
-            a[9], *self.max_packet_size_range
-        )
-        max_packet_size_raw = _quantize(
-            max_packet_size_raw,
-            self.max_packet_size_step,
-            *self.max_packet_size_range
-        )
-        if max_packet_size_raw > 0 and max_packet_size_raw < 20:
-            max_packet_size = 20
+            np.nan_to_num(a, copy=False, nan=0.5)
+
+        key = a.tobytes()
+        cache = self._decode_cache
+        knobs = cache.get(key)
+        if knobs is None:
+            knobs = self._decode_clipped(key)
+            cache[key] = knobs
+            if len(cache) > _DECODE_CACHE_SIZE:
+                cache.popitem(last=False)
         else:
-            max_packet_size = max_packet_size_raw
-        message_size_limit = _interp_with_zero(
-            a[10], *self.message_size_limit_range
-        )
-        message_size_limit = _quantize(
-            message_size_limit,
-            self.message_size_limit_step,
-            *self.message_size_limit_range
-        )
-
-        return {
-            # QoS
-            "max_inflight_messages": max_inflight_messages,
-            "max_inflight_bytes": max_inflight_bytes,
-            "max_queued_messages": max_queued_messages,
-            "max_queued_bytes": max_queued_bytes,
-            "queue_qos0_messages": queue_qos0_messages,
-            # 内存
-            "memory_limit": memory_limit,
-            "persistence": persistence,
-            "autosave_interval": autosave_interval,
-            # 网络延迟
-            "set_tcp_nodelay": set_tcp_nodelay,
-            # 协议/报文
-            "max_packet_size": max_packet_size,
-            "message_size_limit": message_size_limit,
-        }
+            cache.move_to_end(key)
+        # 返回副本，避免调用方修改缓存中的结果
+        return dict(knobs)
+
+    def _decode_clipped(self, key: bytes) -> Dict[str, Any]:
+        """对已 clip 到 [0,1] 且无 NaN 的 float32 动作字节做解码（结果由 decode_action 缓存）。"""
+        a = np.frombuffer(key, dtype=np.float32)
+        knobs: Dict[str, Any] = {}
+        for index, (name, value_range, step, min_nonzero) in enumerate(self._decode_specs):
+            if value_range is None:
+                # 布尔项
+                knobs[name] = bool(a[index] >= 0.5)
+                continue
+            value = _interp_with_zero(a[index], *value_range)
+            knobs[name] = _quantize(value, step, *value_range, min_nonzero)
+        return knobs
     
     def get_default_knobs(self) -> Dict[str, Any]:
         """
@@ -369,6 +340,20 @@ class BrokerKnobSpace:
         return self.encode_knobs(self.get_default_knobs())
 
 
+def _mosquitto_pids(config_path: Path) -> List[str]:
+    """以 config_path 启动的 mosquitto 进程 PID（pgrep -f 按命令行匹配）；pgrep 不可用或超时时返回空列表"""
+    try:
+        result = subprocess.run(
+            ["pgrep", "-f", f"mosquitto.*{config_path.name}"],
+            capture_output=True,
+            text=True,
+            timeout=2
+        )
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return []
+    return result.stdout.split() if result.returncode == 0 else []
+
+
 def apply_knobs(knobs: Dict[str, Any], dry_run: bool = None, force_restart: bool = None) -> bool:
     """
     将解码后的 broker 配置真正作用到 Mosquitto。
@@ -382,15 +367,19 @@ def apply_knobs(knobs: Dict[str, Any], dry_run: bool = None, force_restart: bool
          - 先停止现有的 mosquitto 进程（systemctl stop 或 pkill）
          - 使用新配置文件启动 mosquitto（后台运行）
          - 每次配置变化都会完全重启 mosquitto
+      3. 若生成的配置内容与上一次成功应用的完全一致（文件仍存在，且以该配置启动的 mosquitto 仍在运行），
+         跳过写文件与重启，直接返回 False；Broker 崩溃或被外部重启过时照常重启
 
     参数:
       dry_run: 如果为 True，只打印配置信息，不实际写入文件或重启服务。
                如果为 None，则从环境变量 BROKER_TUNER_DRY_RUN 读取（默认为 False）
-      force_restart: 已废弃，现在总是完全重启（保留此参数以兼容旧代码）
+      force_restart: 为 True 时忽略配置摘要比对，总是写入并完全重启
     
     Returns:
-      bool: 总是返回 True（表示完全重启）
+      bool: True 表示已写入配置并完全重启；False 表示配置未变化，已跳过
     """
+    global _LAST_CONFIG_HASH
+
     # 检查是否启用测试模式
     if dry_run is None:
         dry_run = os.environ.get("BROKER_TUNER_DRY_RUN", "false").lower() in ("true", "1", "yes")
@@ -509,11 +498,27 @@ def apply_knobs(knobs: Dict[str, Any], dry_run: bool = None, force_restart: bool
         print("\n".join(lines))
         return True  # 测试模式返回 True（视为完全重启）
 
+    # 配置内容只编码一次，摘要计算与写文件共用同一份 bytes
+    # （模板含中文注释，因此使用 utf-8 而不是 ascii）
+    config_bytes = ("\n".join(lines) + "\n").encode("utf-8")
+
+    # 配置内容未变化时跳过写入与重启
+    hasher = hashlib.blake2b(str(config_path).encode("utf-8"), digest_size=16)
+    hasher.update(config_bytes)
+    config_hash = hasher.digest()
+    if not force_restart and config_hash == _LAST_CONFIG_HASH and config_path.exists():
+        if _mosquitto_pids(config_path):
+            print(f"[apply_knobs] 配置内容未变化，跳过写入与重启: {config_path}")
+            return False
+        print("[apply_knobs] 配置内容未变化，但以该配置启动的 mosquitto 未在运行，重新启动")
+
+    # 先清空摘要：写入或重启失败时，下一次调用必须重新写入并重启
+    _LAST_CONFIG_HASH = None
+
     # 写入配置文件
     try:
         config_path.parent.mkdir(parents=True, exist_ok=True)
-        config_content = "\n".join(lines) + "\n"
-        config_path.write_text(config_content, encoding="utf-8")
+        config_path.write_bytes(config_bytes)
         print(f"[apply_knobs] ✅ 配置文件已写入: {config_path}")
     except OSError as exc:
         raise RuntimeError(f"写入 Mosquitto 配置文件失败: {config_path} ({exc})") from exc
@@ -646,14 +651,9 @@ def apply_knobs(knobs: Dict[str, Any], dry_run: bool = None, force_restart: bool
             time.sleep(2)
             
             # 验证进程是否运行
-            result = subprocess.run(
-                ["pgrep", "-f", f"mosquitto.*{config_path.name}"],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            if result.returncode == 0:
-                pid = result.stdout.strip().split()[0]
+            pids = _mosquitto_pids(config_path)
+            if pids:
+                pid = pids[0]
                 print(f"[apply_knobs] ✅ mosquitto 进程已运行（PID: {pid}）")
                 # 更新环境变量中的PID
                 os.environ["MOSQUITTO_PID"] = pid
@@ -672,7 +672,8 @@ def apply_knobs(knobs: Dict[str, Any], dry_run: bool = None, force_restart: bool
     try:
         _stop_mosquitto()
         _start_mosquitto()
-        return True  # 总是返回 True（表示完全重启）
+        _LAST_CONFIG_HASH = config_hash
+        return True  # 完全重启
     except Exception as exc:
         raise RuntimeError(
             f"应用配置失败: {exc}\n"
@@ -0,0 +1,269 @@
+import argparse
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import MQTTConfig
+from .utils import MQTTSampler
+
+"""
+通过共享内存在多个环境进程之间共享 $SYS 指标：
+    守护进程：单个 MQTTSampler 订阅 $SYS/#，周期性把最新指标写入共享内存
+    环境进程：SharedMetricsReader 直接读取共享内存，接口与 MQTTSampler 一致
+
+启动守护进程：
+    python -m environment.shared_sampler --name broker_tuner_sys
+训练时通过 MQTTConfig.shared_memory_name（或 tuner.train --sampler-shm-name）指定同一名称，
+环境经由 utils.create_sampler 自动改用 SharedMetricsReader。
+
+共享内存布局（小端）：
+    [0:8)    uint64  seq        seqlock 序号，写入期间为奇数
+    [8:16)   float64 heartbeat  守护进程最近一次发布的 time.time()
+    [16:20)  uint32  n          主题个数
+    [20:24)  uint32  names_len  主题名字节数（utf-8，换行分隔）
+    [24:...) 主题名，按 8 字节对齐后依次为 float64 values[n]、float64 timestamps[n]
+未收到的指标用 NaN 表示。数值使用 float64：消息计数等累计值超过 2^24 后 float32 会丢失精度。
+"""
+
+# 环境状态向量与奖励会用到的 $SYS 指标（含 MQTTSampler 计算的派生速率）
+SHARED_SYS_TOPICS: Tuple[str, ...] = (
+    "$SYS/broker/clients/connected",
+    "$SYS/broker/uptime",
+    "$SYS/broker/messages/received",
+    "$SYS/broker/messages/received_rate",
+    "$SYS/broker/load/messages/received/1min",
+    "$SYS/broker/load/messages/received/1min_per_sec",
+    "$SYS/broker/store/messages/count",
+    "$SYS/broker/messages/stored",
+    "$SYS/broker/retained messages/count",
+    "$SYS/broker/heap/messages",
+)
+
+_HEADER = struct.Struct("<QdII")
+
+# 读取方等待 seqlock 变为偶数的最长时间：守护进程在写入中途退出时序号会一直停在奇数
+_READ_CONSISTENT_TIMEOUT_SEC = 1.0
+
+# _attach 在 Python < 3.13 上需要临时替换 resource_tracker.register，多个线程同时附加时必须串行
+_ATTACH_LOCK = threading.Lock()
+
+
+def _layout(names_len: int, n: int) -> Tuple[int, int]:
+    """返回 (values 起始偏移, 总字节数)。"""
+    values_offset = (_HEADER.size + names_len + 7) // 8 * 8
+    return values_offset, values_offset + 16 * n
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """附加到已存在的共享内存，且不让本进程的 resource_tracker 在退出时删除它。"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    from multiprocessing import resource_tracker
+
+    # Python < 3.13 附加时也会注册，读取进程退出时会把守护进程的共享内存一并删除
+    with _ATTACH_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class _SharedMetricsBlock:
+    """共享内存块上的 numpy 视图。"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, topics: Sequence[str], values_offset: int):
+        n = len(topics)
+        self.shm = shm
+        self.topics: Tuple[str, ...] = tuple(topics)
+        self.seq = np.ndarray((1,), dtype="<u8", buffer=shm.buf, offset=0)
+        self.heartbeat = np.ndarray((1,), dtype="<f8", buffer=shm.buf, offset=8)
+        self.values = np.ndarray((n,), dtype="<f8", buffer=shm.buf, offset=values_offset)
+        self.timestamps = np.ndarray((n,), dtype="<f8", buffer=shm.buf, offset=values_offset + 8 * n)
+
+    def release(self) -> None:
+        # 先释放 numpy 视图，否则 SharedMemory.close() 会因仍有导出的缓冲区而失败
+        del self.seq, self.heartbeat, self.values, self.timestamps
+        self.shm.close()
+
+
+class SharedMetricsWriter:
+    """守护进程侧：创建共享内存并按 seqlock 协议发布指标（单写者）。"""
+
+    def __init__(self, name: str, topics: Sequence[str] = SHARED_SYS_TOPICS):
+        names = "\n".join(topics).encode("utf-8")
+        values_offset, size = _layout(len(names), len(topics))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0.0, len(topics), len(names))
+        shm.buf[_HEADER.size:_HEADER.size + len(names)] = names
+        self._block = _SharedMetricsBlock(shm, topics, values_offset)
+        self._block.values[:] = np.nan
+        self._block.timestamps[:] = 0.0
+        self._index = {topic: i for i, topic in enumerate(self._block.topics)}
+
+    @property
+    def name(self) -> str:
+        return self._block.shm.name
+
+    def publish(self, metrics: Dict[str, float], metrics_ts: Dict[str, float]) -> None:
+        block = self._block
+        block.seq[0] += 1  # 奇数：写入中
+        for topic, i in self._index.items():
+            value = metrics.get(topic)
+            if value is None:
+                block.values[i] = np.nan
+                block.timestamps[i] = 0.0
+            else:
+                block.values[i] = value
+                block.timestamps[i] = metrics_ts.get(topic, 0.0)
+        block.heartbeat[0] = time.time()
+        block.seq[0] += 1  # 偶数：写入完成
+
+    def close(self) -> None:
+        shm = self._block.shm
+        self._block.release()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedMetricsReader:
+    """
+    环境进程侧：读取守护进程发布的指标。
+    提供与 MQTTSampler 相同的 sample()/close()/_connected 接口，可直接替换。
+    """
+
+    def __init__(self, cfg: MQTTConfig, stale_after_sec: float = 5.0):
+        if not cfg.shared_memory_name:
+            raise ValueError("MQTTConfig.shared_memory_name 未设置，无法读取共享内存指标")
+        self._cfg = cfg
+        self._stale_after_sec = stale_after_sec
+        shm = _attach(cfg.shared_memory_name)
+        _, _, n, names_len = _HEADER.unpack_from(shm.buf, 0)
+        topics = bytes(shm.buf[_HEADER.size:_HEADER.size + names_len]).decode("utf-8").split("\n")
+        values_offset, _ = _layout(names_len, n)
+        self._block = _SharedMetricsBlock(shm, topics[:n], values_offset)
+        self._index = {topic: i for i, topic in enumerate(self._block.topics)}
+        # 最近一次读到的一致快照；seqlock 卡在写入状态时返回它
+        self._last_good: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def _connected(self) -> bool:
+        """守护进程在 stale_after_sec 内发布过数据即视为在线。"""
+        return time.time() - float(self._block.heartbeat[0]) < self._stale_after_sec
+
+    def _read_consistent(self, timeout_sec: float = _READ_CONSISTENT_TIMEOUT_SEC) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按 seqlock 协议读取一份一致的快照。
+        超过 timeout_sec 仍读不到（守护进程在写入中途退出）时返回上一次的快照（其时间戳不会更新），
+        从未读到过则抛出 RuntimeError。
+        """
+        block = self._block
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            seq_before = int(block.seq[0])
+            if seq_before % 2 == 0:
+                values = block.values.copy()
+                timestamps = block.timestamps.copy()
+                if int(block.seq[0]) == seq_before:
+                    self._last_good = (values, timestamps)
+                    return values, timestamps
+            if time.monotonic() >= deadline:
+                if self._last_good is not None:
+                    print("[SharedMetricsReader] 警告: 共享内存一直处于写入状态，返回上一次的指标")
+                    return self._last_good
+                raise RuntimeError(
+                    f"共享内存 {self._cfg.shared_memory_name} 在 {timeout_sec:.1f} 秒内一直处于写入状态，"
+                    "采样守护进程可能已在写入中途退出"
+                )
+            time.sleep(0.0005)
+
+    def sample(self, timeout_sec: Optional[float] = None) -> Dict[str, float]:
+        """
+        与 MQTTSampler.sample 语义一致：等待 sample_wait_for_topics 在本次调用之后更新
+        （以及可选的派生速率 > 0），最多等待 timeout_sec 秒。
+        """
+        wait = timeout_sec if timeout_sec is not None else self._cfg.timeout_sec
+        start_time = time.time()
+        required = [self._index[t] for t in self._cfg.sample_wait_for_topics if t in self._index]
+        rate_index = self._index.get("$SYS/broker/messages/received_rate")
+        poll_sec = max(0.01, self._cfg.sample_poll_interval_sec)
+
+        values, timestamps = self._read_consistent()
+        while time.time() - start_time < wait:
+            ready = all(timestamps[i] >= start_time for i in required)
+            if ready and self._cfg.sample_wait_for_derived_rate and rate_index is not None:
+                ready = values[rate_index] > 0
+            if ready:
+                break
+            time.sleep(poll_sec)
+            values, timestamps = self._read_consistent()
+
+        metrics = {
+            topic: float(values[i])
+            for topic, i in self._index.items()
+            if not np.isnan(values[i])
+        }
+        print(f"[SharedMetricsReader] 采样完成，共读取 {len(metrics)} 条指标")
+        return metrics
+
+    def close(self) -> None:
+        if self._block is not None:
+            self._block.release()
+            self._block = None
+
+
+def run_sampler_daemon(cfg: MQTTConfig, name: str, publish_interval_sec: float = 0.1) -> None:
+    """运行 sampler 守护进程，直到收到 KeyboardInterrupt/SIGTERM。"""
+    writer = SharedMetricsWriter(name)
+    sampler: Optional[MQTTSampler] = None
+    print(f"[SamplerDaemon] 共享内存已创建: {writer.name}（{len(SHARED_SYS_TOPICS)} 个指标）")
+    try:
+        while True:
+            if sampler is None or not sampler._connected:
+                if sampler is not None:
+                    sampler.close()
+                try:
+                    sampler = MQTTSampler(cfg)
+                except Exception as exc:
+                    print(f"[SamplerDaemon] 连接 MQTT broker 失败，1 秒后重试: {exc}")
+                    sampler = None
+                    time.sleep(1.0)
+                    continue
+            writer.publish(*sampler.snapshot())
+            time.sleep(publish_interval_sec)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sampler is not None:
+            sampler.close()
+        writer.close()
+        print("[SamplerDaemon] 已退出")
+
+
+def main() -> None:
+    defaults = MQTTConfig()
+    parser = argparse.ArgumentParser(description="$SYS 指标共享内存采样守护进程")
+    parser.add_argument("--name", type=str, default="broker_tuner_sys", help="共享内存名称（默认：broker_tuner_sys）")
+    parser.add_argument("--host", type=str, default=defaults.host, help=f"MQTT broker 地址（默认：{defaults.host}）")
+    parser.add_argument("--port", type=int, default=defaults.port, help=f"MQTT broker 端口（默认：{defaults.port}）")
+    parser.add_argument("--interval", type=float, default=0.1, help="发布到共享内存的间隔秒数（默认：0.1）")
+    args = parser.parse_args()
+
+    import signal
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    cfg = MQTTConfig(host=args.host, port=args.port, client_id="broker_tuner_sampler_daemon")
+    run_sampler_daemon(cfg, args.name, publish_interval_sec=args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import json
+import math
+import os
+import re
+import sys
 import time
 import threading
-from typing import Dict, Optional, Tuple, List
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Sequence, Tuple, List, Union
 
 import numpy as np
 
@@ -22,6 +27,38 @@ try:
 except ImportError:  # 允许项目先不安装，运行时再报错更清晰
     mqtt = None  # type: ignore
 
+try:
+    import orjson  # 可选：直接从 bytes 解析 JSON，比标准库 json 快数倍
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+# 常用 $SYS 指标 key：驻留后与 _on_message 中 sys.intern 的 topic 是同一对象，dict 查找按 id 命中
+_K_CLIENTS = sys.intern("$SYS/broker/clients/connected")
+_K_UPTIME = sys.intern("$SYS/broker/uptime")
+_K_RECEIVED = sys.intern("$SYS/broker/messages/received")
+_K_RECEIVED_RATE = sys.intern("$SYS/broker/messages/received_rate")
+_K_RECEIVED_1MIN = sys.intern("$SYS/broker/load/messages/received/1min")
+_K_RECEIVED_1MIN_PER_SEC = sys.intern("$SYS/broker/load/messages/received/1min_per_sec")
+
+# 每个 pid 上一次读取的 (utime+stime 累计 ticks, time.monotonic_ns())，用于计算 CPU 占用增量
+_PROC_CPU_PREV: Dict[int, Tuple[float, int]] = {}
+try:
+    _CLK_TCK = float(os.sysconf("SC_CLK_TCK"))
+except (AttributeError, ValueError, OSError):
+    _CLK_TCK = 100.0
+
+
+class RateRec(NamedTuple):
+    """单个 topic 的速率估算记录：最近两次取值及样本数。只整体替换，从不原地修改。"""
+
+    prev_value: Optional[float]
+    prev_time: Optional[float]
+    last_value: float
+    last_time: float
+    count: int
+
 
 def _ensure_mqtt_available() -> None:
     if mqtt is None:
@@ -40,17 +77,8 @@ class MQTTSampler:
 
     def __init__(self, cfg: MQTTConfig):
         _ensure_mqtt_available()
-        self._cfg = cfg
+        self._init_state(cfg)
         self._client = mqtt.Client(client_id=cfg.client_id, clean_session=True)
-        self._metrics: Dict[str, float] = {}
-        self._metrics_ts: Dict[str, float] = {}
-        self._rx_seq = 0
-        self._lock = threading.Lock()
-        self._connected = False  # 连接状态标志
-        self._topic_prev: Dict[str, Tuple[float, float]] = {}
-        self._topic_last: Dict[str, Tuple[float, float]] = {}
-        self._topic_count: Dict[str, int] = {}
-
         self._client.on_connect = self._on_connect
         self._client.on_message = self._on_message
 
@@ -69,6 +97,27 @@ class MQTTSampler:
             print(f"[MQTTSampler] 连接失败: {e}")
             raise
 
+    def _init_state(self, cfg: MQTTConfig) -> None:
+        """初始化与传输无关的采样状态（子类可换用其他方式接收消息，再调用 _on_message）。"""
+        self._cfg = cfg
+        # 以下字典只由 paho 网络线程写入，读取方不加锁：
+        # 每次更新都是对单个 key 的一次引用赋值，dict() 拷贝在 GIL 下一次完成，读到的总是完整的值
+        self._metrics: Dict[str, float] = {}
+        self._metrics_ts: Dict[str, float] = {}
+        self._connected = False  # 连接状态标志
+        # topic -> RateRec；paho 线程每条消息发布一个新记录（单次 dict 赋值），读取方无需加锁即可拿到一致的记录
+        self._topic_records: Dict[str, RateRec] = {}
+        # sample() 等待的主题（含用于派生速率的 messages/received）更新时由 _on_message 唤醒 sample()
+        self._ready_event = threading.Event()
+        self._wake_topics = frozenset(getattr(cfg, "sample_wait_for_topics", [])) | {_K_RECEIVED}
+        # topics_exact 时只处理白名单中的主题，其余消息在解析 payload 前丢弃
+        self._interesting: Optional[frozenset] = None
+        if getattr(cfg, "topics_exact", False):
+            wildcard_topics = [t for t in cfg.topics if "#" in t or "+" in t]
+            if wildcard_topics:
+                raise ValueError(f"MQTTConfig.topics_exact=True 时 topics 不能包含通配符: {wildcard_topics}")
+            self._interesting = frozenset(sys.intern(t) for t in cfg.topics)
+
     # ---------- MQTT 回调 ----------
     def _on_connect(self, client, userdata, flags, rc):
         if rc != 0:
@@ -84,52 +133,57 @@ class MQTTSampler:
             print(f"[MQTTSampler] 连接失败: {error_msg}")
             return
         self._connected = True
-        for topic in self._cfg.topics:
-            client.subscribe(topic)
+        topics = _collapse_topic_filters(self._cfg.topics)
+        if topics:
+            # 一次 SUBSCRIBE 报文订阅全部主题，而不是每个主题单独往返
+            client.subscribe([(topic, 0) for topic in topics])
+
+    @staticmethod
+    def _topic_of(msg) -> str:
+        # 只使用公开的 msg.topic；驻留后各字典复用同一个 key 对象（哈希已缓存、按 id 比较）。
+        # 非数值消息在 _on_message 中提前返回，不会走到这里
+        return sys.intern(msg.topic)
 
     def _on_message(self, client, userdata, msg):
-        topic = msg.topic
-        payload = msg.payload.decode("utf-8", errors="ignore").strip()
-        value = _parse_numeric_payload(payload)
-        if value is not None:
-            now = time.time()
-            with self._lock:
-                self._rx_seq += 1
-                self._metrics[topic] = value
-                self._metrics_ts[topic] = now
-
-                last = self._topic_last.get(topic)
-                if last is not None:
-                    last_value, last_time = last
-                    if topic == "$SYS/broker/uptime" and value + 1e-6 < last_value:
-                        # broker 重启导致 uptime 回退；清理历史，避免跨重启计算速率
-                        self._topic_prev.pop(topic, None)
-                        self._topic_last[topic] = (value, now)
-                        self._topic_count[topic] = 1
-                    else:
-                        self._topic_prev[topic] = last
-                        self._topic_last[topic] = (value, now)
-                        self._topic_count[topic] = self._topic_count.get(topic, 0) + 1
-                else:
-                    self._topic_last[topic] = (value, now)
-                    self._topic_count[topic] = 1
-
-            if self._topic_count.get(topic, 0) <= 1:
-                print(f"[MQTTSampler] 收到消息: {topic} = {value}")
+        topic = None
+        if self._interesting is not None:
+            topic = self._topic_of(msg)
+            if topic not in self._interesting:
+                return
+        # payload 保持 bytes 直接解析（不 decode/strip）；非数值消息无需再解析 topic
+        value = _parse_numeric_payload(msg.payload)
+        if value is None:
+            return
+        if topic is None:
+            topic = self._topic_of(msg)
+
+        now = time.time()
+        self._metrics[topic] = value
+        self._metrics_ts[topic] = now
+
+        rec = self._topic_records.get(topic)
+        if rec is None or (topic == _K_UPTIME and value + 1e-6 < rec.last_value):
+            # 首条消息；或 broker 重启导致 uptime 回退，清理历史，避免跨重启计算速率
+            count = 1
+            self._topic_records[topic] = RateRec(None, None, value, now, count)
+        else:
+            count = rec.count + 1
+            self._topic_records[topic] = RateRec(rec.last_value, rec.last_time, value, now, count)
+
+        if topic in self._wake_topics:
+            self._ready_event.set()
+        if count <= 1:
+            print(f"[MQTTSampler] 收到消息: {topic} = {value}")
 
     def _compute_rate_from_history(
         self, topic: str, min_interval_sec: float, min_samples: int
     ) -> Optional[float]:
-        with self._lock:
-            prev = self._topic_prev.get(topic)
-            last = self._topic_last.get(topic)
-            count = self._topic_count.get(topic, 0)
-        if prev is None or last is None:
+        rec = self._topic_records.get(topic)
+        if rec is None or rec.prev_time is None:
             return None
-        if count < max(2, min_samples):
+        if rec.count < max(2, min_samples):
             return None
-        prev_value, prev_time = prev
-        last_value, last_time = last
+        prev_value, prev_time, last_value, last_time, _ = rec
         if last_time <= prev_time:
             return None
         if last_time - prev_time < min_interval_sec:
@@ -152,18 +206,20 @@ class MQTTSampler:
         def _is_required_topics_fresh() -> bool:
             if not required_topics:
                 return True
-            with self._lock:
-                for topic in required_topics:
-                    ts = self._metrics_ts.get(topic)
-                    if ts is None or ts < start_time:
-                        return False
+            metrics_ts = self._metrics_ts
+            for topic in required_topics:
+                ts = metrics_ts.get(topic)
+                if ts is None or ts < start_time:
+                    return False
             return True
 
-        while time.time() - start_time < wait:
+        while True:
+            # 先清除再检查：检查之后到达的消息会让下面的 wait 立即返回
+            self._ready_event.clear()
             ready = _is_required_topics_fresh()
             if ready and getattr(self._cfg, "sample_wait_for_derived_rate", True):
                 derived = self._compute_rate_from_history(
-                    "$SYS/broker/messages/received",
+                    _K_RECEIVED,
                     min_interval_sec=self._cfg.rate_min_interval_sec,
                     min_samples=self._cfg.rate_min_samples,
                 )
@@ -171,27 +227,66 @@ class MQTTSampler:
                     break
             if ready and not getattr(self._cfg, "sample_wait_for_derived_rate", True):
                 break
-            time.sleep(max(0.01, getattr(self._cfg, "sample_poll_interval_sec", 0.1)))
+            remaining = wait - (time.time() - start_time)
+            if remaining <= 0:
+                break
+            self._ready_event.wait(remaining)
+
+        # 只拷贝一次指标字典；时间戳字典仅 snapshot() 需要
+        metrics = dict(self._metrics)
+        self._add_derived_metrics(metrics)
+        print(f"[MQTTSampler] 采样完成，共收到 {len(metrics)} 条指标")
+        return metrics
 
-        with self._lock:
+    def sample_until(self, expected_prefixes: Sequence[str], max_wait: float) -> Dict[str, float]:
+        """
+        快速路径：不要求指标在本次调用之后刷新，只要每个前缀都已有匹配的指标
+        （如订阅时 broker 下发的保留 $SYS 消息）就立即返回，最多等待 max_wait 秒。
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            # 等待的主题更新时由 _on_message 唤醒，其余主题按 50ms 间隔检查
+            self._ready_event.clear()
             metrics = dict(self._metrics)
+            if all(any(topic.startswith(prefix) for topic in metrics) for prefix in expected_prefixes):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._ready_event.wait(min(remaining, 0.05))
+        self._add_derived_metrics(metrics)
+        return metrics
 
+    def snapshot(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        不等待，立即返回当前缓存的指标（含派生速率）及各指标最近一次更新时间。
+        返回：({topic: value}, {topic: time.time() 时间戳})
+        """
+        metrics = dict(self._metrics)
+        metrics_ts = dict(self._metrics_ts)
+        self._add_derived_metrics(metrics, metrics_ts)
+        return metrics, metrics_ts
+
+    def _add_derived_metrics(
+        self, metrics: Dict[str, float], metrics_ts: Optional[Dict[str, float]] = None
+    ) -> None:
+        """在 metrics（及可选的 metrics_ts）副本上补充派生速率指标。"""
         derived_rate = self._compute_rate_from_history(
-            "$SYS/broker/messages/received",
+            _K_RECEIVED,
             min_interval_sec=self._cfg.rate_min_interval_sec,
             min_samples=self._cfg.rate_min_samples,
         )
         if derived_rate is not None:
-            metrics["$SYS/broker/messages/received_rate"] = derived_rate
-        rate_1min_raw = metrics.get("$SYS/broker/load/messages/received/1min")
+            metrics[_K_RECEIVED_RATE] = derived_rate
+            if metrics_ts is not None:
+                metrics_ts[_K_RECEIVED_RATE] = metrics_ts.get(_K_RECEIVED, 0.0)
+        rate_1min_raw = metrics.get(_K_RECEIVED_1MIN)
         if rate_1min_raw is not None and rate_1min_raw > 0:
             divisor = self._cfg.rate_1min_divisor
             if divisor and divisor > 0:
-                metrics["$SYS/broker/load/messages/received/1min_per_sec"] = (
-                    rate_1min_raw / divisor
-                )
-        print(f"[MQTTSampler] 采样完成，共收到 {len(metrics)} 条指标")
-        return metrics
+                metrics[_K_RECEIVED_1MIN_PER_SEC] = rate_1min_raw / divisor
+                if metrics_ts is not None:
+                    metrics_ts[_K_RECEIVED_1MIN_PER_SEC] = metrics_ts.get(_K_RECEIVED_1MIN, 0.0)
 
     def close(self):
         try:
@@ -201,26 +296,55 @@ class MQTTSampler:
             pass
 
 
-def _parse_numeric_payload(payload: str) -> Optional[float]:
-    # 大部分 $SYS payload 是纯数字或简单字符串，这里做一个尽量鲁棒的解析
+def create_sampler(cfg: MQTTConfig):
+    """根据配置返回读取守护进程共享内存的 SharedMetricsReader 或独立的 MQTTSampler。"""
+    if cfg.shared_memory_name:
+        from .shared_sampler import SharedMetricsReader
+
+        return SharedMetricsReader(cfg)
+    return MQTTSampler(cfg)
+
+
+def _collapse_topic_filters(topics) -> List[str]:
+    """
+    去重并合并订阅主题：已被 "xxx/#" 覆盖的主题不再单独订阅
+    （否则 broker 可能对重叠订阅重复投递同一条消息）。
+    """
+    unique = list(dict.fromkeys(topics))
+    wildcard_prefixes = tuple(t[:-1] for t in unique if t.endswith("/#"))
+    collapsed = []
+    for topic in unique:
+        covered = any(
+            topic != prefix + "#" and (topic.startswith(prefix) or topic == prefix[:-1])
+            for prefix in wildcard_prefixes
+        )
+        if not covered:
+            collapsed.append(topic)
+    return collapsed
+
+
+# "123 seconds" / "123s" 这类 uptime 格式
+_SECONDS_PAYLOAD_RE = re.compile(rb"\s*([-+]?\d+(?:\.\d+)?)\s*s(?:econds?)?\s*", re.IGNORECASE)
+
+
+def _parse_numeric_payload(payload: Union[bytes, str]) -> Optional[float]:
+    # 大部分 $SYS payload 是纯数字，float() 直接接受 bytes（含首尾空白），无需先 decode
     try:
         return float(payload)
     except ValueError:
         pass
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8", errors="ignore")
 
-    # 处理 "123 seconds" 或 "123s" 这类 uptime 格式
-    lowered = payload.lower()
-    if "second" in lowered or lowered.endswith("s"):
-        tokens = lowered.replace("seconds", "").replace("second", "").strip().split()
-        if tokens:
-            try:
-                return float(tokens[0])
-            except ValueError:
-                pass
+    m = _SECONDS_PAYLOAD_RE.fullmatch(payload)
+    if m is not None:
+        return float(m.group(1))
 
     # 尝试解析 JSON 里名为 value 的字段
+    if not payload.lstrip().startswith(b"{"):
+        return None
     try:
-        obj = json.loads(payload)
+        obj = _json_loads(payload)
         if isinstance(obj, dict) and "value" in obj:
             return float(obj["value"])
     except Exception:
@@ -228,80 +352,181 @@ def _parse_numeric_payload(payload: str) -> Optional[float]:
     return None
 
 
+def _proc_status_field(buf: bytes, key: bytes) -> float:
+    """从 /proc/<pid>/status 内容中取 key（形如 b"\\nVmRSS:"）后的第一个数值，不存在返回 0。"""
+    start = buf.find(key)
+    if start < 0:
+        return 0.0
+    start += len(key)
+    end = buf.find(b"\n", start)
+    fields = buf[start:end].split(None, 1)
+    try:
+        return float(fields[0])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+class ProcReader:
+    """
+    持有 /proc/<pid>/status 与 /proc/<pid>/stat 的 fd 并跨采样周期复用：
+    每次用 os.pread(fd, 8192, 0) 从头重新读取，省去每次 open/close 的系统调用。
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._status_fd = -1
+        self._stat_fd = -1
+
+    def _open(self) -> None:
+        self._status_fd = os.open(f"/proc/{self.pid}/status", os.O_RDONLY)
+        try:
+            self._stat_fd = os.open(f"/proc/{self.pid}/stat", os.O_RDONLY)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for fd in (self._status_fd, self._stat_fd):
+            if fd >= 0:
+                os.close(fd)
+        self._status_fd = -1
+        self._stat_fd = -1
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def read_raw(self) -> Optional[Tuple[bytes, bytes]]:
+        """返回 (status 内容, stat 内容)；进程不存在时返回 None。"""
+        for _ in range(2):
+            try:
+                if self._status_fd < 0:
+                    self._open()
+                return os.pread(self._status_fd, 8192, 0), os.pread(self._stat_fd, 8192, 0)
+            except FileNotFoundError:
+                break
+            except ProcessLookupError:
+                # fd 对应的进程已退出（ESRCH）；pid 可能已被新进程复用，重新打开一次
+                self.close()
+                _PROC_CPU_PREV.pop(self.pid, None)
+        self.close()
+        _PROC_CPU_PREV.pop(self.pid, None)
+        return None
+
+    def read(self, cfg: ProcConfig, now_ns: Optional[int] = None) -> Tuple[float, float, float]:
+        """读取本进程的 (cpu_ratio, mem_ratio, ctxt_ratio)，含义同 read_proc_metrics；进程已退出时返回全 0。"""
+        bufs = self.read_raw()
+        if bufs is None:
+            return 0.0, 0.0, 0.0
+        return _proc_metrics_from_buffers(self.pid, bufs[0], bufs[1], cfg, now_ns or time.monotonic_ns())
+
+
+# read_proc_metrics / read_proc_metrics_many 按 pid 复用的 ProcReader
+_PROC_READERS: Dict[int, ProcReader] = {}
+
+
+def _proc_reader(pid: int) -> ProcReader:
+    reader = _PROC_READERS.get(pid)
+    if reader is None:
+        # 新 pid 出现（如 broker 重启）时顺带释放已退出进程的 fd
+        for old_pid in [p for p in _PROC_READERS if not os.path.exists(f"/proc/{p}")]:
+            _PROC_READERS.pop(old_pid).close()
+        reader = _PROC_READERS[pid] = ProcReader(pid)
+    return reader
+
+
 def read_proc_metrics(cfg: ProcConfig) -> Tuple[float, float, float]:
     """
     从 /proc/<pid>/stat 与 /proc/<pid>/status 中提取：
-    - cpu_ratio: 进程 CPU 占比（简单近似）
+    - cpu_ratio: 两次调用之间进程 CPU 占用百分比 / cpu_norm
+      （同一 pid 首次调用时使用进程启动以来的平均占用）
     - mem_ratio: RSS / mem_norm
     - ctxt_ratio: (voluntary_ctxt_switches + nonvoluntary) / ctxt_norm
-
-    注意：这里的 CPU 估算比较粗糙，实际可结合 /proc/stat 做更精确的 delta 计算。
     """
     if cfg.pid <= 0:
         raise ValueError(f"ProcConfig.pid 未设置或非法 (当前值: {cfg.pid})，请正确配置 Mosquitto 进程 PID")
+    return _proc_reader(cfg.pid).read(cfg)
+
 
+def read_proc_metrics_many(cfg: ProcConfig, pids: List[int]) -> Dict[int, Tuple[float, float, float]]:
+    """
+    一次读取多个进程的 (cpu_ratio, mem_ratio, ctxt_ratio)，归一化参数取自 cfg（忽略 cfg.pid）。
+    同一批次共用一个时间戳，各 pid 的 CPU 增量对应同一采样时刻；已退出的进程返回全 0。
+    """
+    now_ns = time.monotonic_ns()
+    return {pid: _proc_reader(pid).read(cfg, now_ns) for pid in pids if pid > 0}
+
+
+def _proc_metrics_from_buffers(
+    pid: int, status_buf: bytes, stat_buf: bytes, cfg: ProcConfig, now_ns: int
+) -> Tuple[float, float, float]:
     # --- 内存 & 上下文切换 ---
-    rss_bytes = 0.0
-    ctxt_switches = 0.0
+    # VmRSS 单位通常是 kB
+    rss_bytes = _proc_status_field(status_buf, b"\nVmRSS:") * 1024.0
+    ctxt_switches = _proc_status_field(status_buf, b"\nvoluntary_ctxt_switches:") + _proc_status_field(
+        status_buf, b"\nnonvoluntary_ctxt_switches:"
+    )
 
-    status_path = f"/proc/{cfg.pid}/status"
-    try:
-        with open(status_path, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                if line.startswith("VmRSS:"):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        # 单位通常是 kB
-                        rss_kb = float(parts[1])
-                        rss_bytes = rss_kb * 1024.0
-                elif line.startswith("voluntary_ctxt_switches") or line.startswith(
-                    "nonvoluntary_ctxt_switches"
-                ):
-                    parts = line.split()
-                    if parts and parts[-1].isdigit():
-                        ctxt_switches += float(parts[-1])
-    except FileNotFoundError:
-        # 进程已退出
-        return 0.0, 0.0, 0.0
-
-    # --- CPU 使用（粗略，读取 utime+stime）---
-    stat_path = f"/proc/{cfg.pid}/stat"
+    # --- CPU 使用（utime+stime 的时间差分）---
     cpu_ticks = 0.0
-    try:
-        with open(stat_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read().strip()
-        parts = content.split()
-        # utime 在第 14 列，stime 在第 15 列（从 1 开始计）
-        if len(parts) >= 15:
-            utime = float(parts[13])
-            stime = float(parts[14])
-            cpu_ticks = utime + stime
-    except FileNotFoundError:
-        return 0.0, 0.0, 0.0
-
-    # 简单归一化，实际可根据时间差再做 delta
-    cpu_ratio = min(cpu_ticks / max(cfg.cpu_norm, 1.0), 1.0)
+    start_ticks = 0.0
+    # comm（第 2 列）可能包含空格和括号，从最后一个 ")" 之后切分，parts[0] 为第 3 列 state
+    parts = stat_buf[stat_buf.rfind(b")") + 2:].split(None, 20)
+    # utime/stime 在第 14/15 列，starttime 在第 22 列（从 1 开始计）
+    if len(parts) >= 20:
+        cpu_ticks = float(parts[11]) + float(parts[12])
+        start_ticks = float(parts[19])
+
+    cpu_percent = 0.0
+    prev = _PROC_CPU_PREV.get(pid)
+    _PROC_CPU_PREV[pid] = (cpu_ticks, now_ns)
+    if prev is not None and cpu_ticks >= prev[0] and now_ns > prev[1]:
+        elapsed_sec = (now_ns - prev[1]) / 1e9
+        cpu_percent = (cpu_ticks - prev[0]) / _CLK_TCK / elapsed_sec * 100.0
+    else:
+        # 首次采样：用进程启动以来的平均占用（/proc/uptime 与 starttime 同为开机后时间）
+        try:
+            with open("/proc/uptime", "r", encoding="utf-8") as f:
+                uptime_sec = float(f.read().split()[0])
+            elapsed_sec = uptime_sec - start_ticks / _CLK_TCK
+            if elapsed_sec > 0:
+                cpu_percent = cpu_ticks / _CLK_TCK / elapsed_sec * 100.0
+        except (OSError, ValueError, IndexError):
+            pass
+
+    cpu_ratio = min(cpu_percent / max(cfg.cpu_norm, 1.0), 1.0)
     mem_ratio = min(rss_bytes / max(cfg.mem_norm, 1.0), 1.0)
     ctxt_ratio = min(ctxt_switches / max(cfg.ctxt_norm, 1.0), 1.0)
     
-    # 确保返回值是有效数值
-    cpu_ratio = float(cpu_ratio) if not (np.isnan(cpu_ratio) or np.isinf(cpu_ratio)) else 0.0
-    mem_ratio = float(mem_ratio) if not (np.isnan(mem_ratio) or np.isinf(mem_ratio)) else 0.0
-    ctxt_ratio = float(ctxt_ratio) if not (np.isnan(ctxt_ratio) or np.isinf(ctxt_ratio)) else 0.0
+    # 确保返回值是有效数值（标量用 math.isfinite，避免 numpy 标量函数的调用开销）
+    cpu_ratio = float(cpu_ratio) if math.isfinite(cpu_ratio) else 0.0
+    mem_ratio = float(mem_ratio) if math.isfinite(mem_ratio) else 0.0
+    ctxt_ratio = float(ctxt_ratio) if math.isfinite(ctxt_ratio) else 0.0
     
     return cpu_ratio, mem_ratio, ctxt_ratio
 
 
+def make_history_window(size: int = 5) -> Deque[float]:
+    """创建滑动窗口历史：定长 deque，append 时自动淘汰最旧的值（O(1)，无需 list.pop(0)）。"""
+    return deque(maxlen=size)
+
+
+# build_state_vector 的写入缓冲区，避免每步构造临时列表和数组
+_STATE_BUF = np.empty(10, dtype=np.float32)
+
+
 def build_state_vector(
     broker_metrics: Dict[str, float],
     cpu_ratio: float,
     mem_ratio: float,
     ctxt_ratio: float,
     queue_depth: float = 0.0,
-    throughput_history: Optional[List[float]] = None,
+    throughput_history: Optional[Sequence[float]] = None,
     latency_p50: float = 0.0,
     latency_p95: float = 0.0,
-    latency_history: Optional[List[float]] = None,
+    latency_history: Optional[Sequence[float]] = None,
     rate_1min_window_sec: float = 60.0,
 ) -> np.ndarray:
     """
@@ -318,22 +543,18 @@ def build_state_vector(
     - [7] 队列深度（归一化）
     - [8] 最近5步平均吞吐量（滑动窗口）
     - [9] 最近5步平均延迟（滑动窗口）
+
+    throughput_history / latency_history 可以是 list，也可以是 make_history_window() 创建的定长 deque。
     """
     # 这些 key 可根据你的 broker 实际暴露的 $SYS 主题进行调整
-    clients_connected = broker_metrics.get(
-        "$SYS/broker/clients/connected", 0.0
-    )
+    clients_connected = broker_metrics.get(_K_CLIENTS, 0.0)
     
     # 优先使用采样窗口估算的速率，其次使用 1min 平均速率（换算为 msg/s）
     # 采样窗口速率与当前 action 更同步；1min 更平滑但滞后
-    messages_rate_derived = broker_metrics.get(
-        "$SYS/broker/messages/received_rate"
-    )
-    messages_rate_1min_per_sec = broker_metrics.get(
-        "$SYS/broker/load/messages/received/1min_per_sec"
-    )
+    messages_rate_derived = broker_metrics.get(_K_RECEIVED_RATE)
+    messages_rate_1min_per_sec = broker_metrics.get(_K_RECEIVED_1MIN_PER_SEC)
 
-    uptime_sec = broker_metrics.get("$SYS/broker/uptime")
+    uptime_sec = broker_metrics.get(_K_UPTIME)
     use_derived = (
         messages_rate_derived is not None and messages_rate_derived > 0
     )
@@ -366,31 +587,31 @@ def build_state_vector(
     # 队列深度归一化（假设 1000 为 1.0）
     queue_depth_norm = queue_depth / 1000.0
 
-    # 历史信息：滑动窗口平均值
-    throughput_avg = np.mean(throughput_history) if throughput_history else msg_rate_norm
-    latency_avg = np.mean(latency_history) if latency_history else latency_p50_norm
+    # 历史信息：滑动窗口平均值（窗口只有几个元素，纯 Python 求均值比 np.mean 开销小得多）
+    throughput_avg = sum(throughput_history) / len(throughput_history) if throughput_history else msg_rate_norm
+    latency_avg = sum(latency_history) / len(latency_history) if latency_history else latency_p50_norm
 
     # 归一化历史平均值（历史值本身已是归一化）
     throughput_avg_norm = throughput_avg
     latency_avg_norm = latency_avg
 
-    state = np.array(
-        [
-            clients_norm,          # [0] 连接数归一化
-            msg_rate_norm,         # [1] 消息速率归一化
-            cpu_ratio,             # [2] CPU使用率
-            mem_ratio,             # [3] 内存使用率
-            ctxt_ratio,            # [4] 上下文切换率
-            latency_p50_norm,      # [5] P50延迟归一化
-            latency_p95_norm,      # [6] P95延迟归一化
-            queue_depth_norm,      # [7] 队列深度归一化
-            throughput_avg_norm,   # [8] 最近5步吞吐量平均
-            latency_avg_norm,      # [9] 最近5步平均延迟
-        ],
-        dtype=np.float32,
+    state = _STATE_BUF
+    state[:] = (
+        clients_norm,          # [0] 连接数归一化
+        msg_rate_norm,         # [1] 消息速率归一化
+        cpu_ratio,             # [2] CPU使用率
+        mem_ratio,             # [3] 内存使用率
+        ctxt_ratio,            # [4] 上下文切换率
+        latency_p50_norm,      # [5] P50延迟归一化
+        latency_p95_norm,      # [6] P95延迟归一化
+        queue_depth_norm,      # [7] 队列深度归一化
+        throughput_avg_norm,   # [8] 最近5步吞吐量平均
+        latency_avg_norm,      # [9] 最近5步平均延迟
     )
-    
-    # 确保所有值都是有效数值（替换NaN/Inf为0）
-    state = np.nan_to_num(state, nan=0.0, posinf=1e6, neginf=-1e6)
-    
-    return state
+
+    # 确保所有值都是有效数值（替换NaN/Inf为0）；按 float32 检查，超出 float32 范围的值同样视为 Inf
+    if not all(map(math.isfinite, state.tolist())):
+        np.nan_to_num(state, copy=False, nan=0.0, posinf=1e6, neginf=-1e6)
+
+    # 调用方会保留上一步状态，返回副本而不是共享缓冲区
+    return state.copy()
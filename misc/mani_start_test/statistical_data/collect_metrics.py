@@ -13,19 +13,30 @@ import os
 import time
 import json
 import argparse
+import subprocess
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from script.workload import WorkloadManager, WorkloadConfig
-from environment.utils import MQTTSampler, read_proc_metrics
+from environment.utils import MQTTSampler, read_proc_metrics_many
 from environment.config import MQTTConfig, ProcConfig
 
 
+def _find_mosquitto_pids() -> List[int]:
+    """返回所有名为 mosquitto 的进程 PID（pgrep 不可用时返回空列表）"""
+    try:
+        result = subprocess.run(["pgrep", "-x", "mosquitto"], capture_output=True, text=True, timeout=2)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return []
+    return [int(line) for line in result.stdout.split() if line.isdigit()]
+
+
 def collect_broker_metrics(
     broker_host: str = "127.0.0.1",
     broker_port: int = 1883,
@@ -72,6 +83,8 @@ def collect_broker_metrics(
     # 创建工作负载管理器
     workload = None
     sampler = None
+    # 后台线程创建的采样器（或创建时的异常）
+    sampler_box: Dict[str, Any] = {}
     
     # 记录开始时间
     workload_start_time = time.time()
@@ -88,23 +101,42 @@ def collect_broker_metrics(
         print("✅ 工作负载已启动")
         print()
         
+        # 在等待负载稳定期间后台创建 MQTT 采样器，连接耗时（最多 5 秒）与等待重叠
+        mqtt_config = MQTTConfig(
+            host=broker_host,
+            port=broker_port,
+            timeout_sec=12.0,
+        )
+
+        def _init_sampler() -> None:
+            try:
+                sampler_box["sampler"] = MQTTSampler(mqtt_config)
+            except Exception as exc:
+                sampler_box["error"] = exc
+
+        sampler_thread = threading.Thread(target=_init_sampler, daemon=True)
+        sampler_thread.start()
+
         # 等待负载稳定（50秒）
         stable_wait_seconds = 50
         print(f"2. 等待负载稳定（{stable_wait_seconds}秒）...")
-        for i in range(stable_wait_seconds, 0, -5):
-            print(f"   剩余时间: {i} 秒...", end='\r')
-            time.sleep(5)
-        print("   负载已稳定" + " " * 20)  # 清除进度行
+        if sys.stdout.isatty():
+            for i in range(stable_wait_seconds, 0, -5):
+                print(f"   剩余时间: {i} 秒...", end='\r')
+                time.sleep(5)
+            print("   负载已稳定" + " " * 20)  # 清除进度行
+        else:
+            # 非交互输出（重定向到文件/管道）时不需要倒计时，一次 sleep 即可
+            time.sleep(stable_wait_seconds)
+            print("   负载已稳定")
         print()
         
         # 初始化 MQTT 采样器
         print("3. 初始化性能指标采样器...")
-        mqtt_config = MQTTConfig(
-            host=broker_host,
-            port=broker_port,
-            timeout_sec=12.0,
-        )
-        sampler = MQTTSampler(mqtt_config)
+        sampler_thread.join()
+        if "error" in sampler_box:
+            raise sampler_box["error"]
+        sampler = sampler_box["sampler"]
         print("✅ 采样器已初始化")
         print()
         
@@ -217,10 +249,16 @@ def collect_broker_metrics(
         
         # 收集进程指标
         print("5. 收集进程性能指标...")
-        cpu_ratio, mem_ratio, ctxt_ratio = read_proc_metrics(proc_config)
+        pids = [proc_config.pid] + [pid for pid in _find_mosquitto_pids() if pid != proc_config.pid]
+        per_pid_metrics = read_proc_metrics_many(proc_config, pids)
+        cpu_ratio, mem_ratio, ctxt_ratio = per_pid_metrics.get(proc_config.pid, (0.0, 0.0, 0.0))
         print(f"✅ CPU 使用率: {cpu_ratio:.4f}")
         print(f"✅ 内存使用率: {mem_ratio:.4f}")
         print(f"✅ 上下文切换率: {ctxt_ratio:.4f}")
+        if len(per_pid_metrics) > 1:
+            print(f"   共检测到 {len(per_pid_metrics)} 个 Mosquitto 进程:")
+            for pid, (p_cpu, p_mem, p_ctxt) in per_pid_metrics.items():
+                print(f"   - PID {pid}: CPU {p_cpu:.4f}, 内存 {p_mem:.4f}, 上下文切换 {p_ctxt:.4f}")
         print()
         
         # 构建结果字典
@@ -242,6 +280,14 @@ def collect_broker_metrics(
                 "mem_ratio": float(mem_ratio),
                 "ctxt_ratio": float(ctxt_ratio),
             },
+            "all_process_metrics": {
+                str(pid): {
+                    "cpu_ratio": float(p_cpu),
+                    "mem_ratio": float(p_mem),
+                    "ctxt_ratio": float(p_ctxt),
+                }
+                for pid, (p_cpu, p_mem, p_ctxt) in per_pid_metrics.items()
+            },
         }
         
         # 保存到文件
@@ -297,6 +343,8 @@ def collect_broker_metrics(
     finally:
         # 清理资源
         print("\n7. 清理资源...")
+        # 等待期间出错时，后台线程创建的采样器尚未赋给 sampler
+        sampler = sampler or sampler_box.get("sampler")
         if sampler:
             sampler.close()
             print("✅ 采样器已关闭")
@@ -5,12 +5,13 @@ DDPG 模型模块。
 - CustomDDPGPolicy: 自定义 DDPG 策略类
 - CustomActor: 自定义 Actor 网络
 - CustomCritic: 自定义 Critic 网络
+- build_actor / build_critic: 创建 Actor/Critic（可选 torch.compile 形状特化）
 - EnhancedDDPG: 支持 PER/N-step 的 DDPG
 - FeatureWiseAttentionExtractor: 特征注意力提取器
 - PrioritizedNStepReplayBuffer: 支持 PER + N-step 的回放缓冲
 """
 
-from .ddpg import CustomActor, CustomCritic, CustomDDPGPolicy
+from .ddpg import CustomActor, CustomCritic, CustomDDPGPolicy, build_actor, build_critic
 from .enhanced_ddpg import EnhancedDDPG
 from .attention_extractor import FeatureWiseAttentionExtractor
 from .prioritized_nstep_replay_buffer import (
@@ -26,4 +27,6 @@ __all__ = [
     "FeatureWiseAttentionExtractor",
     "PrioritizedNStepReplayBuffer",
     "PrioritizedReplayBufferSamples",
+    "build_actor",
+    "build_critic",
 ]
@@ -7,6 +7,9 @@ DDPG 算法的自定义网络结构和策略实现。
 - CustomDDPGPolicy: 基于 stable-baselines3 DDPGPolicy 的自定义策略
 """
 
+import copy
+from typing import Optional
+
 import torch
 import torch.nn as nn
 import numpy as np
@@ -51,40 +54,97 @@ except (ImportError, AttributeError) as e:
 
 
 
+@torch.no_grad()
+def _fold_norm_affine(seq: nn.Sequential) -> nn.Sequential:
+    """
+    推理用：去掉 Dropout，并把 LayerNorm 的逐元素仿射参数折叠进紧随其后的 Linear。
+
+    LayerNorm(x) = n(x) * w + b（n 为无参数的标准化），因此
+    Linear(LayerNorm(x)) = (W * w) n(x) + (W @ b + c)，LayerNorm 只保留标准化部分。
+    """
+    layers = [m for m in seq if not isinstance(m, nn.Dropout)]
+    fused = []
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        nxt = layers[i + 1] if i + 1 < len(layers) else None
+        if (
+            isinstance(layer, nn.LayerNorm)
+            and isinstance(nxt, nn.Linear)
+            and layer.elementwise_affine
+            and len(layer.normalized_shape) == 1
+        ):
+            weight = layer.weight
+            bias = layer.bias if layer.bias is not None else torch.zeros_like(weight)
+            linear = nn.Linear(nxt.in_features, nxt.out_features).to(nxt.weight)
+            linear.weight.copy_(nxt.weight * weight)
+            linear.bias.copy_(nxt.weight @ bias + nxt.bias)
+            fused.append(nn.LayerNorm(layer.normalized_shape, eps=layer.eps, elementwise_affine=False))
+            fused.append(linear)
+            i += 2
+        else:
+            fused.append(layer)
+            i += 1
+    return nn.Sequential(*fused)
+
+
+def _linear(in_features: int, out_features: int) -> nn.Linear:
+    """创建 Linear 并在构造时完成初始化：权重 N(0, 1e-2)，偏置 U(-0.1, 0.1)。"""
+    layer = nn.Linear(in_features, out_features)
+    nn.init.normal_(layer.weight, mean=0.0, std=1e-2)
+    nn.init.uniform_(layer.bias, -0.1, 0.1)
+    return layer
+
+
+def _trunk(in_features: int, out_features: int) -> nn.Sequential:
+    """Linear + Tanh 分支，Critic 的状态分支与动作分支共用此结构。"""
+    return nn.Sequential(
+        _linear(in_features, out_features),
+        nn.Tanh(),
+    )
+
+
+def _maybe_compile(module: nn.Module, **compile_kwargs) -> nn.Module:
+    """torch>=2.0 时使用 torch.compile 融合算子；不可用或编译失败时返回原模块。"""
+    compile_fn = getattr(torch, "compile", None)
+    if compile_fn is None:
+        return module
+    try:
+        return compile_fn(module, **compile_kwargs)
+    except Exception:
+        return module
+
+
 class CustomActor(nn.Module):
     """
     自定义 Actor 网络（策略网络），输出动作值。
 
     网络结构：
     - 输入：状态向量 (state_dim)
-    - 输出：动作向量 (action_dim)，范围 [0, 1]（通过 Sigmoid）
+    - 输出：动作向量 (action_dim)，范围 [0, 1]（通过 Sigmoid）；
+      squash_output=True 时线性映射为 2·Sigmoid−1 ∈ [-1, 1]，即 SB3 策略约定的归一化动作
+      （SB3 的 unscale_action 再把 [-1, 1] 映射回动作空间 [low, high]）
     """
 
-    def __init__(self, state_dim: int, action_dim: int):
+    def __init__(self, state_dim: int, action_dim: int, squash_output: bool = False):
         super().__init__()
+        self.squash_output = squash_output
 
         self.net = nn.Sequential(
-            nn.Linear(state_dim, 128),
+            _linear(state_dim, 128),
             nn.LeakyReLU(0.2),
-            nn.BatchNorm1d(128),
-            nn.Linear(128, 128),
+            nn.LayerNorm(128),
+            _linear(128, 128),
             nn.Tanh(),
             nn.Dropout(0.3),
-            nn.Linear(128, 64),
+            _linear(128, 64),
             nn.Tanh(),
-            nn.BatchNorm1d(64),
-            nn.Linear(64, action_dim),
+            nn.LayerNorm(64),
+            _linear(64, action_dim),
             nn.Sigmoid(),  # 输出范围 [0, 1]，对应动作空间的归一化
         )
-
-        self._init_weights()
-
-    def _init_weights(self) -> None:
-        """初始化网络权重"""
-        for m in self.modules():
-            if isinstance(m, nn.Linear):
-                nn.init.normal_(m.weight, mean=0.0, std=1e-2)
-                nn.init.uniform_(m.bias, -0.1, 0.1)
+        # 推理副本可切换到低精度（如 bfloat16）计算，输入输出仍为 float32
+        self._compute_dtype: Optional[torch.dtype] = None
 
     def forward(self, obs: torch.Tensor) -> torch.Tensor:
         """
@@ -93,7 +153,32 @@ class CustomActor(nn.Module):
         Returns:
             动作张量，shape (batch_size, action_dim) 或 (action_dim,)
         """
-        return self.net(obs)
+        if self._compute_dtype is None:
+            out = self.net(obs)
+        else:
+            out = self.net(obs.to(self._compute_dtype)).float()
+        return out * 2.0 - 1.0 if self.squash_output else out
+
+    def set_training_mode(self, mode: bool) -> None:
+        """SB3 策略通过该方法切换 train/eval（与 stable_baselines3 BasePolicy 接口一致）。"""
+        self.train(mode)
+
+    def fuse_for_inference(self, dtype: Optional[torch.dtype] = None) -> "CustomActor":
+        """
+        去掉 Dropout，并将 LayerNorm 的仿射参数折叠进相邻 Linear（需先调用 eval()），之后不可再用于训练。
+
+        Args:
+            dtype: 若指定（如 torch.bfloat16），权重转换为该精度，forward 内部以该精度计算
+        Returns:
+            self，便于链式调用：actor.eval().fuse_for_inference()
+        """
+        if self.training:
+            raise RuntimeError("fuse_for_inference() 需要在 eval() 之后调用")
+        self.net = _fold_norm_affine(self.net)
+        if dtype is not None and dtype != torch.float32:
+            self.net.to(dtype=dtype)
+            self._compute_dtype = dtype
+        return self
 
 
 
@@ -109,36 +194,20 @@ class CustomCritic(nn.Module):
     def __init__(self, state_dim: int, action_dim: int):
         super().__init__()
 
-        self.state_net = nn.Sequential(
-            nn.Linear(state_dim, 128),
-            nn.Tanh(),
-        )
-
-        self.action_net = nn.Sequential(
-            nn.Linear(action_dim, 128),
-            nn.Tanh(),
-        )
+        self.state_net = _trunk(state_dim, 128)
+        self.action_net = _trunk(action_dim, 128)
 
         self.q_net = nn.Sequential(
-            nn.Linear(256, 256),
+            _linear(256, 256),
             nn.LeakyReLU(0.2),
-            nn.BatchNorm1d(256),
-            nn.Linear(256, 64),
+            nn.LayerNorm(256),
+            _linear(256, 64),
             nn.Tanh(),
             nn.Dropout(0.3),
-            nn.BatchNorm1d(64),
-            nn.Linear(64, 1),
+            nn.LayerNorm(64),
+            _linear(64, 1),
         )
 
-        self._init_weights()
-
-    def _init_weights(self) -> None:
-        """初始化网络权重"""
-        for m in self.modules():
-            if isinstance(m, nn.Linear):
-                nn.init.normal_(m.weight, mean=0.0, std=1e-2)
-                nn.init.uniform_(m.bias, -0.1, 0.1)
-
     def forward(self, obs: torch.Tensor, actions: torch.Tensor) -> torch.Tensor:
         """
         Args:
@@ -152,6 +221,34 @@ class CustomCritic(nn.Module):
         x = torch.cat([s, a], dim=1)
         return self.q_net(x)
 
+    def set_training_mode(self, mode: bool) -> None:
+        """同 CustomActor.set_training_mode。"""
+        self.train(mode)
+
+    def fuse_for_inference(self) -> "CustomCritic":
+        """对 q_net 做与 CustomActor.fuse_for_inference 相同的折叠（需先调用 eval()），之后不可再用于训练。"""
+        if self.training:
+            raise RuntimeError("fuse_for_inference() 需要在 eval() 之后调用")
+        self.q_net = _fold_norm_affine(self.q_net)
+        return self
+
+
+def build_actor(state_dim: int, action_dim: int, use_compile: bool = False, squash_output: bool = False) -> nn.Module:
+    """
+    创建 CustomActor；use_compile=True 时以 torch.compile(dynamic=False) 按固定输入形状特化。
+    squash_output 见 CustomActor。
+
+    注意：编译后的模块 state_dict 键带 "_orig_mod." 前缀，与未编译模型的检查点不通用。
+    """
+    actor = CustomActor(state_dim, action_dim, squash_output=squash_output)
+    return _maybe_compile(actor, dynamic=False) if use_compile else actor
+
+
+def build_critic(state_dim: int, action_dim: int, use_compile: bool = False) -> nn.Module:
+    """创建 CustomCritic；use_compile 含义同 build_actor。"""
+    critic = CustomCritic(state_dim, action_dim)
+    return _maybe_compile(critic, dynamic=False) if use_compile else critic
+
 
 class CustomDDPGPolicy(DDPGPolicy):
     """
@@ -163,29 +260,53 @@ class CustomDDPGPolicy(DDPGPolicy):
         通过 tuner.utils.make_ddpg_model() 创建模型，而不是直接实例化此类。
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, compile_networks: bool = False, **kwargs):
+        # 父类 __init__ 中会调用 make_actor/make_critic，需先设置
+        self.compile_networks = compile_networks
         super().__init__(*args, **kwargs)
 
-    def make_actor(self) -> CustomActor:
+    def make_actor(self, features_extractor: Optional[nn.Module] = None) -> nn.Module:
         """
         创建自定义 Actor 网络。
+        CustomActor 直接以原始状态向量为输入，SB3 传入的 features_extractor 不使用。
 
         Returns:
-            CustomActor 实例，已移动到指定设备（CPU/GPU）
+            CustomActor 实例（compile_networks=True 时为其 torch.compile 包装），已移动到指定设备（CPU/GPU）
         """
-        return CustomActor(
+        # DDPGPolicy 的 squash_output=True：actor 输出须在 [-1, 1]，与回放缓冲区中的动作、
+        # 以及 predict 中的 unscale_action 一致，否则 Sigmoid 的 [0, 1] 只会落在动作空间的上半部分
+        return build_actor(
             self.observation_space.shape[0],
             self.action_space.shape[0],
+            use_compile=self.compile_networks,
+            squash_output=True,
         ).to(self.device)
 
-    def make_critic(self) -> CustomCritic:
+    def make_critic(self, features_extractor: Optional[nn.Module] = None) -> nn.Module:
         """
-        创建自定义 Critic 网络。
+        创建自定义 Critic 网络（features_extractor 同样不使用）。
 
         Returns:
-            CustomCritic 实例，已移动到指定设备（CPU/GPU）
+            CustomCritic 实例（compile_networks=True 时为其 torch.compile 包装），已移动到指定设备（CPU/GPU）
         """
-        return CustomCritic(
+        return build_critic(
             self.observation_space.shape[0],
             self.action_space.shape[0],
-        ).to(self.device)
\ No newline at end of file
+            use_compile=self.compile_networks,
+        ).to(self.device)
+
+    def make_inference_actor(self, use_compile: bool = True, dtype: Optional[torch.dtype] = None) -> nn.Module:
+        """
+        基于当前 actor 权重创建仅用于 rollout 推理的副本：eval + LayerNorm 仿射折叠，可选 torch.compile。
+
+        dtype 为 None 时自动选择：支持 bfloat16 的 GPU 上使用 bfloat16，否则保持 float32
+        （没有 BF16 指令的 CPU 上 bfloat16 反而更慢）。动作经 Sigmoid 限幅，bfloat16 精度足够。
+        输出与 policy.actor 相同，在 [-1, 1]，需经 policy.unscale_action 映射到动作空间。
+        训练过程中 actor 权重持续更新，需要在每次同步权重后重新调用。
+        """
+        if dtype is None:
+            use_bf16 = self.device.type == "cuda" and torch.cuda.is_bf16_supported()
+            dtype = torch.bfloat16 if use_bf16 else torch.float32
+        actor = copy.deepcopy(getattr(self.actor, "_orig_mod", self.actor))
+        actor = actor.eval().fuse_for_inference(dtype=dtype)
+        return _maybe_compile(actor, mode="reduce-overhead") if use_compile else actor
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+基于原始 TCP socket 的 $SYS 采样器（MQTT 3.1.1，仅 QoS 0 订阅）。
+
+paho 每个报文至少要做两次 recv（先读固定头，再读剩余部分）；订阅 $SYS/# 时 broker 会一次
+下发几十条保留消息，逐包 recv 的系统调用开销与主题数成正比。这里每次 recv_into 读入整块
+缓冲区，再在用户态切分出其中所有完整的报文，一批保留消息通常只需一次系统调用。
+
+解析出的 PUBLISH 交给 MQTTSampler._on_message 处理，sample()/snapshot() 等接口保持不变。
+check_sys_metrics 在环境变量 BROKERTUNE_RAW_SAMPLER=1 时使用它，连接失败时回退到 MQTTSampler。
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from environment.config import MQTTConfig
+from environment.utils import MQTTSampler, _collapse_topic_filters
+
+_CONNECT = 0x10
+_CONNACK = 0x20
+_PUBLISH = 0x30
+_SUBSCRIBE = 0x82
+_PINGREQ = b"\xc0\x00"
+_DISCONNECT = b"\xe0\x00"
+
+_RECV_BUFFER_SIZE = 64 * 1024
+
+
+class _RawMessage:
+    """与 paho MQTTMessage 相同的 topic/payload 字段，供 MQTTSampler._on_message 使用。"""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+def _encode_remaining_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def _encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(header: int, body: bytes) -> bytes:
+    return bytes([header]) + _encode_remaining_length(len(body)) + body
+
+
+def build_connect(client_id: str, keepalive: int) -> bytes:
+    # 协议名 "MQTT"、协议级别 4（3.1.1）、Clean Session
+    return _packet(_CONNECT, _encode_string("MQTT") + struct.pack("!BBH", 4, 0x02, keepalive) + _encode_string(client_id))
+
+
+def build_subscribe(topics: List[str], packet_id: int = 1) -> bytes:
+    """一个 SUBSCRIBE 报文订阅全部主题（QoS 0）。"""
+    return _packet(_SUBSCRIBE, struct.pack("!H", packet_id) + b"".join(_encode_string(t) + b"\x00" for t in topics))
+
+
+def split_packets(buf: memoryview) -> Tuple[List[Tuple[int, memoryview]], int]:
+    """
+    从缓冲区切分出所有完整报文，返回 ([(首字节, 报文体视图)], 已消费的字节数)。
+    末尾不完整的报文留给下一次 recv 补齐。
+    """
+    packets = []
+    pos = 0
+    end = len(buf)
+    while pos + 2 <= end:
+        length = 0
+        multiplier = 1
+        i = pos + 1
+        while True:
+            if i >= end:
+                return packets, pos
+            byte = buf[i]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            i += 1
+            if not byte & 0x80:
+                break
+        if i + length > end:
+            break
+        packets.append((buf[pos], buf[i:i + length]))
+        pos = i + length
+    return packets, pos
+
+
+def parse_publish(header: int, body: memoryview, topic_names: Optional[Dict[bytes, str]] = None) -> _RawMessage:
+    """
+    解析 PUBLISH 报文体。topic_names 为 原始 topic bytes -> str 的缓存（由调用方持有），
+    $SYS 主题集合固定，每个主题只需解码一次。
+    """
+    topic_len = (body[0] << 8) | body[1]
+    offset = 2 + topic_len
+    if (header >> 1) & 0x03:
+        offset += 2  # QoS > 0 时带 packet id
+    raw_topic = bytes(body[2:2 + topic_len])
+    topic = topic_names.get(raw_topic) if topic_names is not None else None
+    if topic is None:
+        topic = raw_topic.decode("utf-8")
+        if topic_names is not None:
+            topic_names[raw_topic] = topic
+    return _RawMessage(topic, bytes(body[offset:]))
+
+
+class RawSocketMQTTSampler(MQTTSampler):
+    """
+    接口与 MQTTSampler 相同，但不依赖 paho 网络循环：
+    后台线程每次 recv_into 读满缓冲区，批量解析其中的 PUBLISH 报文。
+    连接意外断开后 sample()/sample_until()/snapshot() 抛出 ConnectionError，而不是返回过期的指标。
+    """
+
+    def __init__(self, cfg: MQTTConfig, connect_timeout_sec: float = 5.0):
+        self._init_state(cfg)
+        self._client = None
+        # 原始 topic bytes -> str，仅在读取线程中读写
+        self._raw_topic_names: Dict[bytes, str] = {}
+        self._sock = socket.create_connection((cfg.host, cfg.port), timeout=connect_timeout_sec)
+        try:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock.sendall(build_connect(cfg.client_id, cfg.keepalive))
+            connack = self._recv_exact(4)
+            if connack[0] != _CONNACK or connack[3] != 0:
+                raise ConnectionError(f"MQTT 连接被拒绝 (rc={connack[3]})")
+            topics = _collapse_topic_filters(cfg.topics)
+            if topics:
+                self._sock.sendall(build_subscribe(topics))
+        except Exception:
+            self._sock.close()
+            raise
+        self._connected = True
+        self._error: Optional[BaseException] = None
+        # keepalive 只看客户端发出的报文：距上次发送满 keepalive/2 就发 PINGREQ，
+        # 与是否持续收到 $SYS 消息无关（否则 broker 在 1.5 倍 keepalive 后断开连接）
+        self._ping_interval = max(1.0, cfg.keepalive / 2)
+        self._last_sent = time.monotonic()
+        self._reader = threading.Thread(target=self._read_loop, name="raw-sys-sampler", daemon=True)
+        self._reader.start()
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("MQTT broker 关闭了连接")
+            data += chunk
+        return data
+
+    def _dispatch(self, view: memoryview) -> int:
+        """处理缓冲区中所有完整报文，返回已消费的字节数（报文体视图随函数返回释放）。"""
+        packets, consumed = split_packets(view)
+        for header, body in packets:
+            if header & 0xF0 == _PUBLISH:
+                self._on_message(None, None, parse_publish(header, body, self._raw_topic_names))
+        return consumed
+
+    def _read_loop(self) -> None:
+        sock = self._sock
+        buf = bytearray(_RECV_BUFFER_SIZE)
+        filled = 0
+        try:
+            while True:
+                now = time.monotonic()
+                if now - self._last_sent >= self._ping_interval:
+                    sock.sendall(_PINGREQ)
+                    self._last_sent = now
+                # recv 最多等到下一次该发 PINGREQ 的时刻
+                sock.settimeout(max(0.01, self._last_sent + self._ping_interval - now))
+                with memoryview(buf) as view:
+                    try:
+                        n = sock.recv_into(view[filled:])
+                    except socket.timeout:
+                        continue
+                    if n == 0:
+                        raise ConnectionError("MQTT broker 关闭了连接")
+                    filled += n
+                    consumed = self._dispatch(view[:filled])
+                if consumed:
+                    buf[:filled - consumed] = buf[consumed:filled]
+                    filled -= consumed
+                if filled == len(buf):
+                    # 单个报文超过缓冲区：扩容后继续读取
+                    buf.extend(bytes(len(buf)))
+        except OSError as exc:
+            if self._sock is not None:  # 不是 close() 主动关闭
+                self._error = exc
+        finally:
+            self._connected = False
+
+    def _check_connection(self) -> None:
+        if self._error is not None:
+            raise ConnectionError(f"$SYS 采样连接已断开: {self._error}") from self._error
+
+    def sample(self, timeout_sec: Optional[float] = None) -> Dict[str, float]:
+        self._check_connection()
+        return super().sample(timeout_sec)
+
+    def sample_until(self, expected_prefixes: Sequence[str], max_wait: float) -> Dict[str, float]:
+        self._check_connection()
+        return super().sample_until(expected_prefixes, max_wait)
+
+    def snapshot(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        self._check_connection()
+        return super().snapshot()
+
+    def close(self) -> None:
+        sock: Optional[socket.socket] = self._sock
+        if sock is None:
+            return
+        self._sock = None
+        try:
+            sock.sendall(_DISCONNECT)
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._reader.join(timeout=1.0)
+        sock.close()
@@ -12,13 +12,24 @@
     python3 script/apply_optimal_config.py \
         --model-path ./checkpoints/ddpg_mosquitto_final.zip \
         --apply-config
+
+常驻模式（反复调优时避免每次重新连接 Broker、加载模型）：
+    python3 script/apply_optimal_config.py --model-path ... --daemon &
+    python3 script/apply_optimal_config.py --model-path ... --apply-config   # 自动经 socket 请求常驻进程
 """
 
 from __future__ import annotations
 
 import argparse
+import json
+import operator
+import os
+import socket
+import stat
 import sys
+from dataclasses import dataclass, fields
 from pathlib import Path
+from typing import Callable, Optional, Union
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
@@ -27,10 +38,120 @@ sys.path.insert(0, str(project_root))
 import numpy as np
 from environment import EnvConfig
 from environment.knobs import apply_knobs
-from tuner.utils import load_model, make_env
+from tuner.utils import load_model, make_env, make_predictor
+
+
+# 常驻进程监听的 Unix socket 路径：放在 $XDG_RUNTIME_DIR 或 /run 下（不是所有用户可写的 /tmp），
+# 其他本地用户无法抢先创建同名 socket 向客户端返回伪造的配置
+DEFAULT_SOCKET_PATH = os.environ.get("BROKERTUNE_SOCKET") or os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or "/run", "brokertune.sock"
+)
+
+# 配置摘要：按类别分组展示的参数
+SUMMARY_GROUPS = (
+    ("QoS 相关", (
+        "max_inflight_messages",
+        "max_inflight_bytes",
+        "max_queued_messages",
+        "max_queued_bytes",
+        "queue_qos0_messages",
+    )),
+    ("内存相关", ("memory_limit", "persistence", "autosave_interval")),
+    ("网络相关", ("set_tcp_nodelay",)),
+    ("协议相关", ("max_packet_size", "message_size_limit")),
+)
+
+
+@dataclass(frozen=True)
+class KnobsView:
+    """
+    摘要用到的参数的只读视图：from_dict 一次性校验键名并取出各字段，之后按属性读取。
+    手写 __slots__ 而不用 dataclass(slots=True)，以兼容 Python 3.8/3.9；缺失的参数为 None。
+    """
+
+    __slots__ = (
+        "max_inflight_messages",
+        "max_inflight_bytes",
+        "max_queued_messages",
+        "max_queued_bytes",
+        "queue_qos0_messages",
+        "memory_limit",
+        "persistence",
+        "autosave_interval",
+        "set_tcp_nodelay",
+        "max_packet_size",
+        "message_size_limit",
+    )
+
+    max_inflight_messages: Optional[int]
+    max_inflight_bytes: Optional[int]
+    max_queued_messages: Optional[int]
+    max_queued_bytes: Optional[int]
+    queue_qos0_messages: Optional[bool]
+    memory_limit: Optional[int]
+    persistence: Optional[bool]
+    autosave_interval: Optional[int]
+    set_tcp_nodelay: Optional[bool]
+    max_packet_size: Optional[int]
+    message_size_limit: Optional[int]
 
+    @classmethod
+    def from_dict(cls, knobs: dict) -> "KnobsView":
+        """缺失或未知（如拼写错误）的参数在这里统一提示一次，摘要中缺失的参数显示为 N/A"""
+        names = [f.name for f in fields(cls)]
+        missing = [name for name in names if name not in knobs]
+        unknown = sorted(set(knobs).difference(names))
+        if missing:
+            print(f"⚠️  配置中缺少参数: {', '.join(missing)}")
+        if unknown:
+            print(f"⚠️  配置中有未知参数: {', '.join(unknown)}")
+        return cls(*[knobs.get(name) for name in names])
 
-def get_optimal_config(model, env, apply: bool = False) -> dict:
+
+# 由 SUMMARY_GROUPS 在导入时生成一次的摘要格式串（位置占位符）与对应的字段读取器，
+# 每次输出只需一次 str.format，而不是逐行拼接 f-string
+_SUMMARY_FORMAT = "\n\n".join(
+    f"{group}:\n" + "\n".join(f"  - {key}: {{}}" for key in keys) for group, keys in SUMMARY_GROUPS
+)
+_summary_values = operator.attrgetter(*(key for _, keys in SUMMARY_GROUPS for key in keys))
+
+
+def format_knob_summary(knobs: Union[dict, KnobsView]) -> str:
+    """按 SUMMARY_GROUPS 生成配置摘要文本（分组之间空一行），缺失的参数显示为 N/A"""
+    view = knobs if isinstance(knobs, KnobsView) else KnobsView.from_dict(knobs)
+    return _SUMMARY_FORMAT.format(*["N/A" if value is None else value for value in _summary_values(view)])
+
+
+def limit_inference_threads(cpu: Optional[int] = None) -> None:
+    """
+    单样本推理只是几次小矩阵乘，多线程的唤醒/同步开销比计算本身还大：
+    PyTorch 限制为单线程，并把进程绑定到一个 CPU（cpu=None 时取当前允许集合中的第一个，负数表示不绑定）。
+    常驻模式下只在启动时设置一次。
+    """
+    import torch
+
+    torch.set_num_threads(1)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # 已有并行任务运行过时不能再修改
+    if cpu is not None and cpu < 0:
+        return
+    try:
+        target = min(os.sched_getaffinity(0)) if cpu is None else cpu
+        os.sched_setaffinity(0, {target})
+    except (AttributeError, OSError) as e:
+        # 非 Linux 平台没有 sched_setaffinity；CPU 编号不在允许集合中时报 OSError
+        print(f"⚠️  无法绑定 CPU: {e}")
+
+
+def get_optimal_config(
+    model,
+    env,
+    apply: bool = False,
+    predict_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    obs: Optional[np.ndarray] = None,
+) -> dict:
     """
     使用训练好的模型获取最优配置
     
@@ -38,16 +159,19 @@ def get_optimal_config(model, env, apply: bool = False) -> dict:
         model: 训练好的 DDPG 模型
         env: 环境实例
         apply: 是否立即应用配置到 Broker
+        predict_fn: 可选的 obs -> action 推理函数（如 tuner.utils.make_predictor 的返回值），默认 model.predict
+        obs: 可选的状态向量（如 --from-state 读取的）；给出时不调用 env.reset()，无需连接 Broker 采样
         
     Returns:
         最优配置字典
     """
-    # 重置环境，获取当前状态
-    reset_result = env.reset()
-    if isinstance(reset_result, tuple):
-        obs, _ = reset_result
-    else:
-        obs = reset_result
+    if obs is None:
+        # 重置环境，获取当前状态
+        reset_result = env.reset()
+        if isinstance(reset_result, tuple):
+            obs, _ = reset_result
+        else:
+            obs = reset_result
     
     print("\n" + "=" * 80)
     print("当前 Broker 状态:")
@@ -60,7 +184,10 @@ def get_optimal_config(model, env, apply: bool = False) -> dict:
     print("=" * 80)
     
     # 使用模型预测最优动作（配置）
-    action, _ = model.predict(obs, deterministic=True)
+    if predict_fn is not None:
+        action = predict_fn(obs)
+    else:
+        action, _ = model.predict(obs, deterministic=True)
     
     # 将动作解码为配置参数
     knobs = env.knob_space.decode_action(action)
@@ -72,22 +199,170 @@ def get_optimal_config(model, env, apply: bool = False) -> dict:
         print(f"  {key}: {value}")
     print("=" * 80)
     
-    # 如果指定应用配置
+    # 如果指定应用配置（需要知道是否成功的调用方应传 apply=False 后自行调用 apply_config）
     if apply:
-        print("\n正在应用配置到 Broker...")
-        try:
-            used_restart = apply_knobs(knobs, dry_run=False)
-            if used_restart:
-                print("✅ 配置已应用（Broker 已重启）")
-            else:
-                print("✅ 配置已应用（Broker 已重载）")
-        except Exception as e:
-            print(f"❌ 应用配置失败: {e}")
-            return knobs
+        apply_config(knobs)
     
     return knobs
 
 
+def apply_config(knobs: dict) -> Optional[str]:
+    """
+    应用配置到 Broker。
+    
+    Returns:
+        成功时返回 None，失败时返回错误信息
+    """
+    print("\n正在应用配置到 Broker...")
+    try:
+        used_restart = apply_knobs(knobs, dry_run=False)
+    except Exception as e:
+        print(f"❌ 应用配置失败: {e}")
+        return str(e)
+    if used_restart:
+        print("✅ 配置已应用（Broker 已重启）")
+    else:
+        print("✅ 配置已应用（Broker 已重载）")
+    return None
+
+
+def load_state(path: Path, state_dim: int) -> np.ndarray:
+    """读取 JSON 状态向量：[s_0, s_1, ...] 或 {"obs": [...]}。"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("obs")
+    obs = np.asarray(data, dtype=np.float32)
+    if obs.shape != (state_dim,):
+        raise ValueError(f"状态向量维度应为 ({state_dim},)，实际为 {obs.shape}")
+    return obs
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """
+    删除上次异常退出遗留的 socket 文件；已有常驻进程在监听该路径、或路径不是 socket 时抛出 RuntimeError，
+    避免第二个常驻进程悄悄接管正在使用的 socket。
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{socket_path} 已存在且不是 socket，拒绝覆盖")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.settimeout(1.0)
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"已有常驻进程在监听 {socket_path}，请先停止它或使用其他 --socket-path")
+
+
+def serve_forever(model, env, model_path: Path, socket_path: str, predict_fn) -> None:
+    """
+    常驻模式：模型与环境只加载一次，在 Unix socket 上逐行处理 JSON 请求：
+        {"cmd": "predict", "apply": bool, "model_path": str, "obs": [...]（可选）}
+            -> {"knobs": {...}, "applied": bool, "error": 应用失败时的错误信息或 null}
+        {"cmd": "shutdown"}                                   -> {"ok": true}
+    请求的 model_path 与已加载模型不一致时返回 {"error": ...}，客户端会回退为冷启动。
+    """
+    import torch
+
+    _remove_stale_socket(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # 以 0600 创建 socket 文件（而不是 bind 之后再 chmod），只有本用户（及 root）能连接
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(1)
+    loaded_path = str(model_path.resolve())
+    print(f"✅ 常驻进程已启动，监听 {socket_path}（Ctrl+C 退出）")
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rwb") as stream:
+                line = stream.readline()
+                if not line:
+                    continue  # 对端未发请求就断开（如另一个常驻进程启动时的探测）
+                try:
+                    request = json.loads(line)
+                    cmd = request.get("cmd")
+                    if cmd == "shutdown":
+                        reply = {"ok": True}
+                    elif cmd != "predict":
+                        reply = {"error": f"未知命令: {cmd}"}
+                    elif request.get("model_path") not in (None, loaded_path):
+                        reply = {"error": f"常驻进程加载的是 {loaded_path}"}
+                    else:
+                        obs = request.get("obs")
+                        if obs is not None:
+                            obs = np.asarray(obs, dtype=np.float32)
+                        with torch.inference_mode():
+                            knobs = get_optimal_config(model, env, apply=False, predict_fn=predict_fn, obs=obs)
+                        apply_error = apply_config(knobs) if request.get("apply") else None
+                        reply = {
+                            "knobs": knobs,
+                            "applied": bool(request.get("apply")) and apply_error is None,
+                            "error": apply_error,
+                        }
+                except Exception as e:
+                    cmd = None
+                    reply = {"error": str(e)}
+                try:
+                    stream.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                    stream.flush()
+                except OSError:
+                    pass  # 客户端已断开，不影响后续请求
+            if cmd == "shutdown":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("常驻进程已退出")
+
+
+def request_from_daemon(
+    socket_path: str,
+    model_path: Path,
+    apply: bool,
+    obs: Optional[np.ndarray] = None,
+    timeout: float = 120.0,
+) -> Optional[dict]:
+    """
+    向常驻进程请求最优配置，返回常驻进程的响应 {"knobs", "applied", "error"}；
+    常驻进程不存在或不可用、或 socket 不属于当前用户（及 root）时返回 None。
+    """
+    try:
+        owner = os.stat(socket_path).st_uid
+    except OSError:
+        return None
+    if owner not in (os.getuid(), 0):
+        print(f"⚠️  {socket_path} 属于其他用户（uid={owner}），不使用该常驻进程")
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            request = {"cmd": "predict", "apply": apply, "model_path": str(model_path.resolve())}
+            if obs is not None:
+                request["obs"] = obs.tolist()
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with client.makefile("rb") as stream:
+                reply = json.loads(stream.readline() or b"{}")
+    except (OSError, ValueError):
+        return None
+    if "knobs" not in reply:
+        print(f"⚠️  常驻进程不可用，改为直接加载模型: {reply.get('error', '无响应')}")
+        return None
+    return reply
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="使用训练好的模型获取并应用最优 Broker 配置"
@@ -114,6 +389,29 @@ def main():
         action="store_true",
         help="只显示配置，不实际应用（即使指定了 --apply-config）",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="常驻模式：加载一次模型与环境，通过 Unix socket 响应后续请求",
+    )
+    parser.add_argument(
+        "--socket-path",
+        type=str,
+        default=DEFAULT_SOCKET_PATH,
+        help=f"常驻进程的 Unix socket 路径（默认：{DEFAULT_SOCKET_PATH}，可用 BROKERTUNE_SOCKET 覆盖）",
+    )
+    parser.add_argument(
+        "--from-state",
+        type=str,
+        default=None,
+        help="从 JSON 文件读取状态向量（[...] 或 {\"obs\": [...]}），不连接 Broker 采样当前状态",
+    )
+    parser.add_argument(
+        "--cpu",
+        type=int,
+        default=None,
+        help="推理时绑定的 CPU 编号（默认：当前允许集合中的第一个；-1 表示不绑定）",
+    )
     
     args = parser.parse_args()
     
@@ -128,8 +426,33 @@ def main():
                 print(f"  - {f}")
         sys.exit(1)
     
-    # 创建环境
+    apply = args.apply_config and not args.dry_run
+
     env_cfg = EnvConfig()
+    obs = None
+    if args.from_state:
+        try:
+            obs = load_state(Path(args.from_state), env_cfg.state_dim)
+        except (OSError, ValueError) as e:
+            print(f"❌ 读取状态文件失败: {e}")
+            sys.exit(1)
+
+    # 已有常驻进程时直接请求，省去连接 Broker 与加载模型
+    if not args.daemon:
+        reply = request_from_daemon(args.socket_path, model_path, apply, obs=obs)
+        if reply is not None:
+            print(f"✅ 已从常驻进程获取配置（{args.socket_path}）")
+            print_summary_and_hints(reply["knobs"], args)
+            if apply:
+                if not reply.get("applied"):
+                    print(f"❌ 常驻进程应用配置失败: {reply.get('error') or '未知错误'}")
+                    sys.exit(1)
+                print("✅ 配置已由常驻进程应用")
+            return
+
+    limit_inference_threads(args.cpu)
+
+    # 创建环境（构造时不连接 Broker，首次 reset 才采样；给出 --from-state 时不会 reset）
     env = make_env(env_cfg)
     
     # 加载模型
@@ -141,38 +464,38 @@ def main():
         print(f"❌ 模型加载失败: {e}")
         sys.exit(1)
     
+    # actor 导出为 TorchScript 并缓存到模型旁的 <模型名>.actor.pt，重复运行无需再次 trace
+    predict_fn = make_predictor(model, trace_model_path=model_path)
+    if args.daemon:
+        try:
+            serve_forever(model, env, model_path, args.socket_path, predict_fn)
+        except RuntimeError as e:
+            print(f"❌ 常驻进程启动失败: {e}")
+            sys.exit(1)
+        finally:
+            env.close()
+        return
+
     # 获取最优配置
-    apply = args.apply_config and not args.dry_run
-    knobs = get_optimal_config(model, env, apply=apply)
+    knobs = get_optimal_config(model, env, apply=False, predict_fn=predict_fn, obs=obs)
+    apply_error = apply_config(knobs) if apply else None
+    print_summary_and_hints(knobs, args)
     
+    env.close()
+    if apply_error is not None:
+        sys.exit(1)
+
+
+def print_summary_and_hints(knobs: dict, args: argparse.Namespace) -> None:
     # 显示配置摘要
-    print("\n" + "=" * 80)
-    print("配置摘要:")
-    print("=" * 80)
-    print(f"QoS 相关:")
-    print(f"  - max_inflight_messages: {knobs.get('max_inflight_messages', 'N/A')}")
-    print(f"  - max_inflight_bytes: {knobs.get('max_inflight_bytes', 'N/A')}")
-    print(f"  - max_queued_messages: {knobs.get('max_queued_messages', 'N/A')}")
-    print(f"  - max_queued_bytes: {knobs.get('max_queued_bytes', 'N/A')}")
-    print(f"  - queue_qos0_messages: {knobs.get('queue_qos0_messages', 'N/A')}")
-    print(f"\n内存相关:")
-    print(f"  - memory_limit: {knobs.get('memory_limit', 'N/A')}")
-    print(f"  - persistence: {knobs.get('persistence', 'N/A')}")
-    print(f"  - autosave_interval: {knobs.get('autosave_interval', 'N/A')}")
-    print(f"\n网络相关:")
-    print(f"  - set_tcp_nodelay: {knobs.get('set_tcp_nodelay', 'N/A')}")
-    print(f"\n协议相关:")
-    print(f"  - max_packet_size: {knobs.get('max_packet_size', 'N/A')}")
-    print(f"  - message_size_limit: {knobs.get('message_size_limit', 'N/A')}")
-    print("=" * 80)
+    separator = "=" * 80
+    sys.stdout.write(f"\n{separator}\n配置摘要:\n{separator}\n{format_knob_summary(knobs)}\n{separator}\n")
     
     if args.dry_run:
         print("\n[提示] 这是 dry-run 模式，配置未实际应用")
         print("       要实际应用配置，请使用: --apply-config（需要 sudo 权限）")
     elif not args.apply_config:
         print("\n[提示] 配置未应用。要应用配置，请使用: --apply-config（需要 sudo 权限）")
-    
-    env.close()
 
 
 if __name__ == "__main__":
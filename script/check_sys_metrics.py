@@ -10,21 +10,28 @@
 - 估算使用的速率与归一化吞吐
 可选：
 - 自动启动工作负载（emqtt_bench），等待稳定后采样
+- BROKERTUNE_RAW_SAMPLER=1 时改用 script/_raw_sys_sampler.py 的原始 socket 采样器
 """
 
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import os
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from environment import EnvConfig
+from environment.config import MQTTConfig
 from environment.utils import MQTTSampler, _parse_numeric_payload
 
 try:
@@ -33,6 +40,17 @@ except ImportError:
     WorkloadManager = None  # type: ignore
 
 
+# 每次采样输出的指标，顺序与 _print_sample 中的解包一致
+SAMPLE_KEYS = (
+    "$SYS/broker/load/messages/received/1min",
+    "$SYS/broker/load/messages/received/1min_per_sec",
+    "$SYS/broker/messages/received_rate",
+    "$SYS/broker/messages/received",
+    "$SYS/broker/clients/connected",
+    "$SYS/broker/uptime",
+)
+
+
 def _choose_rate(rate_1min_per_sec: Optional[float], rate_derived: Optional[float]) -> Tuple[float, str]:
     if rate_1min_per_sec is not None and rate_1min_per_sec > 0:
         return float(rate_1min_per_sec), "1min_per_sec"
@@ -41,12 +59,113 @@ def _choose_rate(rate_1min_per_sec: Optional[float], rate_derived: Optional[floa
     return 0.0, "missing"
 
 
+def _create_sampler(mqtt_cfg: MQTTConfig) -> MQTTSampler:
+    """BROKERTUNE_RAW_SAMPLER=1 时使用批量 recv 的原始 socket 采样器，失败时回退到 MQTTSampler。"""
+    if os.getenv("BROKERTUNE_RAW_SAMPLER") == "1":
+        from script._raw_sys_sampler import RawSocketMQTTSampler
+
+        try:
+            return RawSocketMQTTSampler(mqtt_cfg)
+        except Exception as e:
+            print(f"[raw-sampler] 连接失败，回退到 MQTTSampler: {e}")
+    return MQTTSampler(mqtt_cfg)
+
+
+def _produce_samples(
+    sampler: MQTTSampler,
+    args: argparse.Namespace,
+    timeout_sec: float,
+    samples: Deque[Tuple[float, Dict[str, float]]],
+    ready: threading.Event,
+    errors: List[BaseException],
+) -> None:
+    """
+    后台采样线程：每隔 --sleep 秒（从上一次采样开始计）采样一次，结果追加到 samples。
+    打印在主线程完成，不占用采样间隔；总耗时约为 N * max(采样耗时, sleep)。
+    """
+    try:
+        for i in range(args.samples):
+            start = time.monotonic()
+            if args.snapshot and i > 0:
+                # 订阅在整个运行期间保持；直接读取后台 paho 线程已缓存的指标
+                metrics, _ = sampler.snapshot()
+            else:
+                metrics = sampler.sample(timeout_sec=timeout_sec)
+            samples.append((time.monotonic() - start, metrics))
+            ready.set()
+            if i < args.samples - 1 and args.sleep > 0:
+                time.sleep(max(0.0, args.sleep - (time.monotonic() - start)))
+    except BaseException as e:
+        errors.append(e)
+        ready.set()
+
+
+def _sample_host(mqtt_cfg: MQTTConfig, args: argparse.Namespace) -> List[Tuple[float, Dict[str, float]]]:
+    """在当前线程内完成对单个 broker 的全部采样（多 broker 模式下每个 broker 一个线程）。"""
+    sampler = _create_sampler(mqtt_cfg)
+    samples: Deque[Tuple[float, Dict[str, float]]] = deque()
+    errors: List[BaseException] = []
+    try:
+        _produce_samples(sampler, args, mqtt_cfg.timeout_sec, samples, threading.Event(), errors)
+    finally:
+        sampler.close()
+    if errors:
+        raise errors[0]
+    return list(samples)
+
+
+def _print_sample(
+    index: int,
+    total: int,
+    elapsed: float,
+    metrics: Dict[str, float],
+    inv_divisor: float,
+    host: Optional[str] = None,
+) -> None:
+    rate_1min, rate_1min_per_sec, rate_derived, total_received, clients, uptime_sec = map(metrics.get, SAMPLE_KEYS)
+    uptime_raw = None
+    if uptime_sec is None:
+        uptime_raw = metrics.get("$SYS/broker/uptime_raw")
+        if uptime_raw is not None:
+            uptime_sec = _parse_numeric_payload(str(uptime_raw))
+
+    if rate_1min_per_sec is None and rate_1min is not None and inv_divisor:
+        rate_1min_per_sec = rate_1min * inv_divisor
+
+    chosen_rate, source = _choose_rate(rate_1min_per_sec, rate_derived)
+    throughput_norm = chosen_rate / 10000.0
+
+    print("=" * 80)
+    host_label = f" | host={host}" if host is not None else ""
+    print(f"Sample {index + 1}/{total}{host_label} | elapsed={elapsed:.2f}s")
+    print(f"  clients_connected: {clients}")
+    print(f"  broker_uptime:     {uptime_sec}")
+    if uptime_raw is not None:
+        print(f"  uptime_raw:        {uptime_raw}")
+    print(f"  received_1min:     {rate_1min}")
+    print(f"  1min_per_sec:      {rate_1min_per_sec}")
+    print(f"  received_rate:     {rate_derived}")
+    print(f"  received_total:    {total_received}")
+    print(f"  chosen_rate:       {chosen_rate:.2f} ({source})")
+    print(f"  throughput_norm:   {throughput_norm:.6f}")
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Check $SYS metrics and throughput estimation")
     parser.add_argument("--samples", type=int, default=3, help="采样次数（默认：3）")
     parser.add_argument("--timeout", type=float, default=None, help="单次采样超时（秒）")
-    parser.add_argument("--sleep", type=float, default=3.0, help="两次采样间隔（秒）")
-    parser.add_argument("--host", type=str, default=None, help="Broker host（默认使用 EnvConfig）")
+    parser.add_argument("--sleep", type=float, default=3.0, help="相邻两次采样开始时刻的间隔（秒）")
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="仅第一次等待新的 $SYS 数据，之后每隔 --sleep 秒直接读取订阅缓存的最新值（不再逐次阻塞等待）",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=None,
+        help="Broker host（默认使用 EnvConfig）；多个 host 用逗号分隔时并发采样",
+    )
     parser.add_argument("--port", type=int, default=None, help="Broker port（默认使用 EnvConfig）")
     parser.add_argument(
         "--start-workload",
@@ -79,8 +198,9 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     cfg = EnvConfig()
-    if args.host:
-        cfg.mqtt.host = args.host
+    hosts = [h.strip() for h in args.host.split(",") if h.strip()] if args.host else []
+    if hosts:
+        cfg.mqtt.host = hosts[0]
     if args.port:
         cfg.mqtt.port = args.port
     if args.timeout is not None:
@@ -113,54 +233,62 @@ def main() -> None:
             message_size=args.workload_message_size,
             duration=args.workload_duration,
             qos=args.workload_qos,
+            verify=True,
         )
         workload_started = True
         if args.workload_warmup_sec > 0:
             print(f"[workload] 等待稳定 {args.workload_warmup_sec:.1f} 秒...")
             time.sleep(args.workload_warmup_sec)
 
-    sampler = MQTTSampler(cfg.mqtt)
+    # 1min 原始值换算为 msg/s 的倍数（循环外预先取倒数）；divisor 未配置时为 0，表示不换算
+    divisor = cfg.mqtt.rate_1min_divisor
+    inv_divisor = 1.0 / divisor if divisor and divisor > 0 else 0.0
+
+    if len(hosts) > 1:
+        # 多个 broker：每个 broker 一个线程并发采样（各自阻塞在网络等待上），总耗时取决于最慢的一个
+        try:
+            with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+                futures = [
+                    executor.submit(_sample_host, dataclasses.replace(cfg.mqtt, host=host), args)
+                    for host in hosts
+                ]
+                for host, future in zip(hosts, futures):
+                    try:
+                        host_samples = future.result()
+                    except Exception as e:
+                        print("=" * 80)
+                        print(f"host={host} 采样失败: {e}")
+                        continue
+                    for i, (elapsed, metrics) in enumerate(host_samples):
+                        _print_sample(i, args.samples, elapsed, metrics, inv_divisor, host=host)
+        finally:
+            if workload is not None and workload_started:
+                try:
+                    workload.stop()
+                except Exception:
+                    pass
+        return
+
+    sampler = _create_sampler(cfg.mqtt)
+    samples: Deque[Tuple[float, Dict[str, float]]] = deque(maxlen=max(1, args.samples * 2))
+    ready = threading.Event()
+    errors: List[BaseException] = []
+    producer = threading.Thread(
+        target=_produce_samples,
+        args=(sampler, args, cfg.mqtt.timeout_sec, samples, ready, errors),
+        name="sys-metrics-producer",
+        daemon=True,
+    )
     try:
+        producer.start()
         for i in range(args.samples):
-            start = time.time()
-            metrics = sampler.sample(timeout_sec=cfg.mqtt.timeout_sec)
-            elapsed = time.time() - start
-
-            rate_1min = metrics.get("$SYS/broker/load/messages/received/1min")
-            rate_1min_per_sec = metrics.get("$SYS/broker/load/messages/received/1min_per_sec")
-            rate_derived = metrics.get("$SYS/broker/messages/received_rate")
-            total_received = metrics.get("$SYS/broker/messages/received")
-            clients = metrics.get("$SYS/broker/clients/connected")
-            uptime_sec = metrics.get("$SYS/broker/uptime")
-            uptime_raw = None
-            if uptime_sec is None:
-                uptime_raw = metrics.get("$SYS/broker/uptime_raw")
-                if uptime_raw is not None:
-                    uptime_sec = _parse_numeric_payload(str(uptime_raw))
-
-            if rate_1min_per_sec is None and rate_1min is not None:
-                divisor = cfg.mqtt.rate_1min_divisor
-                if divisor and divisor > 0:
-                    rate_1min_per_sec = rate_1min / divisor
-
-            chosen_rate, source = _choose_rate(rate_1min_per_sec, rate_derived)
-            throughput_norm = chosen_rate / 10000.0
-
-            print("=" * 80)
-            print(f"Sample {i + 1}/{args.samples} | elapsed={elapsed:.2f}s")
-            print(f"  clients_connected: {clients}")
-            print(f"  broker_uptime:     {uptime_sec}")
-            if uptime_raw is not None:
-                print(f"  uptime_raw:        {uptime_raw}")
-            print(f"  received_1min:     {rate_1min}")
-            print(f"  1min_per_sec:      {rate_1min_per_sec}")
-            print(f"  received_rate:     {rate_derived}")
-            print(f"  received_total:    {total_received}")
-            print(f"  chosen_rate:       {chosen_rate:.2f} ({source})")
-            print(f"  throughput_norm:   {throughput_norm:.6f}")
-
-            if i < args.samples - 1 and args.sleep > 0:
-                time.sleep(args.sleep)
+            while not samples:
+                if errors:
+                    raise errors[0]
+                ready.wait(0.5)
+                ready.clear()
+            elapsed, metrics = samples.popleft()
+            _print_sample(i, args.samples, elapsed, metrics, inv_divisor)
     finally:
         sampler.close()
         if workload is not None and workload_started:
@@ -6,6 +6,8 @@
 
 import subprocess
 import os
+import shutil
+import signal
 from pathlib import Path
 
 def check_emqtt_bench():
@@ -23,39 +25,41 @@ def check_emqtt_bench():
         else:
             print(f"  → 警告: 文件不存在")
     
-    # 检查是否在 PATH 中
-    try:
-        result = subprocess.run(
-            ["which", "emqtt_bench"],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        if result.returncode == 0:
-            bench_path = result.stdout.strip()
-            print(f"✓ 在 PATH 中找到 emqtt_bench: {bench_path}")
-        else:
-            print("✗ 未在 PATH 中找到 emqtt_bench")
-    except Exception as e:
-        print(f"✗ 检查 PATH 时出错: {e}")
+    # 检查是否在 PATH 中（进程内扫描 PATH，无需再启动 which）
+    bench_path = shutil.which("emqtt_bench")
+    if bench_path:
+        print(f"✓ 在 PATH 中找到 emqtt_bench: {bench_path}")
+    else:
+        print("✗ 未在 PATH 中找到 emqtt_bench")
     
     # 尝试运行帮助命令
     print("\n尝试运行 'emqtt_bench --help'...")
     try:
-        result = subprocess.run(
-            ["emqtt_bench", "--help"],
-            capture_output=True,
-            text=True,
-            timeout=5
+        # stderr 合并到 stdout。emqtt_bench 是 shell 启动脚本，放进独立会话，超时时按进程组结束，连同 Erlang 子进程
+        proc = subprocess.Popen(
+            [bench_path or "emqtt_bench", "--help"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
         )
-        if result.returncode == 0:
+        with proc:
+            try:
+                output, _ = proc.communicate(timeout=5)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.communicate()
+                raise
+        head = output[:500].decode("utf-8", errors="replace")
+        if proc.returncode == 0:
             print("✓ emqtt_bench 可以正常运行")
             print("\n帮助信息:")
-            print(result.stdout[:500])  # 只显示前500个字符
+            print(head)  # 只显示前500个字符
         else:
-            print(f"✗ emqtt_bench 运行失败 (退出码: {result.returncode})")
-            if result.stderr:
-                print(f"错误信息: {result.stderr[:500]}")
+            print(f"✗ emqtt_bench 运行失败 (退出码: {proc.returncode})")
+            if head:
+                print(f"错误信息: {head}")
+    except subprocess.TimeoutExpired:
+        print("✗ 'emqtt_bench --help' 5 秒内未结束，已终止")
     except FileNotFoundError:
         print("✗ emqtt_bench 未找到")
         print("\n安装方法:")
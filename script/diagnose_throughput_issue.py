@@ -10,10 +10,16 @@
 4. 工作负载是否运行
 """
 
+import io
+import re
 import sys
-import time
+import shutil
 import subprocess
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
@@ -22,57 +28,84 @@ sys.path.insert(0, str(project_root))
 from environment import EnvConfig
 from environment.utils import MQTTSampler
 
-def check_broker_status():
-    """检查Broker状态"""
-    print("=" * 80)
-    print("1. 检查Broker状态")
-    print("=" * 80)
-    
-    # 检查服务状态
+# 端口检查工具：优先 netstat，没有时用 ss（导入时确定一次，不再靠异常回退）
+PORT_CHECK_CMD = ["netstat", "-tln"] if shutil.which("netstat") else (["ss", "-tln"] if shutil.which("ss") else None)
+
+
+# mosquitto.conf 中生效（未注释）的 sys_interval 行，直接在原始 bytes 上匹配
+SYS_INTERVAL_RE = re.compile(rb"(?im)^[ \t]*sys_interval\b.*$")
+
+
+def run_probe(cmd) -> Tuple[bool, str]:
+    """运行一个探测命令，返回 (退出码是否为0, stdout)；命令不存在或超时时返回 (False, 错误信息)"""
     try:
         result = subprocess.run(
-            ["systemctl", "is-active", "mosquitto"],
-            capture_output=True,
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
             text=True,
             timeout=2
         )
-        if result.returncode == 0:
-            print(f"✅ Broker服务状态: {result.stdout.strip()}")
-        else:
-            print(f"❌ Broker服务未运行: {result.stderr}")
-            return False
     except Exception as e:
-        print(f"❌ 检查服务状态失败: {e}")
+        return False, str(e)
+    return result.returncode == 0, result.stdout
+
+
+def submit_probes(executor: ThreadPoolExecutor) -> Dict[str, "Future[Tuple[bool, str]]"]:
+    """并发启动各项检查用到的外部命令，总耗时取决于最慢的一个而不是各项之和"""
+    commands = {
+        "service": ["systemctl", "is-active", "mosquitto"],
+        "workload": ["pgrep", "-f", "emqtt_bench"],
+    }
+    if PORT_CHECK_CMD is not None:
+        commands["port"] = PORT_CHECK_CMD
+    return {name: executor.submit(run_probe, cmd) for name, cmd in commands.items()}
+
+
+def _probe_result(probes: Optional[Dict[str, "Future[Tuple[bool, str]]"]], name: str, cmd) -> Tuple[bool, str]:
+    if probes is not None and name in probes:
+        return probes[name].result()
+    return run_probe(cmd)
+
+
+def run_section(check: Callable[..., bool], *args) -> bool:
+    """
+    运行一项检查，把它的输出缓存在 StringIO 中，检查结束后一次性写出。
+    每节只产生一次 write 系统调用；各节仍在完成时立即输出，长时间的检查不会让前面的结果滞留。
+    只用于很快完成的检查：需要等待的检查（如 check_sys_topics）直接输出，进度提示不会被缓存住。
+    """
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        ok = check(*args)
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
+    return ok
+
+
+def check_broker_status(probes: Optional[Dict[str, "Future[Tuple[bool, str]]"]] = None):
+    """检查Broker状态"""
+    print("=" * 80)
+    print("1. 检查Broker状态")
+    print("=" * 80)
+    
+    # 检查服务状态
+    ok, output = _probe_result(probes, "service", ["systemctl", "is-active", "mosquitto"])
+    if ok:
+        print(f"✅ Broker服务状态: {output.strip()}")
+    else:
+        print(f"❌ Broker服务未运行: {output.strip()}")
         return False
     
     # 检查端口监听
-    try:
-        result = subprocess.run(
-            ["netstat", "-tln"],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        if ":1883" in result.stdout:
-            print("✅ 端口1883正在监听")
-        else:
-            print("❌ 端口1883未监听")
-            return False
-    except Exception:
-        try:
-            result = subprocess.run(
-                ["ss", "-tln"],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            if ":1883" in result.stdout:
-                print("✅ 端口1883正在监听")
-            else:
-                print("❌ 端口1883未监听")
-                return False
-        except Exception as e:
-            print(f"⚠️  无法检查端口监听: {e}")
+    if PORT_CHECK_CMD is None:
+        print("⚠️  无法检查端口监听: 未找到 netstat 或 ss")
+        return True
+    _, output = _probe_result(probes, "port", PORT_CHECK_CMD)
+    if ":1883" in output:
+        print("✅ 端口1883正在监听")
+    else:
+        print("❌ 端口1883未监听")
+        return False
     
     return True
 
@@ -80,22 +113,22 @@ def check_sys_topics():
     """检查Broker是否发布$SYS主题"""
     print("\n" + "=" * 80)
     print("2. 检查Broker $SYS主题")
-    print("=" * 80)
+    print("=" * 80, flush=True)
     
     cfg = EnvConfig()
     sampler = None
     
     try:
-        print(f"连接到Broker: {cfg.mqtt.host}:{cfg.mqtt.port}")
+        print(f"连接到Broker: {cfg.mqtt.host}:{cfg.mqtt.port}", flush=True)
         sampler = MQTTSampler(cfg.mqtt)
         print("✅ MQTT连接成功")
         
-        # 等待连接建立
-        time.sleep(1)
-        
-        # 采样指标（等待更长时间）
-        print(f"采样Broker指标（等待{cfg.mqtt.timeout_sec * 2}秒）...")
-        metrics = sampler.sample(timeout_sec=cfg.mqtt.timeout_sec * 2)
+        # 采样指标：关键指标（通常是订阅时即下发的保留消息）到齐即返回，否则最多等待 2 倍超时
+        print(f"采样Broker指标（最多等待{cfg.mqtt.timeout_sec * 2}秒）...", flush=True)
+        metrics = sampler.sample_until(
+            ["$SYS/broker/messages/received", "$SYS/broker/clients/connected"],
+            max_wait=cfg.mqtt.timeout_sec * 2,
+        )
         
         print(f"\n收到 {len(metrics)} 条指标:")
         if len(metrics) == 0:
@@ -127,38 +160,29 @@ def check_sys_topics():
         return len(metrics) > 0
         
     except Exception as e:
-        print(f"❌ 检查$SYS主题失败: {e}")
-        import traceback
+        print(f"❌ 检查$SYS主题失败: {e}", flush=True)  # 先于写到 stderr 的 traceback 输出
         traceback.print_exc()
         return False
     finally:
         if sampler:
             sampler.close()
 
-def check_workload():
+def check_workload(probes: Optional[Dict[str, "Future[Tuple[bool, str]]"]] = None):
     """检查工作负载是否运行"""
     print("\n" + "=" * 80)
     print("3. 检查工作负载")
     print("=" * 80)
     
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", "emqtt_bench"],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        if result.returncode == 0:
-            pids = result.stdout.strip().split('\n')
-            print(f"✅ 工作负载正在运行（{len(pids)}个进程）")
-            print(f"   PIDs: {', '.join(pids)}")
-            return True
-        else:
-            print("❌ 工作负载未运行")
-            print("   没有找到emqtt_bench进程")
-            return False
-    except Exception as e:
-        print(f"❌ 检查工作负载失败: {e}")
+    ok, output = _probe_result(probes, "workload", ["pgrep", "-f", "emqtt_bench"])
+    if ok:
+        # pgrep 每行一个 PID：直接数换行并整体替换分隔符，不拆分成列表
+        pids = output.strip()
+        print(f"✅ 工作负载正在运行（{pids.count(chr(10)) + 1}个进程）")
+        print(f"   PIDs: {pids.replace(chr(10), ', ')}")
+        return True
+    else:
+        print("❌ 工作负载未运行")
+        print("   没有找到emqtt_bench进程")
         return False
 
 def check_sys_interval_config():
@@ -169,14 +193,12 @@ def check_sys_interval_config():
     
     config_file = "/etc/mosquitto/mosquitto.conf"
     try:
-        with open(config_file, 'r') as f:
-            content = f.read()
+        matches = SYS_INTERVAL_RE.findall(Path(config_file).read_bytes())
         
-        if "sys_interval" in content:
-            lines = [line for line in content.split('\n') if 'sys_interval' in line.lower()]
+        if matches:
             print("✅ 找到sys_interval配置:")
-            for line in lines:
-                print(f"   {line.strip()}")
+            for line in matches:
+                print(f"   {line.decode('utf-8', 'replace').strip()}")
             return True
         else:
             print("❌ 未找到sys_interval配置")
@@ -190,25 +212,32 @@ def check_sys_interval_config():
         return False
 
 def main():
-    print("=" * 80)
-    print("吞吐量为0问题诊断")
-    print("=" * 80)
-    
-    # 1. 检查Broker状态
-    broker_ok = check_broker_status()
-    if not broker_ok:
-        print("\n❌ Broker未正常运行，请先修复Broker问题")
-        return
-    
-    # 2. 检查sys_interval配置
-    sys_interval_ok = check_sys_interval_config()
+    separator = "=" * 80
+    sys.stdout.write(f"{separator}\n吞吐量为0问题诊断\n{separator}\n")
     
-    # 3. 检查$SYS主题
-    sys_topics_ok = check_sys_topics()
-    
-    # 4. 检查工作负载
-    workload_ok = check_workload()
+    # 各项检查用到的外部命令并发执行，输出仍按检查顺序打印（每节一次性写出）
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        probes = submit_probes(executor)
+
+        # 1. 检查Broker状态
+        broker_ok = run_section(check_broker_status, probes)
+        if not broker_ok:
+            print("\n❌ Broker未正常运行，请先修复Broker问题", flush=True)
+            return
+        
+        # 2. 检查sys_interval配置
+        sys_interval_ok = run_section(check_sys_interval_config)
+        
+        # 3. 检查$SYS主题：最多等待 2 倍超时，不经 run_section 缓存，进度与错误直接输出
+        sys_topics_ok = check_sys_topics()
+        
+        # 4. 检查工作负载
+        workload_ok = run_section(check_workload, probes)
     
+    run_section(print_summary, broker_ok, sys_interval_ok, sys_topics_ok, workload_ok)
+
+
+def print_summary(broker_ok: bool, sys_interval_ok: bool, sys_topics_ok: bool, workload_ok: bool) -> bool:
     # 总结
     print("\n" + "=" * 80)
     print("诊断总结")
@@ -239,6 +268,7 @@ def main():
         print("   - Broker刚重启，$SYS主题还未发布（等待sys_interval时间）")
         print("   - 工作负载刚启动，还未发送消息")
         print("   - 采样时间太短，未收到消息")
+    return sys_interval_ok and sys_topics_ok and workload_ok
 
 if __name__ == "__main__":
     main()
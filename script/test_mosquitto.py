@@ -28,6 +28,16 @@
     model = load_model("path/to/model.zip", env)  # 加载已训练的模型
     
     state, action, reward, reward_sum = play(model, env, show=True)
+
+使用示例（只观察环境与工作负载的交互，不构建神经网络）：
+    python3 script/test_mosquitto.py --random-policy --enable-workload
+
+使用示例（多个环境批量推理，每步只调用一次 model.predict）：
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from script.test_mosquitto import play_batch
+
+    venv = DummyVecEnv([lambda: make_env(cfg) for cfg in env_cfgs])  # 每个环境对应一个独立的 Broker
+    results = play_batch(model, venv)  # [(state, action, reward, reward_sum), ...]，每个环境一组
 """
 
 from __future__ import annotations
@@ -40,23 +50,86 @@ project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-import torch
 import numpy as np
-from typing import Tuple, Optional, TYPE_CHECKING
+from typing import Callable, List, Tuple, Optional, TYPE_CHECKING
 
 from environment import MosquittoBrokerEnv
-from stable_baselines3 import DDPG
 
+# torch / stable_baselines3 只在真正推理时导入，`--help` 与 RandomPolicy 冒烟测试不用付出约 1 秒的导入开销；
+# gymnasium/gym 的 spaces 只用于类型标注
 if TYPE_CHECKING:
+    try:
+        from gymnasium import spaces
+    except ImportError:
+        from gym import spaces
+    import torch
+    from stable_baselines3 import DDPG
+    from stable_baselines3.common.vec_env import VecEnv
+
     from script.workload import WorkloadManager
 
 
+class RandomPolicy:
+    """
+    在动作空间中均匀采样的策略，接口与 model.predict 相同。
+    用于冒烟测试环境与工作负载链路：不分配 actor/critic 参数和优化器状态，启动最快。
+    """
+
+    def __init__(self, action_space: spaces.Space):
+        self.action_space = action_space
+
+    def predict(self, obs, state=None, episode_start=None, deterministic: bool = True):
+        obs = np.asarray(obs)
+        if obs.ndim > 1:  # (n_envs, state_dim) 批次
+            return np.stack([self.action_space.sample() for _ in range(obs.shape[0])]), None
+        return self.action_space.sample(), None
+
+
+def _format_step(step_count: int, s: np.ndarray, a: np.ndarray, r: float, info: dict, done: bool) -> str:
+    """show=True 时单步的详细输出。"""
+    t = step_count - 1
+    knobs = info.get("knobs")
+    knobs_line = f"  应用的配置 (knobs): {knobs}\n" if knobs is not None else ""
+    return (
+        f"\n步骤 {step_count}:\n"
+        f"  状态 (state_{t}):\n"
+        f"    - clients_norm:     {s[0]:.6f}\n"
+        f"    - msg_rate_norm:    {s[1]:.6f}\n"
+        f"    - cpu_ratio:        {s[2]:.6f}\n"
+        f"    - mem_ratio:        {s[3]:.6f}\n"
+        f"    - ctxt_ratio:       {s[4]:.6f}\n"
+        f"  动作 (action_{t}): {a}\n"
+        f"  奖励 (reward_{t}): {r:.6f}\n"
+        f"{knobs_line}"
+        f"  是否结束: {done}\n"
+    )
+
+
+def _make_predictor(
+    model: DDPG,
+    deterministic: bool,
+    compile_actor: bool,
+    batch_size: int = 1,
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    obs -> action 推理函数，见 tuner.utils.make_predictor。
+    没有 SB3 policy 的模型（如 RandomPolicy）直接用 model.predict，不导入 torch / stable_baselines3。
+    """
+    if not hasattr(getattr(model, "policy", None), "_predict"):
+        return lambda obs: model.predict(obs, deterministic=deterministic)[0]
+
+    from tuner.utils import make_predictor
+
+    return make_predictor(model, deterministic, compile_actor=compile_actor, batch_size=batch_size)
+
+
 def play(
     model: DDPG,
     env: MosquittoBrokerEnv,
     show: bool = False,
     deterministic: bool = True,
     workload: Optional["WorkloadManager"] = None,
+    compile_actor: bool = False,
 ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, float]:
     """
     对 Mosquitto Broker 进行一轮测试并记录数据。
@@ -67,21 +140,23 @@ def play(
         show: 是否显示中间过程（显示每步的 state、action、reward）
         deterministic: 是否使用确定性策略（True）或带噪声的策略（False）
         workload: WorkloadManager 实例，如果提供则在测试期间运行工作负载
+        compile_actor: 是否在测试开始前用 torch.compile 编译 actor（见 tuner.utils.make_predictor）
     
     Returns:
         state: 状态序列，shape (n_steps, state_dim)
         action: 动作序列，shape (n_steps, action_dim)
         reward: 奖励序列，shape (n_steps, 1)
         reward_sum: 总奖励
+        state/action/reward 均为 float32、C 连续，由 torch.from_numpy 直接共享轨迹缓冲区内存（无拷贝）
     """
-    state = []
-    action = []
-    reward = []
+    trajectory = _Trajectory.for_env(env)
 
     # 如果提供了工作负载管理器，确保工作负载正在运行
     if workload is not None and not workload.is_running():
         print("启动工作负载...")
         workload.start()
+    # 后台线程监视工作负载进程，循环中只检查 Event，不逐步 poll 子进程
+    workload_exited = workload.watch_exit() if workload is not None else None
 
     # gymnasium兼容：reset返回(obs, info)元组
     reset_result = env.reset()
@@ -89,9 +164,13 @@ def play(
         s, _ = reset_result
     else:
         s = reset_result
+    # 观测在环境边界统一为 float32（MosquittoBrokerEnv 已是 float32，此时不拷贝），
+    # 之后的推理与轨迹记录都不再隐式转换
+    s = np.asarray(s, dtype=np.float32)
     
     done = False
     step_count = 0
+    predict = _make_predictor(model, deterministic, compile_actor)
     
     if show:
         print("\n" + "=" * 80)
@@ -105,7 +184,7 @@ def play(
         step_count += 1
         
         # 使用模型预测动作
-        a, _ = model.predict(s, deterministic=deterministic)
+        a = predict(s)
         
         # 执行动作（兼容gymnasium的返回值格式）
         step_result = env.step(a)
@@ -116,32 +195,19 @@ def play(
             ns, r, terminated, truncated, info = step_result
             done = terminated or truncated
 
-        state.append(s)
-        action.append(a)
-        reward.append(r)
+        trajectory.append(s, a, r)
+        if workload_exited is not None and workload_exited.is_set():
+            print(f"[警告] 工作负载进程在第 {step_count} 步前后退出，之后的数据不含工作负载")
+            workload_exited = None
 
         if show:
-            print(f"\n步骤 {step_count}:")
-            print(f"  状态 (state_{step_count-1}):")
-            print(f"    - clients_norm:     {s[0]:.6f}")
-            print(f"    - msg_rate_norm:    {s[1]:.6f}")
-            print(f"    - cpu_ratio:        {s[2]:.6f}")
-            print(f"    - mem_ratio:        {s[3]:.6f}")
-            print(f"    - ctxt_ratio:       {s[4]:.6f}")
-            print(f"  动作 (action_{step_count-1}): {a}")
-            print(f"  奖励 (reward_{step_count-1}): {r:.6f}")
-            if "knobs" in info:
-                print(f"  应用的配置 (knobs): {info['knobs']}")
-            print(f"  是否结束: {done}")
-
-        s = ns
-
-    # 转换为 torch.Tensor
-    state = torch.FloatTensor(np.array(state))
-    action = torch.FloatTensor(np.array(action))
-    reward = torch.FloatTensor(np.array(reward)).reshape(-1, 1)
-
-    reward_sum = reward.sum().item()
+            # 每步的输出拼成一个字符串，一次 write 写出（而不是十余次 print）
+            sys.stdout.write(_format_step(step_count, s, a, r, info, done))
+            sys.stdout.flush()
+
+        s = np.asarray(ns, dtype=np.float32)
+
+    state, action, reward, reward_sum = trajectory.to_tensors()
 
     if show:
         print("\n" + "=" * 80)
@@ -150,8 +216,9 @@ def play(
         print(f"总步数: {len(reward)}")
         print(f"总奖励: {reward_sum:.6f}")
         print(f"平均奖励: {reward_sum / len(reward) if len(reward) > 0 else 0:.6f}")
-        print(f"最大奖励: {reward.max().item():.6f}")
-        print(f"最小奖励: {reward.min().item():.6f}")
+        min_reward, max_reward = trajectory.reward_range()
+        print(f"最大奖励: {max_reward:.6f}")
+        print(f"最小奖励: {min_reward:.6f}")
         print("\n状态序列形状:", state.shape)
         print("动作序列形状:", action.shape)
         print("奖励序列形状:", reward.shape)
@@ -160,10 +227,107 @@ def play(
     return state, action, reward, reward_sum
 
 
+class _Trajectory:
+    """
+    一条轨迹的 state/action/reward，写入按最大步数预分配的 float32 数组，
+    结束后用 torch.from_numpy 零拷贝转换为 Tensor（不再经由 list -> np.array -> FloatTensor 两次拷贝）。
+    步数未知或超出预分配长度时按倍数扩容。
+    """
+
+    def __init__(self, state_dim: int, action_dim: int, capacity: int = 256):
+        capacity = max(1, capacity)
+        self._states = np.empty((capacity, state_dim), dtype=np.float32)
+        self._actions = np.empty((capacity, action_dim), dtype=np.float32)
+        self._rewards = np.empty((capacity, 1), dtype=np.float32)
+        self._n = 0
+        # 总奖励在循环中用 Python float 累加，结束时不再对 Tensor 做 sum().item()
+        self.reward_sum = 0.0
+
+    @classmethod
+    def for_env(cls, env) -> "_Trajectory":
+        # MosquittoBrokerEnv 在 cfg.max_steps 步时结束；其他 gym 环境读取 spec.max_episode_steps
+        capacity = getattr(getattr(env, "cfg", None), "max_steps", None)
+        if capacity is None and getattr(env, "spec", None) is not None:
+            capacity = env.spec.max_episode_steps
+        kwargs = {"capacity": capacity} if capacity else {}
+        return cls(env.observation_space.shape[0], env.action_space.shape[0], **kwargs)
+
+    def append(self, state, action, reward) -> None:
+        i = self._n
+        if i == len(self._rewards):
+            self._states = np.concatenate([self._states, np.empty_like(self._states)])
+            self._actions = np.concatenate([self._actions, np.empty_like(self._actions)])
+            self._rewards = np.concatenate([self._rewards, np.empty_like(self._rewards)])
+        self._states[i] = state
+        self._actions[i] = action
+        self._rewards[i, 0] = reward
+        self._n = i + 1
+        self.reward_sum += float(reward)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def reward_range(self) -> Tuple[float, float]:
+        """直接在 numpy 缓冲区上求 (最小奖励, 最大奖励)；空轨迹返回 (0.0, 0.0)。"""
+        rewards = self._rewards[:self._n]
+        if not len(rewards):
+            return 0.0, 0.0
+        return float(rewards.min()), float(rewards.max())
+
+    def to_tensors(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, float]:
+        """返回 (state, action, reward, reward_sum)；Tensor 与内部数组共享内存。"""
+        import torch
+
+        n = self._n
+        return (
+            torch.from_numpy(self._states[:n]),
+            torch.from_numpy(self._actions[:n]),
+            torch.from_numpy(self._rewards[:n]),
+            self.reward_sum,
+        )
+
+
+def play_batch(
+    model: DDPG,
+    venv: VecEnv,
+    deterministic: bool = True,
+    workload: Optional["WorkloadManager"] = None,
+    compile_actor: bool = False,
+) -> List[Tuple[torch.Tensor, torch.Tensor, torch.Tensor, float]]:
+    """
+    在向量化环境上各运行一轮，每步对 (n_envs, state_dim) 的观测只调用一次 model.predict。
+
+    VecEnv 会在某个环境结束后自动 reset 它，并继续随其他环境一起 step；
+    每个环境只记录第一轮（到它第一次 done 为止）的数据，全部结束后返回。
+
+    Returns:
+        每个环境一组 (state, action, reward, reward_sum)，含义与 play() 的返回值相同
+    """
+    if workload is not None and not workload.is_running():
+        print("启动工作负载...")
+        workload.start()
+
+    n_envs = venv.num_envs
+    # DummyVecEnv 可以直接读取子环境的最大步数；SubprocVecEnv 等按默认容量预分配
+    template_env = venv.envs[0] if hasattr(venv, "envs") else venv
+    trajectories = [_Trajectory.for_env(template_env) for _ in range(n_envs)]
+    active = np.ones(n_envs, dtype=bool)
+    predict = _make_predictor(model, deterministic, compile_actor, batch_size=n_envs)
+
+    obs = np.asarray(venv.reset(), dtype=np.float32)
+    while active.any():
+        a = predict(obs)
+        next_obs, r, dones, _ = venv.step(a)
+        for i in np.flatnonzero(active):
+            trajectories[i].append(obs[i], a[i], r[i])
+        active &= ~dones
+        obs = np.asarray(next_obs, dtype=np.float32)
+
+    return [trajectory.to_tensors() for trajectory in trajectories]
+
+
 if __name__ == "__main__":
     # 示例使用
-    from tuner.utils import make_env, make_ddpg_model, load_model
-    from script.workload import WorkloadManager
     import argparse
     
     parser = argparse.ArgumentParser(description="Test Mosquitto Broker with DDPG model")
@@ -191,6 +355,16 @@ if __name__ == "__main__":
         default=True,
         help="使用确定性策略（默认：True）",
     )
+    parser.add_argument(
+        "--random-policy",
+        action="store_true",
+        help="使用随机策略（直接从动作空间采样），不构建 DDPG 模型；用于快速检查环境与工作负载",
+    )
+    parser.add_argument(
+        "--compile-actor",
+        action="store_true",
+        help="测试开始前用 torch.compile 编译 actor（首次编译需要数秒）",
+    )
     # 工作负载相关参数
     parser.add_argument(
         "--enable-workload",
@@ -235,6 +409,9 @@ if __name__ == "__main__":
     )
     
     args = parser.parse_args()
+
+    from tuner.utils import make_env, make_ddpg_model, load_model
+    from script.workload import WorkloadManager
     
     # 启用测试模式：不实际写入配置文件，只观察交互结果
     import os
@@ -243,7 +420,12 @@ if __name__ == "__main__":
     env = make_env()
     
     # 如果提供了模型路径，加载已训练的模型；否则创建未训练的模型用于测试
-    if args.model_path:
+    if args.random_policy:
+        if args.model_path:
+            parser.error("--random-policy 与 --model-path 不能同时使用")
+        print("使用随机策略进行测试（不构建 DDPG 模型）")
+        model = RandomPolicy(env.action_space)
+    elif args.model_path:
         print(f"加载已训练的模型: {args.model_path}")
         model = load_model(args.model_path, env, device=args.device)
     else:
@@ -269,6 +451,7 @@ if __name__ == "__main__":
                 topic=args.workload_topic,
                 message_rate=args.workload_message_rate,
                 message_size=args.workload_message_size,
+                verify=True,
             )
             print(f"[工作负载] 工作负载启动成功！")
             print(f"[工作负载] 可以使用以下命令监听消息:")
@@ -290,6 +473,7 @@ if __name__ == "__main__":
             show=args.show, 
             deterministic=args.deterministic,
             workload=workload,
+            compile_actor=args.compile_actor,
         )
         
         if not args.show:
@@ -298,8 +482,9 @@ if __name__ == "__main__":
             print(f"  总步数: {len(reward)}")
             print(f"  总奖励: {reward_sum:.6f}")
             print(f"  平均奖励: {reward_sum / len(reward) if len(reward) > 0 else 0:.6f}")
-            print(f"  最大奖励: {reward.max().item():.6f}")
-            print(f"  最小奖励: {reward.min().item():.6f}")
+            rewards = reward.numpy()
+            print(f"  最大奖励: {rewards.max() if len(rewards) else 0.0:.6f}")
+            print(f"  最小奖励: {rewards.min() if len(rewards) else 0.0:.6f}")
     finally:
         # 确保工作负载被停止
         if workload is not None:
@@ -23,8 +23,6 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from script.workload import WorkloadManager, WorkloadConfig
-
 
 def test_workload(
     duration: int = 60,
@@ -44,6 +42,9 @@ def test_workload(
     Returns:
         True 如果测试成功，False 如果失败
     """
+    # 在函数内导入：`--help` 等只解析参数的调用不加载 script.workload 及其依赖
+    from script.workload import WorkloadManager, WorkloadConfig
+
     print("=" * 80)
     print("工作负载测试脚本")
     print("=" * 80)
@@ -98,7 +99,7 @@ def test_workload(
     # 启动工作负载
     print("启动工作负载...")
     try:
-        workload.start(config=workload_config)
+        workload.start(config=workload_config, verify=True)
         print("✅ 工作负载启动成功！")
         print()
     except Exception as e:
@@ -124,21 +125,19 @@ def test_workload(
     
     start_time = time.time()
     elapsed = 0
+    # 进度报告时刻（相对 start_time 的绝对期限）：每 10 秒一次，最后 5 秒内每秒一次，最后在 duration 处结束；
+    # 按 start_time + d 计算等待时长，打印等耗时不会累积成漂移
+    deadlines = sorted(set(range(10, duration, 10)) | set(range(max(1, duration - 4), duration + 1)))
     
     try:
-        while elapsed < duration:
-            time.sleep(1)
-            elapsed = int(time.time() - start_time)
-            remaining = duration - elapsed
-            
-            # 检查进程是否还在运行
-            if not workload.is_running():
+        # 阻塞在进程退出事件上（Linux 上为 pidfd），只在报告时刻醒来
+        for deadline in deadlines:
+            if workload.wait_for_exit(timeout=max(0.0, start_time + deadline - time.time())):
+                elapsed = int(time.time() - start_time)
                 print(f"\n❌ 工作负载进程在运行 {elapsed} 秒后退出")
                 return False
-            
-            # 显示进度
-            if elapsed % 10 == 0 or remaining <= 5:
-                print(f"  运行中... {elapsed}/{duration} 秒 (剩余 {remaining} 秒)")
+            elapsed = deadline
+            print(f"  运行中... {elapsed}/{duration} 秒 (剩余 {duration - elapsed} 秒)")
         
         print(f"\n✅ 测试完成！工作负载正常运行了 {duration} 秒")
         print()
@@ -32,20 +32,43 @@
 
 from __future__ import annotations
 
+import functools
+import selectors
+import shlex
+import shutil
 import subprocess
 import time
 import os
 import signal
+import socket
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass
 from collections import deque
 import threading
 
 
-@dataclass
+# 工作负载进程输出的单次读取上限与每个进程保留的末尾输出长度
+_OUTPUT_READ_SIZE = 64 * 1024
+_OUTPUT_TAIL_BYTES = 4096
+# emqtt_bench 有客户端连接成功后输出的统计行包含 connect_succ，用于判断进程已就绪
+_READY_MARKER = b"connect_succ"
+
+
+@functools.lru_cache(maxsize=8)
+def _resolve_emqtt_bench(path: str) -> Optional[str]:
+    """
+    把 emqtt_bench 路径或命令名解析为绝对路径，找不到时返回 None。
+    已存在的文件优先，其次在 PATH 中查找（shutil.which，不再为此 fork 一个 which 进程）。
+    """
+    if Path(path).exists():
+        return str(Path(path).absolute())
+    return shutil.which(path)
+
+
+@dataclass(frozen=True)
 class WorkloadConfig:
-    """工作负载配置"""
+    """工作负载配置（不可变：start() 用 == 与上一次的配置比较，决定能否沿用正在运行的进程）"""
     # 发布者配置
     num_publishers: int = 100
     publisher_interval_ms: int = 100  # 每个发布者发布消息的间隔（毫秒）
@@ -83,6 +106,8 @@ class WorkloadManager:
         emqtt_bench_path: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
+        verbose: bool = True,
+        capture_output: bool = True,
     ):
         """
         初始化工作负载管理器。
@@ -94,8 +119,21 @@ class WorkloadManager:
                             如果为 None，会尝试从环境变量或默认路径查找
             username: MQTT 用户名（可选）
             password: MQTT 密码（可选）
+            verbose: 是否打印启动/停止过程（完整命令行、PID 等）；警告与错误始终打印。
+                训练中环境频繁 restart 时可设为 False，跳过这些字符串的拼接与输出
+            capture_output: 是否读取 emqtt_bench 的输出（默认开启）。开启时后台线程读走输出并保留末尾内容，
+                用于启动就绪判断（connect_succ）和失败诊断；关闭时输出直接重定向到 /dev/null，
+                内核丢弃数据，不再有管道拷贝与读取线程，但启动检查退回固定等待、失败时没有输出信息
         """
-        self.broker_host = broker_host
+        self.verbose = verbose
+        self.capture_output = capture_output
+        self.broker_host = broker_host  # 仅用于显示
+        # 只解析一次主机名：emqtt_bench 的 -h 与 paho 的 connect 都直接使用 IP，
+        # 之后每次 start()/验证不再各自走一遍 getaddrinfo；解析失败时保留原字符串，由使用方报错
+        try:
+            self._resolved_host = socket.getaddrinfo(broker_host, broker_port, type=socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            self._resolved_host = broker_host
         self.broker_port = broker_port
         self.username = username
         self.password = password
@@ -105,19 +143,30 @@ class WorkloadManager:
             emqtt_bench_path = os.environ.get("EMQTT_BENCH_PATH", "emqtt_bench")
         
         self.emqtt_bench_path = Path(emqtt_bench_path)
-        if not self.emqtt_bench_path.exists() and not self._is_in_path(emqtt_bench_path):
+        resolved = _resolve_emqtt_bench(str(emqtt_bench_path))
+        if resolved is None:
+            _resolve_emqtt_bench.cache_clear()  # 不缓存失败结果，安装后可直接重试
             raise FileNotFoundError(
                 f"emqtt_bench 未找到: {emqtt_bench_path}\n"
                 f"请安装 emqtt_bench 或设置 EMQTT_BENCH_PATH 环境变量\n"
                 f"安装方法: git clone https://github.com/emqx/emqtt-bench.git && cd emqtt-bench && make"
             )
         
-        self.emqtt_bench_cmd = str(self.emqtt_bench_path) if self.emqtt_bench_path.exists() else emqtt_bench_path
+        self.emqtt_bench_cmd = resolved
+        # 连接参数在实例生命周期内不变，只构建一次（restart 频繁时不再重复拼接）
+        self._base_suffix_args = (
+            ("-h", self._resolved_host, "-p", str(broker_port))
+            + (("-u", username) if username else ())
+            + (("-P", password) if password else ())
+        )
         
         # 存储运行中的进程
         self._processes: List[subprocess.Popen] = []
         self._is_running = False
         self._last_config: Optional[WorkloadConfig] = None  # 保存最后一次使用的配置，用于重启
+        self._output_tails: Dict[int, bytearray] = {}  # pid -> 最近的 stdout/stderr 输出（用于诊断）
+        self._drainers: Dict[int, threading.Thread] = {}  # pid -> 该进程的输出读取线程
+        self._output_ready: Dict[int, threading.Event] = {}  # pid -> 输出就绪标记或管道关闭时置位
         self._latency_samples = deque(maxlen=256)
         self._latency_lock = threading.Lock()
         self._latency_probe_client = None
@@ -127,19 +176,14 @@ class WorkloadManager:
         self._latency_probe_interval_sec = 1.0
         self._latency_probe_window_size = 256
         self._latency_probe_topic = "__broker_tuner/latency_probe"
-    
-    def _is_in_path(self, cmd: str) -> bool:
-        """检查命令是否在系统 PATH 中"""
-        try:
-            subprocess.run(
-                ["which", cmd],
-                capture_output=True,
-                check=True,
-                timeout=1
-            )
-            return True
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+        self._stop_timer: Optional[threading.Timer] = None  # config.duration > 0 时的定时停止
+        # _verify_messages_sending 复用的长连接客户端（首次验证时创建）
+        self._verify_client = None
+        self._verify_topic: Optional[str] = None
+        self._verify_event = threading.Event()
+        self._verify_failed = False
+        # watch_exit 为当前这批进程创建的 (pid 元组, Event)；同一批进程只启动一个监视线程
+        self._exit_watch: Optional[Tuple[Tuple[int, ...], threading.Event]] = None
     
     def start(
         self,
@@ -151,6 +195,8 @@ class WorkloadManager:
         message_size: int = 100,
         duration: int = 0,
         qos: int = 0,
+        verify: bool = False,
+        force: bool = False,
     ) -> None:
         """
         启动工作负载。
@@ -164,13 +210,17 @@ class WorkloadManager:
             message_size: 消息大小（字节）
             duration: 运行时间（秒），0表示持续运行
             qos: QoS 级别（0, 1, 或 2）
+            verify: 是否等待 5 秒并订阅主题验证消息确实在发送（默认关闭）。
+                进程启动即退出的错误已由启动后的 poll() 检查抛出；训练中每次 restart 都验证会在关键路径上多花 5~10 秒，
+                因此只在命令行工具中开启
+            force: 为 False 时，如果工作负载正以相同配置运行（且进程都还活着），直接返回而不重新启动；
+                为 True 时总是停止并重新启动（restart() 总会先 stop，不受影响）
         """
-        # 如果已经在运行，先停止
-        if self._is_running:
-            print("[工作负载] 检测到工作负载已在运行，先停止旧进程...")
-            self.stop()
-        
         if config is None:
+            # 计算每个发布者的间隔（毫秒）
+            publisher_interval_ms = WorkloadConfig.publisher_interval_ms
+            if num_publishers > 0 and message_rate > 0:
+                publisher_interval_ms = max(1, int(1000 * num_publishers / message_rate))
             config = WorkloadConfig(
                 num_publishers=num_publishers,
                 num_subscribers=num_subscribers,
@@ -178,106 +228,78 @@ class WorkloadManager:
                 message_size=message_size,
                 qos=qos,
                 duration=duration,
+                publisher_interval_ms=publisher_interval_ms,
             )
-            # 计算每个发布者的间隔（毫秒）
-            if num_publishers > 0 and message_rate > 0:
-                config.publisher_interval_ms = max(1, int(1000 * num_publishers / message_rate))
+        
+        # 配置未变且进程都在运行：沿用现有进程，省去进程退出/重建与等待连接的开销
+        if (
+            not force
+            and self._is_running
+            and config == self._last_config
+            and self._processes
+            and all(process.poll() is None for process in self._processes)
+        ):
+            if self.verbose:
+                print("[工作负载] 工作负载已以相同配置运行，跳过重启")
+            return
+        
+        # 如果已经在运行，先停止
+        if self._is_running:
+            print("[工作负载] 检测到工作负载已在运行，先停止旧进程...")
+            self.stop()
         
         self._processes = []
+        self._output_tails = {}
+        self._drainers = {}
+        self._output_ready = {}
         
         # 保存配置用于后续重启
         self._last_config = config
         
-        # 启动订阅者
-        if config.num_subscribers > 0:
-            sub_cmd = self._build_sub_command(config)
-            print(f"[工作负载] 执行订阅命令: {' '.join(sub_cmd)}")
-            sub_process = subprocess.Popen(
-                sub_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid if os.name != 'nt' else None,
-            )
-            self._processes.append(sub_process)
-            print(f"[工作负载] 启动 {config.num_subscribers} 个订阅者 (PID: {sub_process.pid})...")
-            time.sleep(1)  # 等待订阅者连接
-            
-            # 检查进程是否启动成功
-            if sub_process.poll() is not None:
-                # 进程已退出，读取错误信息
-                stdout, stderr = sub_process.communicate()
-                stdout_msg = stdout.decode('utf-8', errors='ignore') if stdout else ""
-                stderr_msg = stderr.decode('utf-8', errors='ignore') if stderr else ""
-                
-                error_info = []
-                if stdout_msg:
-                    error_info.append(f"标准输出: {stdout_msg[:500]}")
-                if stderr_msg:
-                    error_info.append(f"错误输出: {stderr_msg[:500]}")
-                if not error_info:
-                    error_info.append("无输出信息")
-                
-                raise RuntimeError(
-                    f"订阅者进程启动失败 (退出码: {sub_process.returncode})\n"
-                    f"命令: {' '.join(sub_cmd)}\n"
-                    + "\n".join(error_info)
-                )
-        
-        # 启动发布者
-        if config.num_publishers > 0:
-            pub_cmd = self._build_pub_command(config)
-            print(f"[工作负载] 执行发布命令: {' '.join(pub_cmd)}")
-            pub_process = subprocess.Popen(
-                pub_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid if os.name != 'nt' else None,
-            )
-            self._processes.append(pub_process)
-            print(f"[工作负载] 启动 {config.num_publishers} 个发布者 (PID: {pub_process.pid})...")
-            
-            # 检查进程是否启动成功
-            time.sleep(0.5)  # 短暂等待，检查进程是否立即退出
-            if pub_process.poll() is not None:
-                # 进程已退出，读取错误信息
-                stdout, stderr = pub_process.communicate()
-                stdout_msg = stdout.decode('utf-8', errors='ignore') if stdout else ""
-                stderr_msg = stderr.decode('utf-8', errors='ignore') if stderr else ""
-                
-                error_info = []
-                if stdout_msg:
-                    error_info.append(f"标准输出: {stdout_msg[:500]}")
-                if stderr_msg:
-                    error_info.append(f"错误输出: {stderr_msg[:500]}")
-                if not error_info:
-                    error_info.append("无输出信息")
-                
-                raise RuntimeError(
-                    f"发布者进程启动失败 (退出码: {pub_process.returncode})\n"
-                    f"命令: {' '.join(pub_cmd)}\n"
-                    + "\n".join(error_info)
-                )
-        
-        # 启动连接测试（如果配置）
-        if config.num_connections > 0:
-            conn_cmd = self._build_conn_command(config)
-            conn_process = subprocess.Popen(
-                conn_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid if os.name != 'nt' else None,
-            )
-            self._processes.append(conn_process)
-            print(f"启动 {config.num_connections} 个连接...")
-        
+        # 任一进程启动失败时，结束已经启动的进程再抛出，不留下孤儿进程
+        try:
+            # 启动订阅者
+            if config.num_subscribers > 0:
+                sub_cmd = self._build_sub_command(config)
+                if self.verbose:
+                    print(f"[工作负载] 执行订阅命令: {shlex.join(sub_cmd)}")
+                sub_process = self._spawn(sub_cmd)
+                if self.verbose:
+                    print(f"[工作负载] 启动 {config.num_subscribers} 个订阅者 (PID: {sub_process.pid})...")
+                self._wait_ready(sub_process, timeout=1.0)  # 等待订阅者开始连接
+                self._check_started("订阅者", sub_process, sub_cmd)
+        
+            # 启动发布者
+            if config.num_publishers > 0:
+                pub_cmd = self._build_pub_command(config)
+                if self.verbose:
+                    print(f"[工作负载] 执行发布命令: {shlex.join(pub_cmd)}")
+                pub_process = self._spawn(pub_cmd)
+                if self.verbose:
+                    print(f"[工作负载] 启动 {config.num_publishers} 个发布者 (PID: {pub_process.pid})...")
+                self._wait_ready(pub_process, timeout=0.5)  # 短暂等待，检查进程是否立即退出
+                self._check_started("发布者", pub_process, pub_cmd)
+        
+            # 启动连接测试（如果配置）
+            if config.num_connections > 0:
+                conn_cmd = self._build_conn_command(config)
+                conn_process = self._spawn(conn_cmd)
+                if self.verbose:
+                    print(f"启动 {config.num_connections} 个连接...")
+                self._check_started("连接测试", conn_process, conn_cmd)
+        except BaseException:
+            self._terminate_processes()
+            raise
+
         self._is_running = True
-        print(f"[工作负载] 工作负载已启动，共 {len(self._processes)} 个进程")
-        print(f"[工作负载] 主题: {config.topic}, QoS: {config.qos}")
-        print(f"[工作负载] 发布者间隔: {config.publisher_interval_ms}ms")
+        if self.verbose:
+            print(f"[工作负载] 工作负载已启动，共 {len(self._processes)} 个进程")
+            print(f"[工作负载] 主题: {config.topic}, QoS: {config.qos}")
+            print(f"[工作负载] 发布者间隔: {config.publisher_interval_ms}ms")
         self._start_latency_probe()
         
         # 验证工作负载是否真的在发送消息（等待5秒后验证）
-        if config.num_publishers > 0:
+        if verify and config.num_publishers > 0:
             print(f"[工作负载] 等待5秒后验证消息发送...")
             time.sleep(5.0)
             if self._verify_messages_sending(config.topic):
@@ -287,16 +309,11 @@ class WorkloadManager:
                 print(f"[工作负载] 提示：可以使用以下命令手动验证:")
                 print(f"  mosquitto_sub -h {self.broker_host} -p {self.broker_port} -t '{config.topic}' -C 1")
         
-        # 如果设置了持续时间，在后台启动定时停止
+        # 如果设置了持续时间，到时自动停止；stop()（包括 restart 时）会取消它，不会误停之后新启动的工作负载
         if config.duration > 0:
-            def _auto_stop():
-                time.sleep(config.duration)
-                if self._is_running:
-                    self.stop()
-            
-            import threading
-            timer = threading.Thread(target=_auto_stop, daemon=True)
-            timer.start()
+            self._stop_timer = threading.Timer(config.duration, self.stop)
+            self._stop_timer.daemon = True
+            self._stop_timer.start()
     
     def _build_base_args(self, subcommand: str) -> List[str]:
         """构建基础命令行参数
@@ -304,19 +321,8 @@ class WorkloadManager:
         Args:
             subcommand: 子命令（pub/sub/conn），必须放在命令开头
         """
-        args = [
-            self.emqtt_bench_cmd,
-            subcommand,  # 子命令必须在最前面
-            "-h", self.broker_host,
-            "-p", str(self.broker_port),
-        ]
-        
-        if self.username:
-            args.extend(["-u", self.username])
-        if self.password:
-            args.extend(["-P", self.password])
-        
-        return args
+        # 子命令必须在最前面；返回新列表，各 _build_*_command 可以直接追加
+        return [self.emqtt_bench_cmd, subcommand, *self._base_suffix_args]
     
     def _build_pub_command(self, config: WorkloadConfig) -> List[str]:
         """构建发布命令"""
@@ -393,7 +399,7 @@ class WorkloadManager:
         client.on_message = on_message
 
         try:
-            client.connect(self.broker_host, self.broker_port, 30)
+            client.connect(self._resolved_host, self.broker_port, 30)
             client.loop_start()
             self._latency_probe_client = client
         except Exception as exc:
@@ -464,40 +470,166 @@ class WorkloadManager:
             "window_size": self._latency_probe_window_size,
         }
     
+    def _start_output_drainer(self, process: subprocess.Popen) -> None:
+        """
+        进程一启动就用后台线程持续读走它的 stdout/stderr。
+        emqtt_bench 会周期性输出统计信息，管道无人读取时写满（64KB）后进程会阻塞在 write 上；
+        启动检查期间（sleep 0.5~1 秒）同样需要有人读取。
+        线程用 selectors 同时等待两个管道，每次就绪后一次 os.read 最多读 64KB，
+        只保留最后 _OUTPUT_TAIL_BYTES 字节，供启动失败或意外退出时诊断。
+        """
+        tail = bytearray()
+        ready = threading.Event()
+        self._output_tails[process.pid] = tail
+        self._output_ready[process.pid] = ready
+        pipes = [pipe for pipe in (process.stdout, process.stderr) if pipe is not None]
+
+        def _drain() -> None:
+            with selectors.DefaultSelector() as selector:
+                for pipe in pipes:
+                    selector.register(pipe, selectors.EVENT_READ)
+                while selector.get_map():
+                    for key, _ in selector.select():
+                        try:
+                            data = os.read(key.fd, _OUTPUT_READ_SIZE)
+                        except OSError:
+                            data = b""
+                        if not data:
+                            selector.unregister(key.fileobj)
+                            continue
+                        tail.extend(data)
+                        del tail[:-_OUTPUT_TAIL_BYTES]
+                        if not ready.is_set():
+                            # 连同上次读取的末尾一起查找，跨两次 os.read 的标记也能命中
+                            window = bytes(tail[-(len(data) + len(_READY_MARKER)):]).lower()
+                            if _READY_MARKER in window:
+                                ready.set()
+            # 管道全部关闭通常意味着进程已退出：先回收，保证被唤醒的 _wait_ready 随后 poll() 能看到退出码
+            try:
+                process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                pass
+            ready.set()
+
+        drainer = threading.Thread(target=_drain, name=f"workload-output-{process.pid}", daemon=True)
+        drainer.start()
+        self._drainers[process.pid] = drainer
+
+    def _wait_ready(self, process: subprocess.Popen, timeout: float) -> bool:
+        """
+        等待进程输出就绪标记或退出，最多 timeout 秒（即原先固定 sleep 的时长）。
+        emqtt_bench 开始连接后立即返回，不必每次（重）启动都睡满固定时长。
+
+        Returns:
+            True 如果看到了就绪标记或进程已退出，False 如果超时
+        """
+        ready = self._output_ready.get(process.pid)
+        if ready is None:
+            time.sleep(timeout)
+            return False
+        return ready.wait(timeout)
+
+    def _spawn(self, cmd: List[str]) -> subprocess.Popen:
+        """
+        启动一个 emqtt_bench 进程并立即开始读取它的输出。
+        进程放入独立的会话/进程组，stop() 用 killpg 一并结束。
+        用 start_new_session 而不是 preexec_fn=os.setsid：有 preexec_fn 时 CPython 只能 fork 整个
+        （可能占用数 GB 内存的训练）进程再在子进程里执行 Python 代码，否则可以走 vfork 快路径。
+        """
+        output = subprocess.PIPE if self.capture_output else subprocess.DEVNULL
+        process = subprocess.Popen(
+            cmd,
+            stdout=output,
+            stderr=output,
+            start_new_session=os.name != 'nt',
+        )
+        self._processes.append(process)
+        if self.capture_output:
+            self._start_output_drainer(process)
+        return process
+
+    def _check_started(self, role: str, process: subprocess.Popen, cmd: List[str]) -> None:
+        """
+        进程仍在运行则直接返回；已退出则抛出 RuntimeError，
+        错误信息中的输出取自读取线程保留的末尾内容（不调用 communicate）。
+        """
+        if process.poll() is None:
+            return
+        # 进程已退出，管道在其余持有者关闭后到达 EOF；最多等 1 秒让读取线程读完
+        drainer = self._drainers.get(process.pid)
+        if drainer is not None:
+            drainer.join(timeout=1.0)
+        output = bytes(self._output_tails.get(process.pid, b"")).decode("utf-8", errors="ignore").strip()
+        raise RuntimeError(
+            f"{role}进程启动失败 (退出码: {process.returncode})\n"
+            f"命令: {shlex.join(cmd)}\n"
+            + (f"输出: {output[-500:]}" if output else "无输出信息")
+        )
+
+    @staticmethod
+    def _signal_process(process: subprocess.Popen, force: bool = False) -> None:
+        """向进程所在的进程组发送 SIGTERM（force=True 时 SIGKILL）；Windows 上直接终止进程。"""
+        try:
+            if os.name != 'nt':
+                # Unix/Linux: 进程以 start_new_session 启动，进程组 ID 就是它的 PID；
+                # 即使组长已退出并被回收，仍能结束组内残留的子进程
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+            elif force:
+                process.kill()
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass  # 进程组已全部结束
+        except OSError as e:
+            print(f"警告: 停止进程时出错: {e}")
+
     def stop(self) -> None:
         """停止所有工作负载进程"""
+        if self._stop_timer is not None:
+            self._stop_timer.cancel()
+            self._stop_timer = None
         if not self._is_running:
             return
         
-        print("正在停止工作负载...")
+        if self.verbose:
+            print("正在停止工作负载...")
         self._stop_latency_probe()
         
+        self._terminate_processes()
+        self._is_running = False
+        if self.verbose:
+            print("工作负载已停止")
+
+    def _terminate_processes(self) -> None:
+        """结束 self._processes 中的全部进程（组）并回收输出读取线程，然后清空进程列表。"""
+        # 先向所有进程发送 SIGTERM，再在共同的 5 秒期限内等待，最后对仍未退出的进程统一 SIGKILL：
+        # 最坏情况总共等待 5 秒，而不是每个进程各等 5 秒
+        for process in self._processes:
+            self._signal_process(process)
+        deadline = time.monotonic() + 5.0
+        survivors = []
         for process in self._processes:
             try:
-                if os.name != 'nt':
-                    # Unix/Linux: 发送信号到进程组
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                else:
-                    # Windows: 终止进程
-                    process.terminate()
-                
-                # 等待进程结束，最多等待5秒
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # 强制终止
-                    if os.name != 'nt':
-                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                    else:
-                        process.kill()
-                    process.wait()
-            except (ProcessLookupError, OSError) as e:
-                # 进程可能已经结束
-                print(f"警告: 停止进程时出错: {e}")
-        
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                survivors.append(process)
+        for process in survivors:
+            # 强制终止
+            self._signal_process(process, force=True)
+        for process in survivors:
+            process.wait()
+        
+        # 进程组已结束，管道随之到达 EOF；回收读取线程后关闭管道（仍未退出的线程保留管道，由其自行结束）
+        for process in self._processes:
+            drainer = self._drainers.pop(process.pid, None)
+            if drainer is not None:
+                drainer.join(timeout=1.0)
+                if drainer.is_alive():
+                    continue
+            for pipe in (process.stdout, process.stderr):
+                if pipe is not None:
+                    pipe.close()
         self._processes = []
-        self._is_running = False
-        print("工作负载已停止")
     
     def is_running(self) -> bool:
         """检查工作负载是否正在运行"""
@@ -512,23 +644,92 @@ class WorkloadManager:
             else:
                 # 进程已结束
                 print(f"[工作负载] 警告: 工作负载进程已结束 (退出码: {process.returncode})")
+                tail = self._output_tails.get(process.pid)
+                if tail:
+                    print(f"[工作负载] 最后输出: {bytes(tail[-500:]).decode('utf-8', errors='ignore')}")
         
         self._processes = alive_processes
         self._is_running = len(self._processes) > 0
         
         return self._is_running
     
-    def restart(self) -> None:
+    def wait_for_exit(self, timeout: Optional[float] = None) -> bool:
+        """
+        阻塞等待任一工作负载进程退出，最多 timeout 秒（None 表示一直等待）。
+        Linux 5.3+ 上通过 pidfd + selectors 等待，进程退出时立即返回，无需周期性 poll；
+        其他平台退化为每 0.5 秒 poll 一次。
+
+        Returns:
+            True 如果有进程已退出（或没有运行中的进程），False 如果超时
+        """
+        processes = list(self._processes)
+        if not processes or any(process.poll() is not None for process in processes):
+            return True
+
+        pidfd_open = getattr(os, "pidfd_open", None)
+        pidfds: List[int] = []
+        try:
+            if pidfd_open is not None:
+                try:
+                    for process in processes:
+                        pidfds.append(pidfd_open(process.pid))
+                except ProcessLookupError:
+                    return True  # 进程已退出并被回收
+                except OSError:
+                    pidfds = []  # 内核不支持 pidfd_open
+            if pidfds:
+                with selectors.DefaultSelector() as selector:
+                    for fd in pidfds:
+                        selector.register(fd, selectors.EVENT_READ)
+                    return bool(selector.select(timeout))
+        finally:
+            for fd in pidfds:
+                os.close(fd)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if any(process.poll() is not None for process in processes):
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(0.5, remaining))
+            else:
+                time.sleep(0.5)
+
+    def watch_exit(self) -> threading.Event:
+        """
+        启动后台线程监视当前这批工作负载进程，任一进程退出时置位返回的 Event。
+        调用方只需检查 Event（一次属性读取），不必在每一步 poll 子进程。
+        同一批进程重复调用返回同一个 Event，不会再启动线程；监视线程在该批进程退出（包括 stop()）后结束。
+        """
+        pids = tuple(process.pid for process in self._processes)
+        if self._exit_watch is not None and self._exit_watch[0] == pids:
+            return self._exit_watch[1]
+        exited = threading.Event()
+        self._exit_watch = (pids, exited)
+
+        def _watch() -> None:
+            self.wait_for_exit()
+            exited.set()
+
+        threading.Thread(target=_watch, name="workload-exit-watcher", daemon=True).start()
+        return exited
+
+    def restart(self, verify: bool = False) -> None:
         """
         重启工作负载（使用最后一次的配置）
         
         如果工作负载已停止，会使用保存的配置重新启动。
         如果工作负载正在运行，会先停止再重启。
+        verify 含义同 start()。
         """
         if self._last_config is None:
             raise RuntimeError("无法重启：没有保存的配置。请先调用 start() 启动工作负载。")
         
-        print("[工作负载] 重启工作负载...")
+        if self.verbose:
+            print("[工作负载] 重启工作负载...")
         if self._is_running:
             self.stop()
         
@@ -536,12 +737,17 @@ class WorkloadManager:
         time.sleep(1.0)
         
         # 使用保存的配置重启
-        self.start(config=self._last_config)
+        self.start(config=self._last_config, verify=verify)
     
     def _verify_messages_sending(self, topic: str, timeout_sec: float = 5.0) -> bool:
         """
         验证工作负载是否真的在发送消息
         
+        复用一个长连接客户端：只在首次调用（或客户端已关闭）时建立 MQTT 连接，
+        之后每次验证只需 SUBSCRIBE 一次、收到一条消息后 UNSUBSCRIBE，
+        不再为每次 reset/restart 付出一次 TCP + CONNECT/CONNACK 握手；
+        验证结束即退订，避免在训练期间持续接收工作负载的全部消息。
+        
         Args:
             topic: MQTT主题
             timeout_sec: 超时时间（秒）
@@ -551,47 +757,67 @@ class WorkloadManager:
         """
         try:
             import paho.mqtt.client as mqtt
-            received_messages = []
-            
-            def on_connect(client, userdata, flags, rc):
-                if rc == 0:
-                    client.subscribe(topic)
-                else:
-                    received_messages.append(None)  # 标记连接失败
-            
-            def on_message(client, userdata, msg):
-                received_messages.append(msg.payload)
-                client.disconnect()  # 收到一条消息就断开
-            
-            client = mqtt.Client()
-            client.on_connect = on_connect
-            client.on_message = on_message
-            
-            # 连接到Broker
-            try:
-                client.connect(self.broker_host, self.broker_port, 60)
-                client.loop_start()
-                
-                # 等待消息
-                start_time = time.time()
-                while len(received_messages) == 0 and (time.time() - start_time) < timeout_sec:
-                    time.sleep(0.1)
-                
-                client.loop_stop()
-                client.disconnect()
-                
-                return len(received_messages) > 0 and received_messages[0] is not None
-            except Exception as e:
-                print(f"[工作负载] 验证消息发送时出错: {e}")
-                return False
         except ImportError:
             # paho-mqtt未安装，跳过验证
             print("[工作负载] 警告: paho-mqtt未安装，跳过消息验证")
             return True  # 假设成功，避免阻塞
+        
+        try:
+            self._verify_event.clear()
+            self._verify_failed = False
+            self._verify_topic = topic
+            client = self._verify_client
+            if client is None:
+                client = self._create_verify_client(mqtt)
+            else:
+                client.subscribe(topic)
+            
+            # 阻塞等待事件，而不是轮询
+            self._verify_event.wait(timeout_sec)
+            received = self._verify_event.is_set() and not self._verify_failed
+            self._verify_topic = None
+            client.unsubscribe(topic)
+            if self._verify_failed:
+                self._close_verify_client()
+            return received
         except Exception as e:
             print(f"[工作负载] 验证消息发送时出错: {e}")
+            self._close_verify_client()
             return False
     
+    def _create_verify_client(self, mqtt):
+        """创建并连接验证用客户端；连接（包括 Broker 重启后 paho 的自动重连）成功时订阅当前验证主题。"""
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                if self._verify_topic is not None:
+                    client.subscribe(self._verify_topic)
+            else:
+                self._verify_failed = True  # 标记连接失败
+                self._verify_event.set()
+        
+        def on_message(client, userdata, msg):
+            if self._verify_topic is not None:
+                self._verify_event.set()
+        
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.connect(self._resolved_host, self.broker_port, 60)
+        client.loop_start()
+        self._verify_client = client
+        return client
+    
+    def _close_verify_client(self) -> None:
+        client = self._verify_client
+        if client is None:
+            return
+        self._verify_client = None
+        try:
+            client.disconnect()
+            client.loop_stop()
+        except Exception:
+            pass
+    
     def __enter__(self):
         """上下文管理器入口"""
         return self
@@ -599,6 +825,13 @@ class WorkloadManager:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器退出"""
         self.stop()
+        self._close_verify_client()
+    
+    def __del__(self):
+        try:
+            self._close_verify_client()
+        except Exception:
+            pass
 
 
 if __name__ == "__main__":
@@ -684,6 +917,7 @@ if __name__ == "__main__":
             message_size=args.message_size,
             duration=args.duration,
             qos=args.qos,
+            verify=True,
         )
         
         if args.duration == 0:
@@ -14,8 +14,6 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from script.workload import WorkloadManager, WorkloadConfig
-from script.test_mosquitto import play
-from tuner.utils import make_env, make_ddpg_model, load_model
 
 
 def example_1_basic_usage():
@@ -75,6 +73,10 @@ def example_3_with_test():
     print("      查看 state、action、reward 的输出")
     print("=" * 50)
     
+    # 只有本示例需要环境与模型：在这里导入，其余示例不必加载 torch / stable_baselines3
+    from script.test_mosquitto import play
+    from tuner.utils import make_env, make_ddpg_model
+    
     # 创建环境和未训练的模型（用于测试观察）
     env = make_env()
     model = make_ddpg_model(env, device="cpu")
@@ -5,22 +5,84 @@
   - 通过 POST /apply_knobs 接收 JSON 形式的 broker 配置
   - 内部调用 environment.knobs.apply_knobs(knobs)，让外部系统可以独立控制 broker
   - 方便你的强化学习/调参模块与实际运行的 Broker 解耦
+
+默认使用标准库的 KnobHTTPServer（每连接一个线程）；传入 --asgi（run_server(use_asgi=True)）时
+以 ASGI 应用（asgi_app）运行在 uvicorn 的单线程事件循环上（需另行安装 uvicorn，见 requirements-optional.txt）。
+两者共用 handle_request，接口与响应完全相同。
 """
 
 from __future__ import annotations
 
+import argparse
+import asyncio
 import json
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Any, Dict
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
 from environment.knobs import apply_knobs
 
+try:
+    import uvicorn  # 可选：ASGI 服务器
+except ImportError:
+    uvicorn = None  # type: ignore
+
+try:
+    import orjson  # 可选：直接在 bytes 上解析/序列化 JSON，省去 decode/encode，比标准库 json 快数倍
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads  # 标准库 json.loads 同样接受 utf-8 bytes
+
+    def _json_dumps(payload: Any) -> bytes:
+        return json.dumps(payload).encode("utf-8")
+
+
+def handle_request(path: str, raw_body: bytes, apply_lock: threading.Lock) -> Tuple[int, Dict[str, Any]]:
+    """
+    处理一个 POST 请求，返回 (状态码, JSON 响应)。
+    apply_knobs 会改写配置文件并重启 Broker，不是线程安全的，调用时持有 apply_lock。
+    """
+    if path != "/apply_knobs":
+        return 404, {"error": "not_found"}
+
+    try:
+        data = _json_loads(raw_body)
+        if not isinstance(data, dict):
+            raise ValueError("JSON body must be an object")
+    except Exception as exc:  # pylint: disable=broad-except
+        return 400, {"error": "invalid_json", "detail": str(exc)}
+
+    try:
+        # 直接把收到的字段当作 knobs 传入
+        with apply_lock:
+            apply_knobs(data)
+    except Exception as exc:  # pylint: disable=broad-except
+        return 500, {"error": "apply_failed", "detail": str(exc)}
+
+    return 200, {"status": "ok"}
+
+
+class KnobHTTPServer(ThreadingHTTPServer):
+    """
+    每个连接一个线程；连接保持期间可以连续发送多个请求。
+    apply_lock 串行化 apply_knobs。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.apply_lock = threading.Lock()
+
 
 class KnobServerHandler(BaseHTTPRequestHandler):
     server_version = "BrokerKnobServer/0.1"
+    # HTTP/1.1 默认保持连接：调参客户端复用同一 TCP 连接，不必每个请求重新握手（所有响应都带 Content-Length）
+    protocol_version = "HTTP/1.1"
 
     def _send_json(self, status_code: int, payload: Dict[str, Any]) -> None:
-        body = json.dumps(payload).encode("utf-8")
+        body = _json_dumps(payload)
         self.send_response(status_code)
         self.send_header("Content-Type", "application/json; charset=utf-8")
         self.send_header("Content-Length", str(len(body)))
@@ -28,45 +90,97 @@ class KnobServerHandler(BaseHTTPRequestHandler):
         self.wfile.write(body)
 
     def do_POST(self) -> None:  # noqa: N802
-        if self.path != "/apply_knobs":
-            self._send_json(404, {"error": "not_found"})
-            return
-
+        # 先读完请求体，否则连接复用时残留的请求体会被当作下一个请求解析
         content_length = int(self.headers.get("Content-Length", "0"))
         raw_body = self.rfile.read(content_length)
-
-        try:
-            data = json.loads(raw_body.decode("utf-8"))
-            if not isinstance(data, dict):
-                raise ValueError("JSON body must be an object")
-        except Exception as exc:  # pylint: disable=broad-except
-            self._send_json(400, {"error": "invalid_json", "detail": str(exc)})
-            return
-
-        try:
-            # 直接把收到的字段当作 knobs 传入
-            apply_knobs(data)
-        except Exception as exc:  # pylint: disable=broad-except
-            self._send_json(500, {"error": "apply_failed", "detail": str(exc)})
-            return
-
-        self._send_json(200, {"status": "ok"})
+        self._send_json(*handle_request(self.path, raw_body, self.server.apply_lock))
 
     def log_message(self, format: str, *args: Any) -> None:  # noqa: A003
         # 简单打印到 stdout，避免默认带客户端地址的 noisy 日志
         print(f"[KnobServer] {format % args}")
 
 
-def run_server(host: str = "0.0.0.0", port: int = 8080) -> None:
+_ASGI_APPLY_LOCK = threading.Lock()
+
+
+async def asgi_app(
+    scope: Dict[str, Any],
+    receive: Callable[[], Awaitable[Dict[str, Any]]],
+    send: Callable[[Dict[str, Any]], Awaitable[None]],
+) -> None:
+    """
+    ASGI 版本的 /apply_knobs：事件循环只负责收发，
+    阻塞的 apply_knobs（写配置文件、重启 Broker）放到线程池执行，不占用事件循环。
     """
-    以阻塞方式启动 HTTPServer。
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+
+    if scope["method"] != "POST":
+        status, payload = 501, {"error": "unsupported_method"}
+    else:
+        loop = asyncio.get_running_loop()
+        status, payload = await loop.run_in_executor(
+            None, handle_request, scope["path"], b"".join(chunks), _ASGI_APPLY_LOCK
+        )
+
+    body = _json_dumps(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def run_server(host: str = "0.0.0.0", port: int = 8080, use_asgi: bool = False) -> None:
     """
+    以阻塞方式启动服务。
+    默认使用 KnobHTTPServer；use_asgi=True 时用 uvicorn 运行 asgi_app（未安装 uvicorn 时报错）。
+    """
+    if use_asgi:
+        if uvicorn is None:
+            raise RuntimeError("use_asgi=True 需要先安装 uvicorn（pip install 'uvicorn[standard]'）")
+        print(f"Knob server (ASGI) listening on http://{host}:{port}")
+        # loop/http 为 "auto"：安装了 uvloop、httptools 时自动使用
+        uvicorn.run(asgi_app, host=host, port=port, access_log=False, log_level="warning")
+        return
+
     server_address = (host, port)
-    httpd = HTTPServer(server_address, KnobServerHandler)
+    httpd = KnobHTTPServer(server_address, KnobServerHandler)
     print(f"Knob server listening on http://{host}:{port}")
     httpd.serve_forever()
 
 
-if __name__ == "__main__":
-    run_server()
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Broker knob HTTP server")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="监听地址（默认：0.0.0.0）")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口（默认：8080）")
+    parser.add_argument(
+        "--asgi",
+        action="store_true",
+        help="以 ASGI 应用运行在 uvicorn 上（需要 pip install -r requirements-optional.txt）",
+    )
+    args = parser.parse_args()
+    run_server(args.host, args.port, use_asgi=args.asgi)
+
 
+if __name__ == "__main__":
+    main()
@@ -10,5 +10,5 @@ cd "${PROJECT_ROOT}"
 export PYTHONPATH="${PROJECT_ROOT}:${PYTHONPATH:-}"
 
 echo "Starting Broker knob server ..."
-exec python -m server.server
+exec python -m server.server "$@"
 
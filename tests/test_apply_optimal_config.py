@@ -0,0 +1,141 @@
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from script import apply_optimal_config as aoc
+
+
+class _KnobSpace:
+    def decode_action(self, action):
+        return {"max_inflight_messages": int(action[0] * 100)}
+
+
+class _Env:
+    knob_space = _KnobSpace()
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    applied = []
+    monkeypatch.setattr(aoc, "apply_knobs", lambda knobs, dry_run=False: applied.append(knobs) or True)
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="bt"), "d.sock")
+    model_path = Path(__file__)
+    thread = threading.Thread(
+        target=aoc.serve_forever,
+        args=(None, _Env(), model_path, socket_path, lambda obs: np.array([0.5])),
+        daemon=True,
+    )
+    thread.start()
+    for _ in range(200):
+        if os.path.exists(socket_path):
+            break
+        threading.Event().wait(0.01)
+    yield socket_path, model_path, applied
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps({"cmd": "shutdown"}).encode("utf-8") + b"\n")
+        client.recv(1024)
+    thread.join(timeout=5.0)
+    assert not thread.is_alive()
+
+
+def test_daemon_round_trip_reports_apply_status(daemon, monkeypatch):
+    socket_path, model_path, applied = daemon
+    obs = np.zeros(10, dtype=np.float32)
+
+    reply = aoc.request_from_daemon(socket_path, model_path, apply=False, obs=obs)
+    assert reply == {"knobs": {"max_inflight_messages": 50}, "applied": False, "error": None}
+
+    reply = aoc.request_from_daemon(socket_path, model_path, apply=True, obs=obs)
+    assert reply["applied"] is True and reply["error"] is None
+    assert applied == [{"max_inflight_messages": 50}]
+
+    def _fail(knobs, dry_run=False):
+        raise PermissionError("需要 sudo 权限")
+
+    monkeypatch.setattr(aoc, "apply_knobs", _fail)
+    reply = aoc.request_from_daemon(socket_path, model_path, apply=True, obs=obs)
+    assert reply["applied"] is False and "sudo" in reply["error"]
+    assert reply["knobs"] == {"max_inflight_messages": 50}
+
+    # 模型路径不一致：客户端回退为冷启动
+    assert aoc.request_from_daemon(socket_path, Path("/nonexistent/other.zip"), apply=False, obs=obs) is None
+
+
+def test_client_exits_nonzero_when_daemon_fails_to_apply(daemon, monkeypatch, tmp_path, capsys):
+    from environment import EnvConfig
+
+    socket_path, model_path, _ = daemon
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps([0.0] * EnvConfig().state_dim))
+
+    def _fail(knobs, dry_run=False):
+        raise PermissionError("需要 sudo 权限")
+
+    monkeypatch.setattr(aoc, "apply_knobs", _fail)
+    monkeypatch.setattr(sys, "argv", [
+        "apply_optimal_config.py", "--model-path", str(model_path), "--apply-config",
+        "--socket-path", socket_path, "--from-state", str(state),
+    ])
+    with pytest.raises(SystemExit) as exc_info:
+        aoc.main()
+    assert exc_info.value.code == 1
+    out = capsys.readouterr().out
+    assert "常驻进程应用配置失败" in out and "配置已由常驻进程应用" not in out
+
+
+def test_second_daemon_refuses_to_take_over_live_socket(daemon):
+    socket_path, model_path, _ = daemon
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+    with pytest.raises(RuntimeError, match="已有常驻进程"):
+        aoc.serve_forever(None, _Env(), model_path, socket_path, lambda obs: np.array([0.5]))
+    # 探测连接不影响正在运行的常驻进程
+    reply = aoc.request_from_daemon(socket_path, model_path, apply=False, obs=np.zeros(10, dtype=np.float32))
+    assert reply["knobs"] == {"max_inflight_messages": 50}
+
+
+def test_stale_socket_is_replaced_but_other_files_are_not(tmp_path):
+    stale = tmp_path / "stale.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.bind(str(stale))  # 未 listen：模拟异常退出遗留的 socket 文件
+    aoc._remove_stale_socket(str(stale))
+    assert not stale.exists()
+
+    regular = tmp_path / "regular"
+    regular.write_text("x")
+    with pytest.raises(RuntimeError, match="不是 socket"):
+        aoc._remove_stale_socket(str(regular))
+    assert regular.exists()
+
+
+def test_client_ignores_socket_owned_by_other_user(daemon, monkeypatch):
+    socket_path, model_path, _ = daemon
+    if os.getuid() == 0:
+        os.chown(socket_path, 54321, -1)  # root 拥有的 socket 始终可信，改为其他用户所有
+    else:
+        monkeypatch.setattr(aoc.os, "getuid", lambda: os.stat(socket_path).st_uid + 1)
+    assert aoc.request_from_daemon(socket_path, model_path, apply=False) is None
+
+
+def test_knobs_view_reports_missing_and_unknown_keys_once(capsys):
+    from environment.knobs import BrokerKnobSpace
+
+    knobs = BrokerKnobSpace().get_default_knobs()
+    aoc.KnobsView.from_dict(knobs)
+    assert capsys.readouterr().out == ""
+
+    knobs["max_inflight_mesages"] = knobs.pop("max_inflight_messages")
+    summary = aoc.format_knob_summary(knobs)
+    out = capsys.readouterr().out
+    assert "  - max_inflight_messages: N/A" in summary
+    assert out.count("缺少参数: max_inflight_messages") == 1
+    assert out.count("未知参数: max_inflight_mesages") == 1
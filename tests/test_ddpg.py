@@ -0,0 +1,104 @@
+import torch as th
+
+from model.ddpg import CustomActor, CustomCritic, build_actor, build_critic
+
+
+def test_fuse_for_inference_matches_eval_outputs():
+    th.manual_seed(0)
+    obs = th.randn(32, 10)
+    actions = th.rand(32, 4)
+    actor = CustomActor(10, 4).eval()
+    critic = CustomCritic(10, 4).eval()
+    # 让 LayerNorm 的仿射参数偏离默认值，确保折叠确实生效
+    with th.no_grad():
+        for module in (*actor.modules(), *critic.modules()):
+            if isinstance(module, th.nn.LayerNorm):
+                module.weight.uniform_(0.5, 1.5)
+                module.bias.uniform_(-0.2, 0.2)
+
+    with th.no_grad():
+        expected_action = actor(obs)
+        expected_q = critic(obs, actions)
+        actor.fuse_for_inference()
+        critic.fuse_for_inference()
+        assert th.allclose(actor(obs), expected_action, atol=1e-6)
+        assert th.allclose(critic(obs, actions), expected_q, atol=1e-6)
+
+    assert not any(isinstance(m, th.nn.Dropout) for m in actor.modules())
+    assert all(
+        not m.elementwise_affine for m in critic.modules() if isinstance(m, th.nn.LayerNorm)
+    )
+
+
+def test_actor_handles_single_observation_in_train_mode():
+    actor = CustomActor(10, 4).train()
+    assert actor(th.randn(1, 10)).shape == (1, 4)
+
+
+def test_fuse_for_inference_bfloat16_keeps_float32_interface():
+    th.manual_seed(0)
+    obs = th.rand(8, 10)
+    actor = CustomActor(10, 4).eval()
+    with th.no_grad():
+        expected = actor(obs)
+        actor.fuse_for_inference(dtype=th.bfloat16)
+        out = actor(obs)
+
+    assert out.dtype == th.float32
+    assert next(actor.parameters()).dtype == th.bfloat16
+    assert th.allclose(out, expected, atol=2e-2)
+
+
+def test_build_factories_wrap_modules_only_when_compiling():
+    assert isinstance(build_actor(10, 3), CustomActor)
+    assert isinstance(build_critic(10, 3), CustomCritic)
+
+    compiled_actor = build_actor(10, 3, use_compile=True)
+    compiled_critic = build_critic(10, 3, use_compile=True)
+    # torch.compile 惰性编译：这里只检查包装关系，不触发实际编译
+    assert isinstance(getattr(compiled_actor, "_orig_mod", compiled_actor), CustomActor)
+    assert isinstance(getattr(compiled_critic, "_orig_mod", compiled_critic), CustomCritic)
+
+
+def _custom_policy_model():
+    import gymnasium as gym
+    import numpy as np
+    from gymnasium import spaces
+    from stable_baselines3 import DDPG
+
+    from model import CustomDDPGPolicy
+
+    class _BoxEnv(gym.Env):
+        observation_space = spaces.Box(-np.inf, np.inf, shape=(10,), dtype=np.float32)
+        action_space = spaces.Box(0.0, 1.0, shape=(4,), dtype=np.float32)
+
+    return DDPG(CustomDDPGPolicy, _BoxEnv(), device="cpu", seed=0)
+
+
+def test_custom_policy_maps_sigmoid_output_onto_whole_action_box():
+    model = _custom_policy_model()
+    obs = th.randn(16, 10)
+    model.policy.set_training_mode(False)
+    with th.no_grad():
+        sigmoid_out = model.policy.actor.net(obs)
+    actions = model.predict(obs.numpy(), deterministic=True)[0]
+    # Sigmoid 的 [0, 1] 对应动作空间 [0, 1] 本身，而不是 unscale_action 后的 [0.5, 1]
+    assert th.allclose(th.as_tensor(actions), sigmoid_out, atol=1e-6)
+
+
+def test_make_inference_actor_matches_policy_actor():
+    model = _custom_policy_model()
+    policy = model.policy
+    obs = th.randn(32, 10)
+    with th.no_grad():
+        for module in policy.actor.modules():
+            if isinstance(module, th.nn.LayerNorm):
+                module.weight.uniform_(0.5, 1.5)
+                module.bias.uniform_(-0.2, 0.2)
+        policy.set_training_mode(False)
+        expected = policy.actor(obs)
+        fused = policy.make_inference_actor(use_compile=False, dtype=th.float32)
+        fused_bf16 = policy.make_inference_actor(use_compile=False, dtype=th.bfloat16)
+        assert th.allclose(fused(obs), expected, atol=1e-6)
+        assert th.allclose(fused_bf16(obs), expected, atol=4e-2)
+    assert policy.actor.training is False and not any(isinstance(m, th.nn.Dropout) for m in fused.modules())
@@ -1,6 +1,31 @@
+import io
+import json
+
 import numpy as np
 
-from tuner.evaluate import _extract_metrics, summarize
+from tuner.evaluate import _extract_metrics, _run_policy_eval, run_episode, run_episode_constant, summarize
+
+
+class _CountingEnv:
+    """每步吞吐递增，第 n_steps 步结束；cfg.max_steps 故意小于 n_steps 以覆盖缓冲区扩容。"""
+
+    def __init__(self, n_steps, max_steps=2, gymnasium_api=True):
+        self.n_steps = n_steps
+        self.cfg = type("Cfg", (), {"max_steps": max_steps})()
+        self.gymnasium_api = gymnasium_api
+        self.t = 0
+
+    def reset(self, seed=None):
+        self.t = 0
+        return np.zeros(10, dtype=np.float32), {}
+
+    def step(self, action):
+        self.t += 1
+        info = {"throughput_msg_per_sec": 100.0 * self.t, "latency_p50_ms": 10.0, "latency_p95_ms": 20.0}
+        done = self.t >= self.n_steps
+        if self.gymnasium_api:
+            return np.zeros(10, dtype=np.float32), 1.0, False, done, info
+        return np.zeros(10, dtype=np.float32), 1.0, done, info
 
 
 def test_extract_metrics_prefers_info_values():
@@ -21,6 +46,20 @@ def test_extract_metrics_prefers_info_values():
     assert metrics["latency_p95_ms"] == 88.0
 
 
+def test_extract_metrics_falls_back_to_observation():
+    obs = np.zeros(10, dtype=np.float32)
+    obs[[1, 5, 6]] = [0.5, 0.25, 0.75]
+    metrics = _extract_metrics(obs, {"latency_p95_ms": 99.0})
+    assert metrics == {
+        "throughput_norm": 0.5,
+        "throughput_msg_per_sec": 5000.0,
+        "latency_p50_ms": 25.0,
+        "latency_p95_ms": 99.0,
+    }
+    short = _extract_metrics(np.array([0.0, 0.5], dtype=np.float32), {})
+    assert short["throughput_norm"] == 0.5 and short["latency_p50_ms"] == 0.0 and short["latency_p95_ms"] == 0.0
+
+
 def test_summarize_returns_mean_and_std():
     summary = summarize(
         [
@@ -43,3 +82,66 @@ def test_summarize_returns_mean_and_std():
     assert summary["mean_latency_p50_ms"] == 20.0
     assert summary["mean_latency_p95_ms"] == 30.0
     assert summary["std_reward"] > 0.0
+
+
+def test_run_episode_averages_step_metrics():
+    stats = run_episode(_CountingEnv(5), action_fn=lambda obs: obs, seed=0)
+    assert stats == {
+        "episode_reward": 5.0,
+        "episode_throughput_msg_per_sec": 300.0,
+        "episode_latency_p50_ms": 10.0,
+        "episode_latency_p95_ms": 20.0,
+    }
+    assert run_episode(_CountingEnv(3, gymnasium_api=False), action_fn=lambda obs: obs) == {
+        "episode_reward": 3.0,
+        "episode_throughput_msg_per_sec": 200.0,
+        "episode_latency_p50_ms": 10.0,
+        "episode_latency_p95_ms": 20.0,
+    }
+
+
+def test_summarize_accepts_episode_matrix():
+    summary = summarize(np.array([[1.0, 100.0, 10.0, 20.0], [3.0, 300.0, 30.0, 40.0]]))
+    assert summary == {
+        "mean_reward": 2.0,
+        "std_reward": 1.0,
+        "mean_throughput_msg_per_sec": 200.0,
+        "mean_latency_p50_ms": 20.0,
+        "mean_latency_p95_ms": 30.0,
+    }
+    assert summarize(np.empty((0, 4)))["mean_reward"] == 0.0
+
+
+def test_run_policy_eval_streams_one_json_line_per_episode():
+    log = io.BytesIO()
+    summary = _run_policy_eval(_CountingEnv(3), n_episodes=2, seed=0, label="RL", action_fn=lambda obs: obs, episode_log=log)
+    records = [json.loads(line) for line in log.getvalue().splitlines()]
+    assert [(r["type"], r["label"], r["episode"]) for r in records] == [("episode", "RL", 1), ("episode", "RL", 2)]
+    assert records[0]["episode_throughput_msg_per_sec"] == 200.0
+    assert summary["mean_reward"] == 3.0
+
+
+def test_run_episode_constant_matches_run_episode():
+    action = np.full(4, 0.5, dtype=np.float32)
+    for gymnasium_api in (True, False):
+        expected = run_episode(_CountingEnv(5, gymnasium_api=gymnasium_api), action_fn=lambda _obs: action, seed=1)
+        assert run_episode_constant(_CountingEnv(5, gymnasium_api=gymnasium_api), action, seed=1) == expected
+
+
+def test_main_closes_env_when_episode_log_cannot_be_opened(monkeypatch, tmp_path):
+    import sys
+
+    import pytest
+
+    from tuner import evaluate
+
+    closed = []
+    env = _CountingEnv(1)
+    env.close = lambda: closed.append(True)
+    monkeypatch.setattr(evaluate, "make_env", lambda cfg, workload_manager=None: env)
+    monkeypatch.setattr(sys, "argv", [
+        "evaluate", "--model-path", "m.zip", "--episodes-jsonl", str(tmp_path / "missing" / "e.jsonl"),
+    ])
+    with pytest.raises(FileNotFoundError):
+        evaluate.main()
+    assert closed == [True]
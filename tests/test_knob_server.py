@@ -0,0 +1,68 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from server import server as server_module
+
+
+@pytest.fixture
+def knob_server(monkeypatch):
+    applied = []
+    monkeypatch.setattr(server_module, "apply_knobs", applied.append)
+    monkeypatch.setattr(server_module.KnobServerHandler, "log_message", lambda *args: None)
+    httpd = server_module.KnobHTTPServer(("127.0.0.1", 0), server_module.KnobServerHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1], applied
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_one_keepalive_connection(knob_server):
+    port, applied = knob_server
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("POST", "/unknown", body=b'{"ignored": 1}')
+        response = conn.getresponse()
+        assert response.status == 404
+        response.read()
+        sock = conn.sock
+
+        for value in (10, 20):
+            conn.request("POST", "/apply_knobs", body=json.dumps({"max_inflight_messages": value}))
+            response = conn.getresponse()
+            assert response.status == 200
+            assert json.loads(response.read()) == {"status": "ok"}
+            assert conn.sock is sock  # 404 的请求体已读完，连接仍可复用
+    finally:
+        conn.close()
+
+    assert applied == [{"max_inflight_messages": 10}, {"max_inflight_messages": 20}]
+
+
+def test_asgi_app_matches_threaded_handler(monkeypatch):
+    applied = []
+    monkeypatch.setattr(server_module, "apply_knobs", applied.append)
+
+    async def call(method, path, body_chunks):
+        messages = [{"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+                    for i, chunk in enumerate(body_chunks)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await server_module.asgi_app({"type": "http", "method": method, "path": path}, receive, send)
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    assert asyncio.run(call("POST", "/apply_knobs", [b'{"max_inflight', b'_messages": 10}'])) == (200, {"status": "ok"})
+    assert asyncio.run(call("POST", "/apply_knobs", [b"[1]"]))[0] == 400
+    assert asyncio.run(call("POST", "/other", [b""])) == (404, {"error": "not_found"})
+    assert asyncio.run(call("GET", "/apply_knobs", [b""]))[0] == 501
+    assert applied == [{"max_inflight_messages": 10}]
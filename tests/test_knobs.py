@@ -0,0 +1,104 @@
+import gc
+import subprocess
+import weakref
+
+import numpy as np
+import pytest
+
+from environment import knobs as knobs_module
+from environment.knobs import BrokerKnobSpace, apply_knobs
+
+
+@pytest.fixture
+def fake_broker(monkeypatch, tmp_path):
+    """拦截 systemctl/pkill/mosquitto 等外部命令，记录调用次数。"""
+    calls = []
+
+    def _fake_run(cmd, *args, **kwargs):
+        calls.append(list(cmd))
+        return subprocess.CompletedProcess(cmd, 0, stdout="4242\n", stderr="")
+
+    config_path = tmp_path / "broker_tuner.conf"
+    monkeypatch.setattr(knobs_module.subprocess, "run", _fake_run)
+    monkeypatch.setattr(knobs_module.time, "sleep", lambda _sec: None)
+    monkeypatch.setattr(knobs_module, "_LAST_CONFIG_HASH", None)
+    monkeypatch.setenv("MOSQUITTO_TUNER_CONFIG", str(config_path))
+    monkeypatch.setenv("MOSQUITTO_PID", "0")
+    monkeypatch.delenv("BROKER_TUNER_DRY_RUN", raising=False)
+    return config_path, calls
+
+
+def test_apply_knobs_skips_restart_when_config_unchanged(fake_broker):
+    config_path, calls = fake_broker
+    knobs = BrokerKnobSpace().get_default_knobs()
+
+    assert apply_knobs(knobs) is True
+    assert config_path.exists()
+    restart_calls = len(calls)
+    assert restart_calls > 0
+
+    # 未变化时只用 pgrep 确认 Broker 仍以该配置运行，不写文件、不重启
+    assert apply_knobs(dict(knobs)) is False
+    assert [cmd[0] for cmd in calls[restart_calls:]] == ["pgrep"]
+    restart_calls = len(calls)
+
+    knobs["max_inflight_messages"] = 40
+    assert apply_knobs(knobs) is True
+    assert len(calls) > restart_calls
+
+
+def test_apply_knobs_restarts_dead_broker_even_if_config_unchanged(fake_broker, monkeypatch):
+    _, calls = fake_broker
+    knobs = BrokerKnobSpace().get_default_knobs()
+    assert apply_knobs(knobs) is True
+
+    def _broker_gone(cmd, *args, **kwargs):
+        calls.append(list(cmd))
+        if cmd[0] == "pgrep":
+            return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="")
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    monkeypatch.setattr(knobs_module.subprocess, "run", _broker_gone)
+    restart_calls = len(calls)
+    assert apply_knobs(knobs) is True
+    assert any(cmd[:2] == ["pkill", "-TERM"] for cmd in calls[restart_calls:])
+    assert any("-c" in cmd for cmd in calls[restart_calls:])
+
+
+def test_apply_knobs_force_restart_ignores_hash(fake_broker):
+    _, calls = fake_broker
+    knobs = BrokerKnobSpace().get_default_knobs()
+
+    assert apply_knobs(knobs) is True
+    restart_calls = len(calls)
+    assert apply_knobs(knobs, force_restart=True) is True
+    assert len(calls) > restart_calls
+
+
+def test_decode_action_cache_returns_independent_copies():
+    space = BrokerKnobSpace()
+    action = np.full(space.action_dim, 0.3, dtype=np.float32)
+
+    first = space.decode_action(action)
+    first["max_inflight_messages"] = -1
+    second = space.decode_action(action.astype(np.float64))
+
+    assert second["max_inflight_messages"] == 600
+    assert len(space._decode_cache) == 1
+    # 越界动作被 clip 后与边界动作命中同一缓存项
+    assert space.decode_action(action + 5.0) == space.decode_action(np.ones(space.action_dim))
+
+
+def test_decode_cache_is_bounded_and_does_not_keep_space_alive():
+    space = BrokerKnobSpace()
+    for i in range(knobs_module._DECODE_CACHE_SIZE + 10):
+        space.decode_action(np.full(space.action_dim, i / 1000.0, dtype=np.float32))
+    assert len(space._decode_cache) == knobs_module._DECODE_CACHE_SIZE
+
+    ref = weakref.ref(space)
+    gc.disable()
+    try:
+        del space  # 没有引用环：引用计数归零即释放，无需循环 GC
+        assert ref() is None
+    finally:
+        gc.enable()
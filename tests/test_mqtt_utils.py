@@ -0,0 +1,147 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from environment import utils as utils_module
+from environment.config import MQTTConfig
+from environment.utils import MQTTSampler, _collapse_topic_filters, _parse_numeric_payload
+
+
+class _FakeClient:
+    """替代 paho Client：connect 时立即回调 on_connect，不建立网络连接。"""
+
+    def __init__(self, *args, **kwargs):
+        self.on_connect = None
+        self.on_message = None
+        self.subscriptions = []
+
+    def connect(self, host, port, keepalive=60):
+        self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topics):
+        self.subscriptions.append(topics)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def sampler(monkeypatch):
+    monkeypatch.setattr(utils_module.mqtt, "Client", _FakeClient)
+    sampler = MQTTSampler(MQTTConfig(rate_min_interval_sec=0.0, rate_min_samples=2))
+    yield sampler
+    sampler.close()
+
+
+def _deliver(sampler, topic, payload):
+    sampler._on_message(sampler._client, None, SimpleNamespace(topic=topic, payload=payload))
+
+
+def test_collapse_topic_filters_drops_topics_covered_by_wildcard():
+    topics = [
+        "$SYS/#",
+        "$SYS/broker/uptime",
+        "$SYS/broker/#",
+        "$SYS",
+        "bench/latency",
+        "bench/latency",
+    ]
+    assert _collapse_topic_filters(topics) == ["$SYS/#", "bench/latency"]
+    assert _collapse_topic_filters(("$SYS/#",)) == ["$SYS/#"]
+
+
+def test_parse_numeric_payload_accepts_bytes_and_uptime_suffix():
+    assert _parse_numeric_payload(b" 42\n") == 42.0
+    assert _parse_numeric_payload(b"1.5e3") == 1500.0
+    assert _parse_numeric_payload(b"123 seconds") == 123.0
+    assert _parse_numeric_payload(b"17s") == 17.0
+    assert _parse_numeric_payload("9 Second") == 9.0
+    assert _parse_numeric_payload(b'{"value": 3}') == 3.0
+    assert _parse_numeric_payload(b"mosquitto version 2.0.18") is None
+    assert _parse_numeric_payload(b"[1, 2]") is None
+
+
+def test_sampler_snapshot_tracks_rate_and_resets_on_uptime_rollback(sampler, monkeypatch):
+    clock = iter([100.0, 101.0, 102.0, 103.0, 104.0])
+    monkeypatch.setattr(utils_module.time, "time", lambda: next(clock))
+
+    _deliver(sampler, "$SYS/broker/messages/received", b"100")
+    _deliver(sampler, "$SYS/broker/messages/received", b"150")
+    metrics, metrics_ts = sampler.snapshot()
+    assert metrics["$SYS/broker/messages/received"] == 150.0
+    assert metrics["$SYS/broker/messages/received_rate"] == pytest.approx(50.0)
+    assert metrics_ts["$SYS/broker/messages/received_rate"] == 101.0
+
+    _deliver(sampler, "$SYS/broker/uptime", b"500 seconds")
+    _deliver(sampler, "$SYS/broker/uptime", b"3 seconds")
+    assert sampler._topic_records["$SYS/broker/uptime"] == utils_module.RateRec(None, None, 3.0, 103.0, 1)
+
+
+def test_sample_wakes_on_message_instead_of_polling(sampler):
+    sampler._cfg.sample_wait_for_derived_rate = False
+    sampler._cfg.sample_poll_interval_sec = 5.0
+    topics = sampler._cfg.sample_wait_for_topics
+
+    def _publish_later():
+        time.sleep(0.05)
+        for topic in topics:
+            _deliver(sampler, topic, b"1")
+
+    publisher = threading.Thread(target=_publish_later)
+    start = time.monotonic()
+    publisher.start()
+    metrics = sampler.sample(timeout_sec=5.0)
+    elapsed = time.monotonic() - start
+    publisher.join()
+
+    assert set(topics) <= set(metrics)
+    assert elapsed < 1.0
+
+
+def test_on_message_interns_topic_from_public_attribute(sampler):
+    for payload in (b"7", b"8"):
+        msg = utils_module.mqtt.MQTTMessage(topic=b"$SYS/broker/clients/connected")
+        msg.payload = payload
+        sampler._on_message(sampler._client, None, msg)
+
+    metrics = sampler.snapshot()[0]
+    (topic,) = metrics
+    assert topic is utils_module._K_CLIENTS
+    assert metrics[topic] == 8.0
+
+
+def test_topics_exact_drops_unlisted_topics(monkeypatch):
+    monkeypatch.setattr(utils_module.mqtt, "Client", _FakeClient)
+    cfg = MQTTConfig(topics=["$SYS/broker/uptime"], topics_exact=True)
+    sampler = MQTTSampler(cfg)
+    try:
+        _deliver(sampler, "$SYS/broker/uptime", b"10")
+        _deliver(sampler, "$SYS/broker/heap/current", b"2048")
+        assert sampler.snapshot()[0] == {"$SYS/broker/uptime": 10.0}
+    finally:
+        sampler.close()
+
+    with pytest.raises(ValueError):
+        MQTTSampler(MQTTConfig(topics=["$SYS/#"], topics_exact=True))
+
+
+def test_sample_until_returns_once_prefixes_are_present(sampler):
+    _deliver(sampler, "$SYS/broker/clients/connected", b"3")
+    _deliver(sampler, "$SYS/broker/messages/received", b"10")
+
+    start = time.monotonic()
+    metrics = sampler.sample_until(["$SYS/broker/messages/", "$SYS/broker/clients/"], max_wait=5.0)
+    assert time.monotonic() - start < 0.5
+    assert metrics["$SYS/broker/clients/connected"] == 3.0
+
+    start = time.monotonic()
+    sampler.sample_until(["$SYS/broker/heap/"], max_wait=0.2)
+    assert 0.2 <= time.monotonic() - start < 1.0
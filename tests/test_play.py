@@ -0,0 +1,150 @@
+import gymnasium as gym
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from script.test_mosquitto import play, play_batch
+
+
+class _CountdownEnv(gym.Env):
+    """固定步数结束的环境：状态为 [剩余步数, 0, ...]，奖励为动作均值。"""
+
+    def __init__(self, episode_len: int, state_dim: int = 4, action_dim: int = 2):
+        self.episode_len = episode_len
+        self.observation_space = spaces.Box(-np.inf, np.inf, shape=(state_dim,), dtype=np.float32)
+        self.action_space = spaces.Box(0.0, 1.0, shape=(action_dim,), dtype=np.float32)
+        self._t = 0
+
+    def _obs(self):
+        obs = np.zeros(self.observation_space.shape, dtype=np.float32)
+        obs[0] = self.episode_len - self._t
+        return obs
+
+    def reset(self, seed=None, options=None):
+        self._t = 0
+        return self._obs(), {}
+
+    def step(self, action):
+        self._t += 1
+        return self._obs(), float(np.mean(action)), self._t >= self.episode_len, False, {}
+
+
+class _ConstantModel:
+    """model.predict 的替身：按观测批次返回固定动作，并记录批大小。"""
+
+    def __init__(self, action_dim: int = 2):
+        self.action_dim = action_dim
+        self.batch_sizes = []
+
+    def predict(self, obs, deterministic=True):
+        obs = np.asarray(obs)
+        batch = obs.shape[0] if obs.ndim == 2 else None
+        self.batch_sizes.append(batch)
+        shape = (batch, self.action_dim) if batch is not None else (self.action_dim,)
+        return np.full(shape, 0.5, dtype=np.float32), None
+
+
+def test_play_records_one_episode():
+    state, action, reward, reward_sum = play(_ConstantModel(), _CountdownEnv(3))
+
+    assert state.shape == (3, 4) and action.shape == (3, 2) and reward.shape == (3, 1)
+    assert th.equal(state[:, 0], th.tensor([3.0, 2.0, 1.0]))
+    assert reward_sum == 1.5
+
+
+def test_play_batch_predicts_once_per_step_and_stops_each_env_at_done():
+    model = _ConstantModel()
+    venv = DummyVecEnv([lambda: _CountdownEnv(2), lambda: _CountdownEnv(4)])
+
+    results = play_batch(model, venv)
+
+    assert model.batch_sizes == [2, 2, 2, 2]
+    assert [r[0].shape[0] for r in results] == [2, 4]
+    assert th.equal(results[1][0][:, 0], th.tensor([4.0, 3.0, 2.0, 1.0]))
+    assert [r[3] for r in results] == [1.0, 2.0]
+
+
+def test_trajectory_grows_past_preallocated_capacity():
+    from script.test_mosquitto import _Trajectory
+
+    trajectory = _Trajectory(state_dim=2, action_dim=1, capacity=2)
+    for t in range(5):
+        trajectory.append([t, -t], [0.5], float(t))
+    state, action, reward, reward_sum = trajectory.to_tensors()
+
+    assert state.dtype == th.float32 and state.shape == (5, 2)
+    assert th.equal(state[:, 0], th.arange(5, dtype=th.float32))
+    assert reward.shape == (5, 1) and reward_sum == 10.0
+
+
+def test_play_uses_policy_predictor_for_sb3_models():
+    from stable_baselines3 import DDPG
+
+    model = DDPG("MlpPolicy", _CountdownEnv(3), learning_starts=1, device="cpu", seed=0)
+    state, action, _, _ = play(model, _CountdownEnv(3))
+
+    expected = model.predict(state.numpy(), deterministic=True)[0]
+    np.testing.assert_allclose(action.numpy(), expected, rtol=0, atol=1e-6)
+
+
+def test_play_show_writes_each_step_once(capsys):
+    play(_ConstantModel(), _CountdownEnv(2, state_dim=5), show=True)
+
+    out = capsys.readouterr().out
+    assert out.count("步骤 ") == 2
+    assert "    - ctxt_ratio:       0.000000\n  动作 (action_1): [0.5 0.5]\n" in out
+
+
+def test_random_policy_samples_within_action_space():
+    from script.test_mosquitto import RandomPolicy
+
+    env = _CountdownEnv(3)
+    state, action, reward, _ = play(RandomPolicy(env.action_space), env)
+    assert action.shape == (3, 2) and bool(((action >= 0) & (action <= 1)).all())
+
+    results = play_batch(RandomPolicy(env.action_space), DummyVecEnv([lambda: _CountdownEnv(2)] * 2))
+    assert [r[1].shape for r in results] == [(2, 2), (2, 2)]
+
+
+def test_play_casts_float64_observations_once_at_env_boundary():
+    class _Float64Env(_CountdownEnv):
+        def _obs(self):
+            return super()._obs().astype(np.float64)
+
+    seen = []
+
+    class _RecordingModel(_ConstantModel):
+        def predict(self, obs, deterministic=True):
+            seen.append(np.asarray(obs).dtype)
+            return super().predict(obs, deterministic)
+
+    state, _, _, _ = play(_RecordingModel(), _Float64Env(2))
+    assert seen == [np.float32, np.float32] and state.dtype == th.float32
+
+
+def test_trajectory_tensors_share_memory_with_buffers():
+    from script.test_mosquitto import _Trajectory
+
+    trajectory = _Trajectory(state_dim=3, action_dim=2, capacity=8)
+    for t in range(3):
+        trajectory.append([t, t, t], [0.1, 0.2], 1.0)
+    state, action, reward, _ = trajectory.to_tensors()
+
+    assert state.data_ptr() == trajectory._states.ctypes.data
+    assert action.data_ptr() == trajectory._actions.ctypes.data
+    assert reward.data_ptr() == trajectory._rewards.ctypes.data
+    assert state.is_contiguous() and action.is_contiguous() and reward.shape == (3, 1)
+
+
+def test_trajectory_reward_sum_and_range_without_tensor_ops():
+    from script.test_mosquitto import _Trajectory
+
+    trajectory = _Trajectory(state_dim=1, action_dim=1, capacity=4)
+    assert trajectory.reward_range() == (0.0, 0.0)
+    for r in (0.25, -1.5, 3.0):
+        trajectory.append([0.0], [0.0], np.float64(r))
+
+    assert isinstance(trajectory.reward_sum, float) and trajectory.reward_sum == 1.75
+    assert trajectory.reward_range() == (-1.5, 3.0)
+    assert trajectory.to_tensors()[3] == 1.75
@@ -0,0 +1,93 @@
+import os
+
+import gymnasium as gym
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3 import DDPG
+
+from tuner.utils import make_predictor
+
+
+class _BoxEnv(gym.Env):
+    def __init__(self, state_dim: int = 4, action_dim: int = 2):
+        self.observation_space = spaces.Box(-np.inf, np.inf, shape=(state_dim,), dtype=np.float32)
+        self.action_space = spaces.Box(0.0, 1.0, shape=(action_dim,), dtype=np.float32)
+
+
+def _obs(*shape):
+    return np.random.default_rng(0).normal(size=shape).astype(np.float32)
+
+
+def test_make_predictor_matches_model_predict():
+    model = DDPG("MlpPolicy", _BoxEnv(), device="cpu", seed=0)
+    predict = make_predictor(model, dtype="auto")
+    obs = _obs(3, 4)
+
+    np.testing.assert_allclose(predict(obs), model.predict(obs, deterministic=True)[0], rtol=0, atol=1e-7)
+    np.testing.assert_allclose(predict(obs[0]), model.predict(obs[0], deterministic=True)[0], rtol=0, atol=1e-7)
+    assert predict(obs[0]).shape == (2,)
+
+
+def test_compiled_actor_matches_model_predict():
+    model = DDPG("MlpPolicy", _BoxEnv(state_dim=10, action_dim=4), device="cpu", seed=0)
+    predict = make_predictor(model, compile_actor=True, batch_size=3)
+    obs = _obs(3, 10)
+
+    np.testing.assert_allclose(predict(obs), model.predict(obs, deterministic=True)[0], rtol=0, atol=1e-5)
+
+
+def test_traced_actor_is_cached_next_to_model(tmp_path):
+    model = DDPG("MlpPolicy", _BoxEnv(), device="cpu", seed=0)
+    model_path = tmp_path / "model.zip"
+    model.save(str(model_path))
+    obs = _obs(4)
+    expected = model.predict(obs, deterministic=True)[0]
+
+    np.testing.assert_allclose(make_predictor(model, trace_model_path=model_path)(obs), expected, rtol=0, atol=1e-6)
+    cache_path = tmp_path / "model.actor.pt"
+    assert cache_path.exists()
+    mtime = cache_path.stat().st_mtime_ns
+
+    # 缓存比模型文件新：第二次直接加载，不重新导出
+    np.testing.assert_allclose(make_predictor(model, trace_model_path=model_path)(obs), expected, rtol=0, atol=1e-6)
+    assert cache_path.stat().st_mtime_ns == mtime
+
+    # 模型文件更新后缓存失效，重新导出
+    os.utime(model_path, ns=(mtime + 10**9, mtime + 10**9))
+    make_predictor(model, trace_model_path=model_path)
+    assert cache_path.stat().st_mtime_ns != mtime
+
+
+def test_make_predictor_post_processes_non_gymnasium_box():
+    class _Policy:
+        """动作空间只有 low/high（如旧版 gym 的 Box），不是 gymnasium.spaces.Box。"""
+
+        device = th.device("cpu")
+        action_space = type("Box", (), {"low": np.zeros(2), "high": np.full(2, 10.0)})()
+
+        def __init__(self, squash_output):
+            self.squash_output = squash_output
+
+        def set_training_mode(self, mode):
+            pass
+
+        def _predict(self, obs, deterministic=True):
+            return th.tensor([[-0.5, 2.0]])
+
+        def unscale_action(self, action):
+            return 5.0 * (action + 1.0)
+
+    model = type("Model", (), {})()
+    model.policy = _Policy(squash_output=True)
+    np.testing.assert_allclose(make_predictor(model)(np.zeros(3)), [2.5, 15.0])
+    model.policy = _Policy(squash_output=False)
+    np.testing.assert_allclose(make_predictor(model)(np.zeros(3)), [0.0, 2.0])
+
+
+def test_make_predictor_falls_back_to_model_predict():
+    class _Model:
+        def predict(self, obs, deterministic=True):
+            return np.asarray(obs) * 2, None
+
+    np.testing.assert_allclose(make_predictor(_Model())(np.ones(3)), [2.0, 2.0, 2.0])
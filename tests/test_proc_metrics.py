@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from environment.config import ProcConfig
+from environment.utils import ProcReader, read_proc_metrics, read_proc_metrics_many
+
+
+def _burn_cpu(duration_sec: float) -> None:
+    end = time.monotonic() + duration_sec
+    while time.monotonic() < end:
+        pass
+
+
+def test_read_proc_metrics_reports_cpu_delta_for_current_process():
+    cfg = ProcConfig(pid=os.getpid(), cpu_norm=100.0)
+
+    first_cpu, mem_ratio, ctxt_ratio = read_proc_metrics(cfg)
+    assert 0.0 <= first_cpu <= 1.0
+    assert mem_ratio > 0.0
+    assert ctxt_ratio > 0.0
+
+    _burn_cpu(0.3)
+    busy_cpu, _, _ = read_proc_metrics(cfg)
+    time.sleep(0.3)
+    idle_cpu, _, _ = read_proc_metrics(cfg)
+
+    # 单核满载约为 1.0；空闲窗口内增量应明显更低，而不是像累计 ticks 那样只增不减
+    assert busy_cpu > 0.5
+    assert idle_cpu < busy_cpu
+
+
+def test_cpu_norm_defaults_to_available_cores():
+    cfg = ProcConfig(pid=os.getpid())
+    assert cfg.cpu_norm == len(os.sched_getaffinity(0)) * 100
+
+
+def test_read_proc_metrics_many_matches_single_reads_zeroes_dead_pids_and_skips_invalid():
+    cfg = ProcConfig(pid=os.getpid(), cpu_norm=100.0)
+    dead_pid = 2 ** 22 + 1  # 超过默认 pid_max，保证不存在
+
+    metrics = read_proc_metrics_many(cfg, [os.getpid(), os.getppid(), dead_pid, 0])
+
+    # pid <= 0 不读取；已退出的 pid 保留在结果中，值为全 0
+    assert set(metrics) == {os.getpid(), os.getppid(), dead_pid}
+    assert metrics[dead_pid] == (0.0, 0.0, 0.0)
+    for pid in (os.getpid(), os.getppid()):
+        _, single_mem, single_ctxt = read_proc_metrics(ProcConfig(pid=pid, cpu_norm=100.0))
+        _, many_mem, many_ctxt = metrics[pid]
+        assert many_mem > 0.0
+        assert many_mem == pytest.approx(single_mem, rel=0.05)
+        assert many_ctxt <= single_ctxt  # 上下文切换累计值只增不减
+
+
+def test_proc_reader_reuses_fds_and_reports_zero_after_exit():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.2)"])
+    cfg = ProcConfig(pid=child.pid, cpu_norm=100.0)
+    reader = ProcReader(child.pid)
+    try:
+        assert reader.read(cfg)[1] > 0.0
+        fds = (reader._status_fd, reader._stat_fd)
+        assert reader.read(cfg)[1] > 0.0
+        assert (reader._status_fd, reader._stat_fd) == fds
+
+        child.wait()
+        assert reader.read(cfg) == (0.0, 0.0, 0.0)
+        assert reader._status_fd == -1
+    finally:
+        reader.close()
@@ -0,0 +1,120 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from environment.config import MQTTConfig
+from script._raw_sys_sampler import (
+    RawSocketMQTTSampler,
+    _packet,
+    _encode_string,
+    parse_publish,
+    split_packets,
+)
+
+
+def _publish(topic, payload, qos=0):
+    body = _encode_string(topic) + (b"\x00\x01" if qos else b"") + payload
+    return _packet(0x30 | (qos << 1), body)
+
+
+def test_split_packets_keeps_incomplete_tail():
+    data = _publish("$SYS/broker/uptime", b"12 seconds") + _publish("$SYS/broker/clients/connected", b"3", qos=1)
+    big = _publish("x", b"a" * 300)  # 剩余长度需要两个字节编码
+    buf = memoryview(data + big + big[:5])
+
+    packets, consumed = split_packets(buf)
+
+    assert consumed == len(data) + len(big)
+    messages = [parse_publish(header, body) for header, body in packets]
+    assert [(m.topic, m.payload) for m in messages] == [
+        ("$SYS/broker/uptime", b"12 seconds"),
+        ("$SYS/broker/clients/connected", b"3"),
+        ("x", b"a" * 300),
+    ]
+
+
+def test_raw_sampler_parses_burst_from_single_recv():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    received = []
+
+    def _broker():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(1024)  # CONNECT
+            conn.sendall(b"\x20\x02\x00\x00")
+            received.append(conn.recv(1024))  # SUBSCRIBE
+            conn.sendall(
+                _publish("$SYS/broker/messages/received", b"100")
+                + _publish("$SYS/broker/clients/connected", b"2")
+                + _publish("$SYS/broker/version", b"mosquitto 2.0")
+            )
+            conn.recv(1024)  # 等待 DISCONNECT
+
+    thread = threading.Thread(target=_broker, daemon=True)
+    thread.start()
+    cfg = MQTTConfig(port=server.getsockname()[1])
+    sampler = RawSocketMQTTSampler(cfg)
+    try:
+        deadline = time.time() + 2.0
+        while len(sampler.snapshot()[0]) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        metrics, _ = sampler.snapshot()
+        assert metrics == {"$SYS/broker/messages/received": 100.0, "$SYS/broker/clients/connected": 2.0}
+        assert received[0][0] == 0x82 and b"$SYS/#" in received[0]
+    finally:
+        sampler.close()
+        server.close()
+    thread.join(timeout=2.0)
+    assert not sampler._connected
+
+
+def test_raw_sampler_pings_while_broker_streams_and_reports_disconnect():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    pinged = threading.Event()
+
+    def _broker():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(1024)  # CONNECT
+            conn.sendall(b"\x20\x02\x00\x00")
+            conn.recv(1024)  # SUBSCRIBE
+            conn.settimeout(0.02)
+            deadline = time.time() + 3.0
+            # 不间断地推送 $SYS 消息，客户端的 recv 永远不会超时
+            while not pinged.is_set() and time.time() < deadline:
+                conn.sendall(_publish("$SYS/broker/messages/received", b"100"))
+                try:
+                    if conn.recv(1024).startswith(b"\xc0\x00"):
+                        pinged.set()
+                except socket.timeout:
+                    pass
+        # 连接在此关闭，模拟 broker 断开客户端
+
+    thread = threading.Thread(target=_broker, daemon=True)
+    thread.start()
+    sampler = RawSocketMQTTSampler(MQTTConfig(port=server.getsockname()[1], keepalive=2))
+    try:
+        assert pinged.wait(timeout=3.0)
+        thread.join(timeout=2.0)
+        deadline = time.time() + 2.0
+        while sampler._connected and time.time() < deadline:
+            time.sleep(0.01)
+        with pytest.raises(ConnectionError):
+            sampler.snapshot()
+    finally:
+        sampler.close()
+        server.close()
+
+
+def test_parse_publish_decodes_each_topic_once():
+    topic_names = {}
+    packets, _ = split_packets(memoryview(_publish("$SYS/broker/uptime", b"1") + _publish("$SYS/broker/uptime", b"2")))
+    first, second = (parse_publish(header, body, topic_names) for header, body in packets)
+    assert first.topic is second.topic == "$SYS/broker/uptime"
+    assert topic_names == {b"$SYS/broker/uptime": "$SYS/broker/uptime"}
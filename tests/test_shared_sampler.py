@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+from environment.config import MQTTConfig
+from environment.shared_sampler import SharedMetricsReader, SharedMetricsWriter
+
+
+def test_shared_metrics_roundtrip_between_writer_and_reader():
+    name = f"bt_test_{os.getpid()}"
+    writer = SharedMetricsWriter(name, topics=("$SYS/broker/clients/connected", "$SYS/broker/uptime"))
+    try:
+        cfg = MQTTConfig(
+            shared_memory_name=name,
+            sample_wait_for_topics=["$SYS/broker/uptime"],
+            sample_wait_for_derived_rate=False,
+        )
+        reader = SharedMetricsReader(cfg)
+        try:
+            assert reader._connected is False
+
+            now = time.time() + 1.0
+            writer.publish(
+                {"$SYS/broker/uptime": 42.0, "$SYS/broker/messages/received": 7.0},
+                {"$SYS/broker/uptime": now},
+            )
+            assert reader._connected is True
+            # 未发布的主题不出现在结果中；不在布局中的主题被忽略
+            assert reader.sample(timeout_sec=0.5) == {"$SYS/broker/uptime": 42.0}
+        finally:
+            reader.close()
+    finally:
+        writer.close()
+
+
+def test_reader_gives_up_when_writer_dies_mid_update():
+    name = f"bt_test_stuck_{os.getpid()}"
+    writer = SharedMetricsWriter(name, topics=("$SYS/broker/uptime",))
+    try:
+        reader = SharedMetricsReader(MQTTConfig(shared_memory_name=name))
+        try:
+            writer.publish({"$SYS/broker/uptime": 1.0}, {"$SYS/broker/uptime": 5.0})
+            values, _ = reader._read_consistent()
+            writer._block.seq[0] += 1  # 模拟写入中途退出：序号停在奇数
+
+            started = time.monotonic()
+            stale_values, stale_ts = reader._read_consistent(timeout_sec=0.05)
+            assert time.monotonic() - started < 1.0
+            assert stale_values.tolist() == values.tolist() == [1.0] and stale_ts.tolist() == [5.0]
+
+            reader._last_good = None
+            with pytest.raises(RuntimeError, match="写入状态"):
+                reader._read_consistent(timeout_sec=0.05)
+        finally:
+            reader.close()
+    finally:
+        writer.close()
@@ -0,0 +1,183 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from script._raw_sys_sampler import _encode_string, _packet, split_packets
+from script.workload import WorkloadConfig, WorkloadManager
+
+
+def _fake_broker(server, accepted, subscriptions):
+    """接受连接；每次 SUBSCRIBE 回复 SUBACK 并发布一条消息，UNSUBSCRIBE 回复 UNSUBACK。"""
+    while True:
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        accepted.append(conn)
+        buf = b""
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    break
+                if not data:
+                    break
+                buf += data
+                packets, consumed = split_packets(memoryview(buf))
+                for header, body in packets:
+                    body = bytes(body)
+                    kind = header & 0xF0
+                    if kind == 0x10:  # CONNECT
+                        conn.sendall(b"\x20\x02\x00\x00")
+                    elif kind == 0x80:  # SUBSCRIBE
+                        topic_len = int.from_bytes(body[2:4], "big")
+                        topic = body[4:4 + topic_len].decode()
+                        subscriptions.append(topic)
+                        conn.sendall(b"\x90\x03" + body[:2] + b"\x00")
+                        conn.sendall(_packet(0x30, _encode_string(topic) + b"hello"))
+                    elif kind == 0xA0:  # UNSUBSCRIBE
+                        conn.sendall(b"\xb0\x02" + body[:2])
+                    elif kind == 0xE0:  # DISCONNECT
+                        break
+                buf = buf[consumed:]
+
+
+def test_verify_messages_reuses_one_connection(tmp_path):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text("#!/bin/sh\n")
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(4)
+    accepted, subscriptions = [], []
+    thread = threading.Thread(target=_fake_broker, args=(server, accepted, subscriptions), daemon=True)
+    thread.start()
+
+    workload = WorkloadManager(broker_port=server.getsockname()[1], emqtt_bench_path=str(bench))
+    try:
+        assert workload._verify_messages_sending("a/topic", timeout_sec=2.0)
+        assert workload._verify_messages_sending("b/topic", timeout_sec=2.0)
+        assert len(accepted) == 1
+        assert subscriptions == ["a/topic", "b/topic"]
+    finally:
+        workload._close_verify_client()
+        server.close()
+    assert workload._verify_client is None
+
+
+def test_start_returns_once_bench_reports_connections(tmp_path, monkeypatch):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text(
+        "#!/bin/sh\n"
+        'if [ "$1" = "pub" ] && [ -n "$FAIL_PUB" ]; then echo "invalid option" >&2; exit 2; fi\n'
+        'echo "connect_succ total=1 rate=1.00/sec"\n'
+        "exec sleep 30\n"
+    )
+    bench.chmod(0o755)
+    workload = WorkloadManager(broker_port=1, emqtt_bench_path=str(bench), verbose=False)
+    config = WorkloadConfig(num_publishers=1, num_subscribers=1)
+    try:
+        started = time.monotonic()
+        workload.start(config=config)
+        assert time.monotonic() - started < 1.0  # 原先固定等待 1.5 秒
+        assert workload.is_running()
+    finally:
+        workload.stop()
+
+    monkeypatch.setenv("FAIL_PUB", "1")
+    with pytest.raises(RuntimeError, match="invalid option"):
+        workload.start(config=config)
+    # 发布者启动失败时，已启动的订阅者也被结束
+    assert not workload.is_running() and not workload._processes
+
+
+def test_ready_marker_split_across_reads_is_detected(tmp_path):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text("#!/bin/sh\nprintf 'conn'\nsleep 0.2\nprintf 'ect_succ total=1\\n'\nexec sleep 30\n")
+    bench.chmod(0o755)
+    workload = WorkloadManager(broker_port=1, emqtt_bench_path=str(bench), verbose=False)
+    try:
+        started = time.monotonic()
+        workload.start(config=WorkloadConfig(num_publishers=1, num_subscribers=1))
+        assert time.monotonic() - started < 1.0  # 未命中标记时订阅者、发布者共等满 1.5 秒
+    finally:
+        workload.stop()
+
+
+def test_start_reuses_running_processes_for_same_config(tmp_path):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text('#!/bin/sh\necho "connect_succ total=1"\nexec sleep 30\n')
+    bench.chmod(0o755)
+    workload = WorkloadManager(broker_port=1, emqtt_bench_path=str(bench), verbose=False)
+    try:
+        workload.start(num_publishers=2, num_subscribers=1, message_rate=4)
+        pids = [process.pid for process in workload._processes]
+        assert workload._last_config.publisher_interval_ms == 500
+
+        workload.start(num_publishers=2, num_subscribers=1, message_rate=4)
+        assert [process.pid for process in workload._processes] == pids
+
+        workload._processes[0].kill()
+        workload._processes[0].wait()
+        workload.start(num_publishers=2, num_subscribers=1, message_rate=4)  # 有进程已退出：重新启动
+        respawned = [process.pid for process in workload._processes]
+        assert len(respawned) == 2 and not set(respawned) & set(pids)
+
+        workload.start(num_publishers=2, num_subscribers=1, message_rate=4, force=True)
+        assert not set(process.pid for process in workload._processes) & set(respawned)
+    finally:
+        workload.stop()
+
+
+def test_start_without_capture_sends_output_to_devnull(tmp_path):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text('#!/bin/sh\nif [ "$1" = "pub" ]; then echo "bad" >&2; exit 2; fi\nexec sleep 30\n')
+    bench.chmod(0o755)
+    workload = WorkloadManager(broker_port=1, emqtt_bench_path=str(bench), verbose=False, capture_output=False)
+    spawned = []
+    real_spawn = workload._spawn
+    workload._spawn = lambda cmd: spawned.append(real_spawn(cmd)) or spawned[-1]
+    with pytest.raises(RuntimeError, match="无输出信息"):
+        workload.start(num_publishers=1, num_subscribers=1)
+    assert len(spawned) == 2
+    assert all(process.stdout is None and process.stderr is None for process in spawned)
+    assert all(process.poll() is not None for process in spawned)  # 订阅者已被结束
+    assert not workload._drainers and not workload._processes
+
+
+def test_broker_host_is_resolved_once(tmp_path, monkeypatch):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text("#!/bin/sh\n")
+    calls = []
+    real_getaddrinfo = socket.getaddrinfo
+
+    def _getaddrinfo(*args, **kwargs):
+        calls.append(args[0])
+        return real_getaddrinfo("127.0.0.1", *args[1:], **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", _getaddrinfo)
+    workload = WorkloadManager(broker_host="broker.example", emqtt_bench_path=str(bench))
+
+    assert calls == ["broker.example"]
+    assert workload.broker_host == "broker.example"
+    assert workload._build_sub_command(WorkloadConfig())[2:4] == ["-h", "127.0.0.1"]
+
+
+def test_watch_exit_starts_one_watcher_per_process_batch(tmp_path):
+    bench = tmp_path / "emqtt_bench"
+    bench.write_text('#!/bin/sh\necho "connect_succ total=1"\nexec sleep 30\n')
+    bench.chmod(0o755)
+    workload = WorkloadManager(broker_port=1, emqtt_bench_path=str(bench), verbose=False)
+    try:
+        workload.start(num_publishers=1, num_subscribers=0)
+        watchers_before = threading.active_count()
+        exited = workload.watch_exit()
+        for _ in range(5):  # 每个 episode 调用一次 play()
+            assert workload.watch_exit() is exited
+        assert threading.active_count() == watchers_before + 1
+        assert not exited.is_set()
+    finally:
+        workload.stop()
+    assert exited.wait(timeout=2.0)
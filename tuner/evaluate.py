@@ -8,13 +8,20 @@ from __future__ import annotations
 
 import argparse
 import json
-from statistics import mean
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 
 from environment import EnvConfig
-from .utils import load_model, make_env
+from .utils import load_model, make_env, make_predictor
+
+try:
+    import orjson  # 可选：逐 episode 写 JSONL 时直接序列化为 bytes，比标准库 json 快数倍
+    _json_dumps = orjson.dumps
+except ImportError:
+
+    def _json_dumps(payload: Any) -> bytes:
+        return json.dumps(payload, ensure_ascii=True).encode("utf-8")
 
 try:
     from script.workload import WorkloadConfig, WorkloadManager
@@ -62,6 +69,12 @@ def parse_args() -> argparse.Namespace:
         default="",
         help="可选：将评估结果写入 JSON 文件",
     )
+    parser.add_argument(
+        "--episodes-jsonl",
+        type=str,
+        default="",
+        help="可选：每个 episode 结束时向该文件写入一行 JSON（可用 tail -f 实时查看），最后一行为汇总结果",
+    )
     parser.add_argument(
         "--enable-workload",
         action="store_true",
@@ -113,13 +126,42 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+# 状态向量中 (throughput_norm, latency_p50_norm, latency_p95_norm) 的下标，及还原为 [norm, ms, ms] 的系数
+_OBS_METRIC_INDEX = (1, 5, 6)
+_OBS_METRIC_SCALE = np.array([1.0, 100.0, 100.0])
+
+
+def _obs_metrics(obs: np.ndarray) -> List[float]:
+    """从状态向量一次取出 [throughput_norm, latency_p50_ms, latency_p95_ms]，缺失的维度记为 0。"""
+    if len(obs) > _OBS_METRIC_INDEX[-1]:
+        # 一次 gather + 一次乘法，全部在 NumPy 内完成
+        return (np.take(obs, _OBS_METRIC_INDEX) * _OBS_METRIC_SCALE).tolist()
+    values = [0.0, 0.0, 0.0]
+    for i, index in enumerate(_OBS_METRIC_INDEX):
+        if len(obs) > index:
+            values[i] = float(obs[index]) * (100.0 if i else 1.0)
+    return values
+
+
 def _extract_metrics(obs: np.ndarray, info: Dict[str, Any]) -> Dict[str, float]:
-    throughput_norm = float(info.get("throughput_norm", obs[1] if len(obs) > 1 else 0.0))
+    throughput_norm = info.get("throughput_norm")
+    latency_p50_ms = info.get("latency_p50_ms")
+    latency_p95_ms = info.get("latency_p95_ms")
+    # 环境的 info 通常已带齐这些字段，只有缺失时才从状态向量（一次 gather）回退
+    if throughput_norm is None or latency_p50_ms is None or latency_p95_ms is None:
+        fallback = _obs_metrics(obs)
+        if throughput_norm is None:
+            throughput_norm = fallback[0]
+        if latency_p50_ms is None:
+            latency_p50_ms = fallback[1]
+        if latency_p95_ms is None:
+            latency_p95_ms = fallback[2]
+    throughput_norm = float(throughput_norm)
     throughput_msg_per_sec = float(
         info.get("throughput_msg_per_sec", throughput_norm * 10000.0)
     )
-    latency_p50_ms = float(info.get("latency_p50_ms", (obs[5] * 100.0) if len(obs) > 5 else 0.0))
-    latency_p95_ms = float(info.get("latency_p95_ms", (obs[6] * 100.0) if len(obs) > 6 else 0.0))
+    latency_p50_ms = float(latency_p50_ms)
+    latency_p95_ms = float(latency_p95_ms)
     return {
         "throughput_norm": throughput_norm,
         "throughput_msg_per_sec": throughput_msg_per_sec,
@@ -128,56 +170,141 @@ def _extract_metrics(obs: np.ndarray, info: Dict[str, Any]) -> Dict[str, float]:
     }
 
 
+# 统一后的单步结果 (obs, reward, done, info)
+_StepResult = Tuple[Any, float, bool, Dict[str, Any]]
+
+
+def _gymnasium_step_fn(env) -> Callable[[np.ndarray], _StepResult]:
+    """把 gymnasium 的 5 元组 step 包装成 (obs, reward, done, info)。"""
+    step = env.step
+
+    def step_fn(action: np.ndarray) -> _StepResult:
+        obs, reward, terminated, truncated, info = step(action)
+        return obs, reward, bool(terminated or truncated), info
+
+    return step_fn
+
+
+def _bind_step_fn(env, step_result: Tuple[Any, ...]) -> Tuple[Callable[[np.ndarray], _StepResult], _StepResult]:
+    """
+    根据第一步的返回值判断环境是 gym（4 元组）还是 gymnasium（5 元组）接口，
+    返回之后直接调用的 step_fn，以及统一为 (obs, reward, done, info) 的第一步结果。
+    """
+    if len(step_result) == 4:
+        return env.step, step_result
+    obs, reward, terminated, truncated, info = step_result
+    return _gymnasium_step_fn(env), (obs, reward, bool(terminated or truncated), info)
+
+
+def _new_metrics_buf(env) -> np.ndarray:
+    # 每步的 (吞吐, P50, P95) 写入预分配缓冲区，episode 结束时一次按列求均值；
+    # 容量取 cfg.max_steps，环境不截断时按需倍增
+    capacity = int(getattr(getattr(env, "cfg", None), "max_steps", 0) or 64)
+    return np.empty((capacity, 3), dtype=np.float64)
+
+
+def _record_step(metrics_buf: np.ndarray, t: int, obs: np.ndarray, info: Dict[str, Any]) -> np.ndarray:
+    metrics = _extract_metrics(obs, info)
+    if t == len(metrics_buf):
+        metrics_buf = np.concatenate([metrics_buf, np.empty_like(metrics_buf)])
+    metrics_buf[t] = (
+        metrics["throughput_msg_per_sec"],
+        metrics["latency_p50_ms"],
+        metrics["latency_p95_ms"],
+    )
+    return metrics_buf
+
+
+def _episode_stats(total_reward: float, metrics_buf: np.ndarray, t: int) -> Dict[str, float]:
+    throughput, latency_p50, latency_p95 = metrics_buf[:t].mean(axis=0).tolist() if t else (0.0, 0.0, 0.0)
+    return {
+        "episode_reward": total_reward,
+        "episode_throughput_msg_per_sec": throughput,
+        "episode_latency_p50_ms": latency_p50,
+        "episode_latency_p95_ms": latency_p95,
+    }
+
+
 def run_episode(
     env,
     action_fn: Callable[[np.ndarray], np.ndarray],
     seed: Optional[int] = None,
 ) -> Dict[str, float]:
-    if seed is None:
-        obs, _ = env.reset()
-    else:
-        obs, _ = env.reset(seed=seed)
+    obs, _ = env.reset() if seed is None else env.reset(seed=seed)
+    total_reward = 0.0
+    metrics_buf = _new_metrics_buf(env)
+    t = 0
+    step_fn, step_result = _bind_step_fn(env, env.step(action_fn(obs)))
+
+    while True:
+        obs, reward, done, info = step_result
+        total_reward += float(reward)
+        metrics_buf = _record_step(metrics_buf, t, obs, info)
+        t += 1
+        if done:
+            break
+        step_result = step_fn(action_fn(obs))
 
-    done = False
+    return _episode_stats(total_reward, metrics_buf, t)
+
+
+def run_episode_constant(env, action: np.ndarray, seed: Optional[int] = None) -> Dict[str, float]:
+    """与 run_episode 相同，但每步都执行同一个固定动作（如 baseline 的默认配置），不再逐步调用 action_fn。"""
+    obs, _ = env.reset() if seed is None else env.reset(seed=seed)
     total_reward = 0.0
-    throughput_values: List[float] = []
-    latency_p50_values: List[float] = []
-    latency_p95_values: List[float] = []
-
-    while not done:
-        action = action_fn(obs)
-        step_result = env.step(action)
-        if len(step_result) == 4:
-            obs, reward, done, info = step_result
-        else:
-            obs, reward, terminated, truncated, info = step_result
-            done = bool(terminated or truncated)
+    metrics_buf = _new_metrics_buf(env)
+    t = 0
+    step_fn, step_result = _bind_step_fn(env, env.step(action))
 
+    while True:
+        obs, reward, done, info = step_result
         total_reward += float(reward)
-        metrics = _extract_metrics(obs, info)
-        throughput_values.append(metrics["throughput_msg_per_sec"])
-        latency_p50_values.append(metrics["latency_p50_ms"])
-        latency_p95_values.append(metrics["latency_p95_ms"])
+        metrics_buf = _record_step(metrics_buf, t, obs, info)
+        t += 1
+        if done:
+            break
+        step_result = step_fn(action)
+
+    return _episode_stats(total_reward, metrics_buf, t)
+
+
+_EPISODE_KEYS = (
+    "episode_reward",
+    "episode_throughput_msg_per_sec",
+    "episode_latency_p50_ms",
+    "episode_latency_p95_ms",
+)
 
-    return {
-        "episode_reward": total_reward,
-        "episode_throughput_msg_per_sec": float(mean(throughput_values)) if throughput_values else 0.0,
-        "episode_latency_p50_ms": float(mean(latency_p50_values)) if latency_p50_values else 0.0,
-        "episode_latency_p95_ms": float(mean(latency_p95_values)) if latency_p95_values else 0.0,
-    }
 
+def _episode_row(stats: Dict[str, float]) -> List[float]:
+    return [stats[key] for key in _EPISODE_KEYS]
 
-def summarize(results: List[Dict[str, float]]) -> Dict[str, float]:
-    rewards = [r["episode_reward"] for r in results]
-    tps = [r["episode_throughput_msg_per_sec"] for r in results]
-    p50s = [r["episode_latency_p50_ms"] for r in results]
-    p95s = [r["episode_latency_p95_ms"] for r in results]
+
+def summarize(results: Union[np.ndarray, List[Dict[str, float]]]) -> Dict[str, float]:
+    """
+    results 可以是 (n_episodes, 4) 矩阵（列顺序同 _EPISODE_KEYS），
+    也可以是 run_episode 返回的字典列表；按列一次求均值。
+    """
+    if isinstance(results, np.ndarray):
+        mat = results
+    else:
+        mat = np.fromiter(
+            (r[key] for r in results for key in _EPISODE_KEYS),
+            dtype=np.float64,
+            count=len(results) * len(_EPISODE_KEYS),
+        ).reshape(-1, len(_EPISODE_KEYS))
+    if len(mat) == 0:
+        means = [0.0] * len(_EPISODE_KEYS)
+        std_reward = 0.0
+    else:
+        means = mat.mean(axis=0).tolist()
+        std_reward = float(mat[:, 0].std())
     return {
-        "mean_reward": float(mean(rewards)) if rewards else 0.0,
-        "std_reward": float(np.std(rewards)) if rewards else 0.0,
-        "mean_throughput_msg_per_sec": float(mean(tps)) if tps else 0.0,
-        "mean_latency_p50_ms": float(mean(p50s)) if p50s else 0.0,
-        "mean_latency_p95_ms": float(mean(p95s)) if p95s else 0.0,
+        "mean_reward": means[0],
+        "std_reward": std_reward,
+        "mean_throughput_msg_per_sec": means[1],
+        "mean_latency_p50_ms": means[2],
+        "mean_latency_p95_ms": means[3],
     }
 
 
@@ -186,12 +313,28 @@ def _run_policy_eval(
     n_episodes: int,
     seed: int,
     label: str,
-    action_fn: Callable[[np.ndarray], np.ndarray],
+    action_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    episode_log: Optional[BinaryIO] = None,
+    constant_action: Optional[np.ndarray] = None,
 ) -> Dict[str, float]:
-    per_episode: List[Dict[str, float]] = []
+    """
+    action_fn 与 constant_action 二选一：给出 constant_action 时每步执行该固定动作（run_episode_constant）。
+    episode_log 不为 None 时，每个 episode 结束后立即写入一行 JSON 并 flush。
+    """
+    if (action_fn is None) == (constant_action is None):
+        raise ValueError("action_fn 与 constant_action 必须且只能指定一个")
+    # 每个 episode 一行，列顺序同 _EPISODE_KEYS
+    per_episode = np.empty((n_episodes, len(_EPISODE_KEYS)), dtype=np.float64)
     for i in range(n_episodes):
-        episode_stats = run_episode(env, action_fn=action_fn, seed=seed + i)
-        per_episode.append(episode_stats)
+        if constant_action is not None:
+            episode_stats = run_episode_constant(env, constant_action, seed=seed + i)
+        else:
+            episode_stats = run_episode(env, action_fn=action_fn, seed=seed + i)
+        per_episode[i] = _episode_row(episode_stats)
+        if episode_log is not None:
+            record = {"type": "episode", "label": label, "episode": i + 1, **episode_stats}
+            episode_log.write(_json_dumps(record) + b"\n")
+            episode_log.flush()
         print(
             f"[{label}] Episode {i + 1}/{n_episodes} | "
             f"reward={episode_stats['episode_reward']:.4f}, "
@@ -232,8 +375,12 @@ def main() -> None:
 
     env_cfg = EnvConfig()
     env = make_env(env_cfg, workload_manager=workload)
+    episode_log = None
 
     try:
+        # 在 try 内打开：路径无效或无权限时 finally 仍会关闭环境并停止工作负载
+        if args.episodes_jsonl:
+            episode_log = open(args.episodes_jsonl, "wb")
         model = load_model(args.model_path, env, device=args.device)
 
         default_action = env.knob_space.get_default_action().astype(np.float32)
@@ -244,7 +391,8 @@ def main() -> None:
                 n_episodes=args.n_episodes,
                 seed=args.seed,
                 label="BASELINE",
-                action_fn=lambda _obs: default_action,
+                episode_log=episode_log,
+                constant_action=default_action,
             )
 
         rl_summary = _run_policy_eval(
@@ -252,7 +400,8 @@ def main() -> None:
             n_episodes=args.n_episodes,
             seed=args.seed + 10_000,
             label="RL",
-            action_fn=lambda obs: model.predict(obs, deterministic=True)[0],
+            episode_log=episode_log,
+            action_fn=make_predictor(model, dtype="auto"),
         )
 
         print("\n========================================")
@@ -300,12 +449,17 @@ def main() -> None:
             "n_episodes": args.n_episodes,
             "seed": args.seed,
         }
+        if episode_log is not None:
+            episode_log.write(_json_dumps({"type": "summary", **output_payload}) + b"\n")
+            print(f"[评估] 逐 episode 结果已写入: {args.episodes_jsonl}")
         if args.output_json:
             output_path = args.output_json
             with open(output_path, "w", encoding="utf-8") as f:
                 json.dump(output_payload, f, indent=2, ensure_ascii=True)
             print(f"[评估] 结果已写入: {output_path}")
     finally:
+        if episode_log is not None:
+            episode_log.close()
         env.close()
         if workload is not None:
             workload.stop()
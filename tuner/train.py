@@ -454,6 +454,12 @@ def parse_args() -> argparse.Namespace:
         default=10,
         help="如果启用limit-action-log，每隔多少步记录一次（默认：10）",
     )
+    parser.add_argument(
+        "--sampler-shm-name",
+        type=str,
+        default=None,
+        help="从 sampler 守护进程的共享内存读取$SYS指标（需先运行 python -m environment.shared_sampler --name <名称>；默认：不使用，环境自行订阅）",
+    )
     parser.add_argument(
         "--cleanup-mosquitto-logs",
         action="store_true",
@@ -1343,6 +1349,7 @@ def main() -> None:
     env_cfg.penalty_scale = float(args.penalty_scale)
     env_cfg.constraint_lambda_init = float(args.constraint_lambda_init)
     env_cfg.constraint_lambda_max = float(args.constraint_lambda_max)
+    env_cfg.mqtt.shared_memory_name = args.sampler_shm_name
     
     # 创建工作负载管理器（必须启用，在创建环境之前）
     workload = None
@@ -3,18 +3,21 @@
 - 创建环境实例
 - 创建 DDPG 模型（使用默认策略网络）
 - 保存与加载模型
+- 推理用的 obs -> action 函数
 """
 
 from __future__ import annotations
 
+import functools
 from pathlib import Path
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Union
 
 from stable_baselines3.common.noise import (
     NormalActionNoise,
     OrnsteinUhlenbeckActionNoise,
 )
 import numpy as np
+import torch
 
 from environment import EnvConfig, MosquittoBrokerEnv
 from model import (
@@ -233,3 +236,107 @@ def load_model(load_path: Union[str, Path], env: MosquittoBrokerEnv, device: str
             env=env,
             device=device,
         )
+
+
+def _traced_actor(policy, model_path: Path) -> Optional[Callable[[torch.Tensor], torch.Tensor]]:
+    """
+    actor 经 torch.jit.trace + freeze 导出为 TorchScript，并缓存到模型旁的 <模型名>.actor.pt；
+    缓存比模型文件新时直接 torch.jit.load，重复运行无需再次 trace。导出失败时返回 None。
+    """
+    device = policy.device
+    cache_path = model_path.with_suffix(".actor.pt")
+    if cache_path.exists() and cache_path.stat().st_mtime >= model_path.stat().st_mtime:
+        try:
+            return torch.jit.load(str(cache_path), map_location=device)
+        except Exception as e:
+            print(f"[警告] TorchScript 缓存加载失败，将重新导出: {e}")
+    try:
+        example_obs = torch.zeros(1, *policy.observation_space.shape, device=device)
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(policy.actor.eval(), example_obs))
+    except Exception as e:
+        print(f"[警告] TorchScript 导出失败，使用未导出的 policy: {e}")
+        return None
+    try:
+        torch.jit.save(traced, str(cache_path))
+    except OSError as e:
+        print(f"[警告] 无法写入 TorchScript 缓存 {cache_path}: {e}")
+    return traced
+
+
+def _compiled_actor(policy, batch_size: int) -> Optional[Callable[[torch.Tensor], torch.Tensor]]:
+    """
+    编译 actor 并用 (batch_size, state_dim) 的固定形状预热一次，编译开销在进入推理循环前付清；编译失败时返回 None。
+    """
+    try:
+        actor = torch.compile(policy.actor, mode="reduce-overhead", dynamic=False)
+        with torch.inference_mode():
+            actor(torch.zeros(batch_size, *policy.observation_space.shape, device=policy.device))
+        return actor
+    except Exception as e:
+        print(f"[警告] actor 编译失败，使用未编译的 policy: {e}")
+        return None
+
+
+def make_predictor(
+    model: EnhancedDDPG,
+    deterministic: bool = True,
+    compile_actor: bool = False,
+    batch_size: int = 1,
+    trace_model_path: Optional[Union[str, Path]] = None,
+    dtype: Union[str, torch.dtype, None] = None,
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    返回 obs -> action 的推理函数（评估、play 与 apply_optimal_config 共用）。
+    前向在 torch.inference_mode() 下直接调用 policy，跳过 model.predict 的观测检查、预处理与重复的设备/类型转换；
+    后处理与 model.predict 一致：squash_output 时 unscale_action 映射回动作空间，否则裁剪到边界。
+    支持单个观测或 (n_envs, state_dim) 批次；没有 SB3 policy 的模型回退到 model.predict。
+
+    Args:
+        model: DDPG 模型
+        deterministic: 是否使用确定性策略
+        compile_actor: 是否改用 torch.compile 后的 actor（DDPG 的确定性动作就是 actor 输出），
+            按 batch_size 预热；之后观测形状保持不变，不会触发重新编译
+        batch_size: compile_actor 预热用的批大小
+        trace_model_path: 模型文件路径；给出时 actor 导出为 TorchScript 并缓存到同目录的 <模型名>.actor.pt，
+            优先于 compile_actor
+        dtype: 前向的 autocast 精度；None 表示 float32，"auto" 表示在支持 bfloat16 的 GPU 上用 bfloat16
+    """
+    policy = getattr(model, "policy", None)
+    if policy is None or not hasattr(policy, "_predict"):
+        return lambda obs: model.predict(obs, deterministic=deterministic)[0]
+
+    policy.set_training_mode(False)
+    device = policy.device
+    action_space = policy.action_space
+
+    forward = None
+    if trace_model_path is not None:
+        forward = _traced_actor(policy, Path(trace_model_path))
+    elif compile_actor:
+        forward = _compiled_actor(policy, batch_size)
+    if forward is None:
+        forward = functools.partial(policy._predict, deterministic=deterministic)
+
+    if dtype == "auto":
+        dtype = torch.bfloat16 if device.type == "cuda" and torch.cuda.is_bf16_supported() else None
+    use_autocast = dtype is not None and dtype != torch.float32
+    autocast_dtype = dtype if use_autocast else torch.bfloat16
+
+    @torch.inference_mode()
+    def predict(obs: np.ndarray) -> np.ndarray:
+        obs_t = torch.as_tensor(obs, dtype=torch.float32, device=device)
+        single = obs_t.dim() == 1
+        if single:
+            obs_t = obs_t.unsqueeze(0)
+        with torch.autocast(device_type=device.type, dtype=autocast_dtype, enabled=use_autocast):
+            action = forward(obs_t)
+        action = action.float().cpu().numpy()
+        # 按属性而不是 gymnasium.spaces.Box 判断，回退到旧版 gym 时同样映射/裁剪
+        if policy.squash_output:
+            action = policy.unscale_action(action)
+        elif hasattr(action_space, "low"):
+            action = np.clip(action, action_space.low, action_space.high)
+        return action[0] if single else action
+
+    return predict